@@ -1,42 +1,47 @@
 import sys
-import json
 import os
-import hashlib
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout,
     QHBoxLayout, QComboBox, QScrollArea, QFileDialog, QDateEdit, QListWidget,
-    QMessageBox, QDialog, QInputDialog, QSpacerItem, QSizePolicy
+    QMessageBox, QDialog, QInputDialog, QSpacerItem, QSizePolicy, QProgressDialog,
+    QTableView, QHeaderView, QAbstractItemView, QStyledItemDelegate
 )
-from PyQt5.QtCore import Qt, QDate
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-import numpy as np
+from PyQt5.QtCore import Qt, QDate, QTimer
 
+# matplotlib, NumPy and the modules built on them (nlhi_plot, nlhi_series)
+# are imported where they are first needed, so the login dialog does not
+# wait for them; warm_imports() loads them in the background after login.
+from nlhi_auth import CREDENTIALS_DB, CredentialError, CredentialStore
+from nlhi_core import UNIT_CONVERSION, compute_record, safe_float
+from nlhi_domains import DomainTableModel
+from nlhi_metrics import timed, timer
+from nlhi_recompute import recompute_all
+from nlhi_store import STORE_FILE, RecordStore
+from nlhi_tasks import TaskRunner
 
-UNIT_CONVERSION = {
-    "Day(s)": 1 / 365.25,
-    "Week(s)": 1 / 52.1429,
-    "Month(s)": 1 / 12.0,
-    "Year(s)": 1.0,
-}
 
+# Legacy credentials file, imported into CREDENTIALS_DB the first time the app starts.
 CREDENTIALS_FILE = "credentials.json"
+
+# Legacy JSON files, imported into STORE_FILE the first time the app starts.
 DATA_FILE = "nlhi_data.json"      
 OLD_DATA_FILE = "nlchi_data.json" 
-
 REGIONS_FILE = "regions.json"     
 
+# How often to look for records saved by other instances sharing STORE_FILE.
+SYNC_INTERVAL_MS = 2000
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+# How long closing the window waits for cancelled store writes to stop.
 
-def safe_float(s, default=0.0):
-    try:
-        return float(str(s).strip())
-    except Exception:
-        return default
+
+def warm_imports(task=None):
+    """Import the plotting and numeric modules and load matplotlib's font cache."""
+    import matplotlib.backends.backend_qt5agg  # noqa: F401
+    import matplotlib.font_manager
+    import nlhi_plot  # noqa: F401
+    import nlhi_series  # noqa: F401
+    matplotlib.font_manager.fontManager.get_default_size()
 
 
 class LoginDialog(QDialog):
@@ -62,16 +67,16 @@ class LoginDialog(QDialog):
         self.layout.addWidget(self.register_button)
         self.setLayout(self.layout)
         self.successful_login = False
+        self.credentials = CredentialStore(CREDENTIALS_DB)
+        self.credentials.import_legacy(CREDENTIALS_FILE)
 
     def login(self):
         username = self.username_input.text().strip()
         password = self.password_input.text()
-        if not os.path.exists(CREDENTIALS_FILE):
+        if len(self.credentials) == 0:
             QMessageBox.warning(self, "Error", "No users registered.")
             return
-        with open(CREDENTIALS_FILE, 'r') as f:
-            credentials = json.load(f)
-        if username in credentials and credentials[username] == hash_password(password):
+        if self.credentials.verify(username, password):
             self.successful_login = True
             self.accept()
         else:
@@ -80,20 +85,11 @@ class LoginDialog(QDialog):
     def register(self):
         username = self.username_input.text().strip()
         password = self.password_input.text()
-        if username == "" or password == "":
-            QMessageBox.warning(self, "Error", "Username and password cannot be empty.")
+        try:
+            self.credentials.register(username, password)
+        except CredentialError as e:
+            QMessageBox.warning(self, "Error", str(e))
             return
-        if os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, 'r') as f:
-                credentials = json.load(f)
-        else:
-            credentials = {}
-        if username in credentials:
-            QMessageBox.warning(self, "Error", "Username already exists.")
-            return
-        credentials[username] = hash_password(password)
-        with open(CREDENTIALS_FILE, 'w') as f:
-            json.dump(credentials, f)
         QMessageBox.information(self, "Success", "User registered successfully.")
 
 class ChangeCredentialsDialog(QDialog):
@@ -119,49 +115,159 @@ class ChangeCredentialsDialog(QDialog):
     def save_changes(self):
         new_user = self.new_username_input.text().strip()
         new_pass = self.new_password_input.text()
-        if new_user == "" or new_pass == "":
-            QMessageBox.warning(self, "Error", "Username and password cannot be empty.")
+        try:
+            with CredentialStore(CREDENTIALS_DB) as credentials:
+                credentials.change_credentials(self.current_user, new_user, new_pass)
+        except CredentialError as e:
+            QMessageBox.warning(self, "Error", str(e))
             return
-        with open(CREDENTIALS_FILE, 'r') as f:
-            credentials = json.load(f)
-        
-        if self.current_user in credentials:
-            del credentials[self.current_user]
-        credentials[new_user] = hash_password(new_pass)
-        with open(CREDENTIALS_FILE, 'w') as f:
-            json.dump(credentials, f)
         QMessageBox.information(self, "Success", "Credentials updated. Please restart app.")
         self.accept()
 
 
+class DashboardDialog(QDialog):
+    """
+    One embedded dashboard for all regions.
+
+    Only the region picked in the selector is loaded and drawn; the figure
+    and its artists are reused when switching regions. Loading and
+    decimating the series runs on a worker thread, and a pending load is
+    cancelled when another region is picked.
+    """
+    def __init__(self, series_cache, regions, tasks, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("NLHI Dashboard")
+        self.resize(1100, 800)
+        self.series_cache = series_cache
+        self.tasks = tasks
+        self.pending = None
+
+        layout = QVBoxLayout()
+        nav = QHBoxLayout()
+        self.prev_btn = QPushButton("< Previous")
+        self.prev_btn.clicked.connect(lambda: self.step(-1))
+        self.region_combo = QComboBox()
+        self.region_combo.addItems(regions)
+        self.region_combo.currentTextChanged.connect(self.show_region)
+        self.next_btn = QPushButton("Next >")
+        self.next_btn.clicked.connect(lambda: self.step(1))
+        nav.addWidget(QLabel("Region:"))
+        nav.addWidget(self.region_combo, 1)
+        nav.addWidget(self.prev_btn)
+        nav.addWidget(self.next_btn)
+        self.status_label = QLabel("")
+        nav.addWidget(self.status_label)
+        layout.addLayout(nav)
+
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+        from nlhi_plot import FIGURE_SIZE, RegionPlot
+
+        self.figure = Figure(figsize=FIGURE_SIZE)
+        self.canvas = FigureCanvas(self.figure)
+        self.plot = RegionPlot(self.figure)
+        layout.addWidget(self.canvas, 1)
+        self.setLayout(layout)
+
+        self.show_region(self.region_combo.currentText())
+
+    def set_regions(self, regions):
+        current = self.region_combo.currentText()
+        self.region_combo.blockSignals(True)
+        self.region_combo.clear()
+        self.region_combo.addItems(regions)
+        if current in regions:
+            self.region_combo.setCurrentText(current)
+        self.region_combo.blockSignals(False)
+        self.show_region(self.region_combo.currentText())
+
+    def step(self, delta):
+        count = self.region_combo.count()
+        if count:
+            self.region_combo.setCurrentIndex((self.region_combo.currentIndex() + delta) % count)
+
+    def show_region(self, region):
+        if not region:
+            return
+        if self.pending is not None:
+            self.pending.cancel()
+        self.status_label.setText(f"Loading {region}...")
+        self.pending = self.tasks.submit(
+            self._prepare, region,
+            on_done=self._prepared,
+            on_error=lambda msg: self.status_label.setText(f"Error: {msg}"),
+        )
+
+    @timed("dashboard.prepare")
+    def _prepare(self, task, region):
+        from nlhi_plot import prepare_region
+
+        series = self.series_cache.get(region)
+        task.check_cancelled()
+        return region, prepare_region(series)
+
+    def _prepared(self, result):
+        region, data = result
+        if region != self.region_combo.currentText():
+            return
+        self.pending = None
+        self.status_label.setText("")
+        with timer("dashboard.show"):
+            self.plot.show(region, data)
+        self.canvas.draw_idle()
+
+    def closeEvent(self, event):
+        if self.pending is not None:
+            self.pending.cancel()
+        super().closeEvent(event)
+
+
+class UnitDelegate(QStyledItemDelegate):
+    """Edits the Unit column of the domain table with a combo box."""
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.addItems(list(UNIT_CONVERSION.keys()))
+        return combo
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
+
+
 class NLHIApp(QWidget):
     def __init__(self, username):
         super().__init__()
         self.setWindowTitle("Newfoundland and Labrador Health Index (NLHI) v1.0 - © 2025 Mirza Niaz Zaman Elin. All rights reserved.")
         self.username = username
-        self.data = {}   
-
-        
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "r") as f:
-                try:
-                    self.data = json.load(f)
-                except json.JSONDecodeError:
-                    self.data = {}
-        elif os.path.exists(OLD_DATA_FILE):
-            with open(OLD_DATA_FILE, "r") as f:
-                try:
-                    self.data = json.load(f)
-                except json.JSONDecodeError:
-                    self.data = {}
-
-        self.regions_file = REGIONS_FILE
+        with timer("app.load"):
+            self.store = RecordStore(STORE_FILE)
+            self.store.import_legacy([DATA_FILE, OLD_DATA_FILE], REGIONS_FILE)
+        # Region records are loaded from the store on first use; see region_data().
+        self.data = {}
+        # Position in the store's change log; see poll_changes().
+        self.change_cursor = self.store.last_change()
+        self.data_version = self.store.data_version()
+        self._series_cache = None
+        self.dashboard = None
+        # Reads (dashboard preparation) share the global pool; writes go
+        # through one thread so saves land in the order they were made.
+        self.tasks = TaskRunner()
+        self.writer = TaskRunner(max_threads=1)
+        # Recompute/uncertainty/import tasks on `writer`; closing cancels these
+        # but lets single saves finish.
+        self.bulk_tasks = set()
 
-        
-        self.domain_rows = []
 
         self.init_ui()
 
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setInterval(SYNC_INTERVAL_MS)
+        self.sync_timer.timeout.connect(lambda: self.poll_changes())
+        self.sync_timer.start()
+
     
     def init_ui(self):
         layout = QVBoxLayout()
@@ -199,8 +305,18 @@ class NLHIApp(QWidget):
         layout.addWidget(QLabel("Date:"))
         self.date_input = QDateEdit(calendarPopup=True)
         self.date_input.setDate(QDate.currentDate())
+        self.date_input.dateChanged.connect(self.date_changed)
         layout.addWidget(self.date_input)
 
+        layout.addWidget(QLabel("Stored Records:"))
+        self.record_combo = QComboBox()
+        self.record_combo.setPlaceholderText("Select a saved date to load it")
+        self.record_combo.activated[str].connect(self.select_stored_date)
+        layout.addWidget(self.record_combo)
+        self.sync_label = QLabel()
+        self.sync_label.setWordWrap(True)
+        layout.addWidget(self.sync_label)
+
         layout.addWidget(QLabel("Average Age (years):"))
         self.age_input = QLineEdit()
         self.age_input.setPlaceholderText("e.g., 32.5")
@@ -218,26 +334,51 @@ class NLHIApp(QWidget):
 
         
         layout.addWidget(QLabel("Domains (add/remove as needed):"))
-        self.domains_layout = QVBoxLayout()
-        layout.addLayout(self.domains_layout)
+        self.domain_model = DomainTableModel(self)
+        self.domain_table = QTableView()
+        self.domain_table.setModel(self.domain_model)
+        self.domain_table.setItemDelegateForColumn(2, UnitDelegate(self.domain_table))
+        self.domain_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.domain_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.domain_table.setMinimumHeight(220)
+        layout.addWidget(self.domain_table)
+        self.nlhi_label = QLabel()
+        layout.addWidget(self.nlhi_label)
+        self.domain_model.nlhi_changed.connect(self.show_live_nlhi)
+        for edit in (self.age_input, self.pop_input, self.le_input):
+            edit.textChanged.connect(self.record_params_changed)
+        self.show_live_nlhi(0.0)
 
         domains_btn_row = QHBoxLayout()
         self.add_domain_btn = QPushButton("Add Domain")
-        self.add_domain_btn.clicked.connect(self.add_domain_row)
+        self.add_domain_btn.clicked.connect(lambda: self.add_domain_row())
+        self.remove_domain_btn = QPushButton("Remove Selected Domains")
+        self.remove_domain_btn.clicked.connect(self.remove_selected_domains)
         self.clear_domains_btn = QPushButton("Clear All Domains")
         self.clear_domains_btn.clicked.connect(self.clear_domains)
         domains_btn_row.addWidget(self.add_domain_btn)
+        domains_btn_row.addWidget(self.remove_domain_btn)
         domains_btn_row.addWidget(self.clear_domains_btn)
         layout.addLayout(domains_btn_row)
 
         
         actions_row = QHBoxLayout()
         self.calc_button = QPushButton("Calculate and Save")
-        self.calc_button.clicked.connect(self.calculate_and_save)
+        # Lambdas keep clicked(bool) from reaching the timed() wrappers.
+        self.calc_button.clicked.connect(lambda: self.calculate_and_save())
         self.view_button = QPushButton("View Dashboard")
-        self.view_button.clicked.connect(self.view_dashboard)
+        self.view_button.clicked.connect(lambda: self.view_dashboard())
+        self.recompute_button = QPushButton("Recompute All")
+        self.recompute_button.clicked.connect(self.recompute_all_regions)
+        self.uncertainty_button = QPushButton("Uncertainty Bands")
+        self.uncertainty_button.clicked.connect(self.analyze_uncertainty)
+        self.import_button = QPushButton("Import File...")
+        self.import_button.clicked.connect(self.import_domain_file)
         actions_row.addWidget(self.calc_button)
         actions_row.addWidget(self.view_button)
+        actions_row.addWidget(self.recompute_button)
+        actions_row.addWidget(self.uncertainty_button)
+        actions_row.addWidget(self.import_button)
         layout.addLayout(actions_row)
 
         
@@ -256,89 +397,40 @@ class NLHIApp(QWidget):
     
     def add_domain_row(self, preset=None):
         """
-        Add a row with: [Domain Name] [TLIPHS value] [Unit] [Mortality] [Remove]
+        Append a domain row: [Domain Name] [TLIPHS value] [Unit] [Mortality]
         preset: optional dict with keys: name, tliphs, unit, mortality
         """
-        row_layout = QHBoxLayout()
-
-        name_edit = QLineEdit()
-        name_edit.setPlaceholderText("Domain name (e.g., Respiratory)")
-
-        tliphs_edit = QLineEdit()
-        tliphs_edit.setPlaceholderText("TLIPHS value")
-
-        unit_combo = QComboBox()
-        unit_combo.addItems(list(UNIT_CONVERSION.keys()))
-
-        mort_edit = QLineEdit()
-        mort_edit.setPlaceholderText("Total Mortality (domain-specific)")
-
-        remove_btn = QPushButton("Remove")
-        
-        row_dict = {
-            "layout": row_layout,
-            "name_edit": name_edit,
-            "tliphs_edit": tliphs_edit,
-            "unit_combo": unit_combo,
-            "mort_edit": mort_edit,
-            "remove_btn": remove_btn,
-        }
-        def remove_this():
-            self.remove_domain_row(row_dict)
-        remove_btn.clicked.connect(remove_this)
+        preset = preset or {}
+        row = self.domain_model.add_row(
+            preset.get("name", ""), preset.get("tliphs", 0.0),
+            preset.get("unit", "Day(s)"), preset.get("mortality", 0.0),
+        )
+        if not preset:
+            self.domain_table.edit(self.domain_model.index(row, 0))
+        return row
 
-        
-        if preset:
-            name_edit.setText(str(preset.get("name", "")))
-            tliphs_edit.setText(str(preset.get("tliphs", "")))
-            unit = str(preset.get("unit", "Day(s)"))
-            if unit in UNIT_CONVERSION:
-                unit_combo.setCurrentText(unit)
-            mort_edit.setText(str(preset.get("mortality", "")))
+    def remove_domain_row(self, row):
+        self.domain_model.remove_row(row)
 
-        
-        row_layout.addWidget(QLabel("Domain:"))
-        row_layout.addWidget(name_edit, 2)
-        row_layout.addWidget(QLabel("TLIPHS:"))
-        row_layout.addWidget(tliphs_edit, 1)
-        row_layout.addWidget(unit_combo, 1)
-        row_layout.addWidget(QLabel("Mortality:"))
-        row_layout.addWidget(mort_edit, 1)
-        row_layout.addWidget(remove_btn)
-
-        self.domains_layout.addLayout(row_layout)
-        self.domain_rows.append(row_dict)
-
-    def remove_domain_row(self, row_dict):
-        
-        layout = row_dict["layout"]
-        
-        while layout.count():
-            item = layout.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.setParent(None)
-                widget.deleteLater()
-        
-        self.domains_layout.removeItem(layout)
-        
-        self.domain_rows = [r for r in self.domain_rows if r is not row_dict]
+    def remove_selected_domains(self):
+        selected = sorted({index.row() for index in self.domain_table.selectionModel().selectedRows()},
+                          reverse=True)
+        for row in selected:
+            self.remove_domain_row(row)
 
     def clear_domains(self):
-        for row in list(self.domain_rows):
-            self.remove_domain_row(row)
+        self.domain_model.clear()
 
     
     def register_new_region(self):
         text, ok = QInputDialog.getText(self, "New Region", "Enter Region Name:")
         if ok and text.strip():
             region = text.strip()
-            if region not in self.data:
+            if not self.region_list.findItems(region, Qt.MatchExactly):
                 self.data[region] = {}
                 self.region_list.addItem(region)
                 self.region_input.setText(region)
-                self.save_regions()
-                self.save_data()
+                self.writer.submit(lambda task: self.store.add_region(region), on_error=self.task_failed)
             else:
                 QMessageBox.information(self, "Info", f"Region '{region}' already exists.")
 
@@ -354,46 +446,186 @@ class NLHIApp(QWidget):
             QMessageBox.Yes | QMessageBox.No, QMessageBox.No
         )
         if confirm == QMessageBox.Yes:
-            if region in self.data:
-                del self.data[region]
+            self.data.pop(region, None)
             row = self.region_list.row(selected)
             self.region_list.takeItem(row)
-            self.save_regions()
-            self.save_data()
+            self.writer.submit(self.remove_region, region, on_error=self.task_failed)
             if self.region_input.text().strip() == region:
                 self.region_input.clear()
             QMessageBox.information(self, "Deleted", f"Region '{region}' deleted.")
 
+    def remove_region(self, task, region):
+        """Worker-thread part of Delete Region."""
+        self.store.delete_region(region)
+        self.series_changed(region)
+
+    def series_changed(self, *regions):
+        """Free the memoized dashboard series of changed `regions` (if any were built yet)."""
+        if self._series_cache is not None:
+            self._series_cache.mark_dirty(*regions)
+
+    @property
+    def series_cache(self):
+        """SeriesCache over the store, created on first use (it needs NumPy)."""
+        if self._series_cache is None:
+            from nlhi_series import SeriesCache
+            self._series_cache = SeriesCache(self.store)
+        return self._series_cache
+
+    def warm_up(self):
+        """Load the dashboard's modules on a worker thread while the user types."""
+        return self.tasks.submit(warm_imports)
+
+    @timed("app.load_regions")
     def load_regions(self):
-        
-        if os.path.exists(self.regions_file):
-            with open(self.regions_file, 'r') as f:
-                try:
-                    region_list = json.load(f)
-                    for region in region_list:
-                        if region not in self.data:
-                            self.data[region] = {}
-                        self.region_list.addItem(region)
-                except json.JSONDecodeError:
-                    pass
-        else:
-            
-            for region in self.data.keys():
-                self.region_list.addItem(region)
-            self.save_regions()
+        self.region_list.addItems(self.store.regions())
 
-    def save_regions(self):
-        with open(self.regions_file, 'w') as f:
-            json.dump(list(self.data.keys()), f)
+    def region_data(self, region):
+        """Records of one region as {date: record}, loaded from the store on first access."""
+        records = self.data.get(region)
+        if records is None:
+            records = self.data[region] = self.store.region_records(region)
+        return records
 
     def load_region_data(self, item):
-        self.region_input.setText(item.text())
+        region = item.text()
+        self.region_input.setText(region)
+        self.refresh_record_dates(region)
+        self.load_record(region, self.date_input.date().toString("yyyy-MM-dd"))
+
+    def refresh_record_dates(self, region):
+        self.record_combo.clear()
+        self.record_combo.addItems(sorted(self.region_data(region), reverse=True))
+        self.record_combo.setCurrentIndex(-1)
+
+    def select_stored_date(self, date_str):
+        date = QDate.fromString(date_str, "yyyy-MM-dd")
+        if date.isValid():
+            # dateChanged loads the record; a date already shown is reloaded here.
+            if date == self.date_input.date():
+                self.load_record(self.region_input.text().strip(), date_str)
+            else:
+                self.date_input.setDate(date)
+
+    def date_changed(self, date):
+        region = self.region_input.text().strip()
+        if region:
+            self.load_record(region, date.toString("yyyy-MM-dd"))
+
+    def load_record(self, region, date_str):
+        """
+        Fill the form from the stored record of (region, date), if there is one.
+
+        Returns False, leaving the form as it is, when nothing is stored.
+        """
+        record = self.region_data(region).get(date_str)
+        if not isinstance(record, dict):
+            return False
+        self.sync_label.clear()
+        edits = (self.age_input, self.pop_input, self.le_input)
+        keys = ("MeanAge", "Population", "AvgLifeExpectancy")
+        for edit, key in zip(edits, keys):
+            edit.blockSignals(True)
+            value = safe_float(record.get(key), None)
+            edit.setText("" if value is None else f"{value:.12g}")
+            edit.blockSignals(False)
+        self.record_params_changed()
+        domains = record.get("domains")
+        self.domain_model.set_rows(
+            (name, d.get("TLIPHS", 0.0), d.get("TLIPHS_unit", "Day(s)"), d.get("Mortality", 0.0))
+            for name, d in (domains.items() if isinstance(domains, dict) else ())
+            if isinstance(d, dict)
+        )
+        return True
+
+    @timed("app.poll_changes")
+    def poll_changes(self):
+        """Pick up records and regions that other instances wrote to the shared store."""
+        version = self.store.data_version()
+        if version == self.data_version:
+            return
+        self.data_version = version
+        changes = self.store.changes_since(self.change_cursor)
+        if changes is None:
+            # Too far behind the change log: treat every region as changed.
+            self.change_cursor = self.store.last_change()
+            listed = [self.region_list.item(i).text() for i in range(self.region_list.count())]
+            self.apply_changes({(region, None) for region in set(listed) | set(self.store.regions())})
+            return
+        if not changes:
+            return
+        self.change_cursor = changes[-1].seq
+        changed = {(c.region, c.date) for c in changes if c.writer != self.store.writer_id}
+        if changed:
+            self.apply_changes(changed)
+
+    def apply_changes(self, changed):
+        """
+        Refresh the in-memory copies of changed records.
+
+        changed: set of (region, date) pairs; date None means the whole
+        region (added, deleted or written in bulk). Only the affected
+        records are re-read, and the form is never overwritten: if the
+        record on screen changed, a note says so.
+        """
+        regions = {region for region, _ in changed}
+        whole = {region for region, date in changed if date is None}
+        for region in whole:
+            self.data.pop(region, None)
+        self.series_changed(*whole)
+        for region, date in changed:
+            if date is None or region in whole or region not in self.data:
+                continue
+            record = self.store.get_record(region, date)
+            if record is None:
+                self.data[region].pop(date, None)
+            else:
+                self.data[region][date] = record
+
+        if whole:
+            stored = self.store.regions()
+            for i in reversed(range(self.region_list.count())):
+                name = self.region_list.item(i).text()
+                if name in whole and name not in stored:
+                    self.region_list.takeItem(i)
+            self.region_list.addItems(
+                [r for r in stored if r in whole and not self.region_list.findItems(r, Qt.MatchExactly)])
+
+        current = self.region_input.text().strip()
+        if current in regions:
+            self.refresh_record_dates(current)
+            date_str = self.date_input.date().toString("yyyy-MM-dd")
+            if (current, date_str) in changed or current in whole:
+                self.sync_label.setText(
+                    f"The {current} record for {date_str} was changed by another user; "
+                    f"select it under Stored Records to load the new values.")
+
+        if self.dashboard is not None and self.dashboard.isVisible():
+            if whole:
+                self.dashboard.set_regions(self.store.regions())
+            elif self.dashboard.region_combo.currentText() in regions:
+                self.dashboard.show_region(self.dashboard.region_combo.currentText())
+
+    def record_params_changed(self):
+        self.domain_model.set_params(
+            safe_float(self.age_input.text(), 0.0),
+            safe_float(self.pop_input.text(), 0.0),
+            safe_float(self.le_input.text(), 0.0),
+        )
+
+    def show_live_nlhi(self, nlhi):
+        rows = self.domain_model.rows
+        if rows.age > 0 and rows.pop > 0 and rows.le > 0 and rows.n_domains:
+            self.nlhi_label.setText(f"NLHI (not yet saved): {nlhi:.4f}")
+        else:
+            self.nlhi_label.setText("NLHI (not yet saved): enter age, population, life expectancy and a named domain")
 
     def change_credentials(self):
         dlg = ChangeCredentialsDialog(self.username)
         dlg.exec_()
 
     
+    @timed("app.calculate_and_save")
     def calculate_and_save(self):
         region = self.region_input.text().strip()
         if not region:
@@ -413,142 +645,222 @@ class NLHIApp(QWidget):
         if le <= age:
             QMessageBox.warning(self, "Note", "Average Life Expectancy is less than or equal to Mean Age. The mortality term may be zero or negative. Proceeding.")
 
-        
-        dsavs = {}
-        domains_detail = {}
-        N = 0
-
-        for row in self.domain_rows:
-            name = row["name_edit"].text().strip()
-            if not name:
-                
-                continue
+        record = compute_record(age, pop, le, self.domain_model.rows)
 
-            tliphs_val = safe_float(row["tliphs_edit"].text(), 0.0)
-            unit = row["unit_combo"].currentText()
-            mortality = safe_float(row["mort_edit"].text(), 0.0)
-
-            tliphs_years = tliphs_val * UNIT_CONVERSION.get(unit, 1.0)
-            dstlya = tliphs_years + (mortality * (le - age))
-            
-            dsav = (dstlya * 100.0) / (age * pop) if (age * pop) != 0 else 0.0
-
-            dsavs[name] = dsav
-            domains_detail[name] = {
-                "TLIPHS": tliphs_val,
-                "TLIPHS_unit": unit,
-                "Mortality": mortality,
-                "TLIPHS_years": tliphs_years,
-                "DSTLYA": dstlya,
-                "DSAV": dsav,
-            }
-            N += 1
-
-        if N == 0:
+        if record is None:
             QMessageBox.warning(self, "No Domains", "Add at least one domain before calculating.")
             return
 
-        nlhi = sum(dsavs.values()) / float(N)
+        nlhi = record["NLHI"]
 
         
-        if region not in self.data:
-            self.data[region] = {}
+        if not self.region_list.findItems(region, Qt.MatchExactly):
             self.region_list.addItem(region)
-            self.save_regions()
 
-        
-        record = {
-            "MeanAge": age,
-            "Population": pop,
-            "AvgLifeExpectancy": le,
-            "domains": domains_detail,
-            "DSAV": dsavs, 
-            "NLHI": nlhi,
-        }
-        self.data[region][date_str] = record
-
-        self.save_data()
+        if region in self.data:
+            self.data[region][date_str] = record
+
+        self.writer.submit(
+            self.save_record, region, date_str, record,
+            on_done=lambda _: self.record_saved(region, date_str, nlhi),
+            on_error=self.task_failed,
+        )
 
+    @timed("app.save_record")
+    def save_record(self, task, region, date_str, record):
+        """Worker-thread part of Calculate and Save: store write plus series update."""
+        version = self.store.put_record(region, date_str, record)
+        task.report(1, 2)
+        self.series_cache.record_saved(region, date_str, record, version)
+        task.report(2, 2)
+
+    def record_saved(self, region, date_str, nlhi):
+        if self.region_input.text().strip() == region and self.record_combo.findText(date_str) < 0:
+            self.refresh_record_dates(region)
+        if self.dashboard is not None and self.dashboard.isVisible():
+            if self.dashboard.region_combo.findText(region) < 0:
+                self.dashboard.set_regions(self.store.regions())
+            elif self.dashboard.region_combo.currentText() == region:
+                self.dashboard.show_region(region)
         QMessageBox.information(
             self, "Success",
             f"Data saved for {region} on {date_str}.\nNLHI = {nlhi:.4f}"
         )
 
-    def save_data(self):
-        with open(DATA_FILE, "w") as f:
-            json.dump(self.data, f, indent=2)
+    def recompute_all_regions(self):
+        confirm = QMessageBox.question(
+            self, "Recompute All",
+            "Recompute DSTLYA, DSAV and NLHI for every stored record with the current unit conversions?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+        progress = QProgressDialog("Recomputing all regions...", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        self.recompute_button.setEnabled(False)
+
+        def finish(summary=None):
+            progress.close()
+            self.recompute_button.setEnabled(True)
+            # Every region changed on disk; drop the in-memory copies.
+            self.data = {}
+            if self.dashboard is not None and self.dashboard.isVisible():
+                self.dashboard.set_regions(self.store.regions())
+            if summary is not None:
+                lines = [f"Recomputed {summary['records']} records in {summary['regions']} regions "
+                         f"in {summary['seconds']:.2f}s."]
+                if summary["skipped"]:
+                    lines.append(f"Skipped {summary['skipped']} record(s) without domain inputs.")
+                for w in summary["workers"]:
+                    lines.append(f"Worker {w['pid']}: {w['regions']} regions, "
+                                 f"{w['records']} records, {w['seconds']:.2f}s")
+                QMessageBox.information(self, "Recompute All", "\n".join(lines))
+
+        def update(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+
+        task = self.submit_bulk(
+            lambda task: recompute_all(self.store, progress=task.report),
+            on_done=finish,
+            on_progress=update,
+            on_cancel=lambda: finish(),
+            on_error=lambda msg: (finish(), self.task_failed(msg)),
+        )
+        progress.canceled.connect(task.cancel)
+
+    def analyze_uncertainty(self):
+        confirm = QMessageBox.question(
+            self, "Uncertainty Bands",
+            "Sample the inputs of every stored record within their confidence intervals and store "
+            "NLHI percentile bands and sensitivities? The dashboard shows the bands.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+        progress = QProgressDialog("Analyzing all regions...", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        self.uncertainty_button.setEnabled(False)
+
+        def finish(summary=None):
+            progress.close()
+            self.uncertainty_button.setEnabled(True)
+            self.data = {}
+            if self.dashboard is not None and self.dashboard.isVisible():
+                self.dashboard.set_regions(self.store.regions())
+            if summary is not None:
+                lines = [f"Stored NLHI bands for {summary['records']} records in {summary['regions']} regions "
+                         f"in {summary['seconds']:.2f}s."]
+                if summary["skipped"]:
+                    lines.append(f"Skipped {summary['skipped']} record(s) without domain inputs.")
+                QMessageBox.information(self, "Uncertainty Bands", "\n".join(lines))
+
+        def update(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+
+        task = self.submit_bulk(
+            self.analyze_records,
+            on_done=finish,
+            on_progress=update,
+            on_cancel=lambda: finish(),
+            on_error=lambda msg: (finish(), self.task_failed(msg)),
+        )
+        progress.canceled.connect(task.cancel)
+
+    def analyze_records(self, task):
+        """Worker-thread part of Uncertainty Bands."""
+        from nlhi_uncertainty import analyze_all
+
+        return analyze_all(self.store, progress=task.report)
+
+    def import_domain_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Domain Rows", "",
+            "Data files (*.csv *.xlsx *.xlsm *.parquet);;All files (*)"
+        )
+        if not path:
+            return
+        progress = QProgressDialog(f"Importing {os.path.basename(path)}...", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        self.import_button.setEnabled(False)
+
+        def finish(summary=None):
+            progress.close()
+            self.import_button.setEnabled(True)
+            self.data = {}
+            listed = {self.region_list.item(i).text() for i in range(self.region_list.count())}
+            self.region_list.addItems([r for r in self.store.regions() if r not in listed])
+            if self.dashboard is not None and self.dashboard.isVisible():
+                self.dashboard.set_regions(self.store.regions())
+            if summary is not None:
+                lines = [f"Imported {summary['records']} records for {summary['regions']} regions "
+                         f"from {summary['rows']} rows in {summary['seconds']:.2f}s."]
+                if summary["rejected_rows"]:
+                    lines.append(f"Skipped {summary['rejected_rows']} row(s) with missing or non-positive "
+                                 f"age, population or life expectancy.")
+                QMessageBox.information(self, "Import", "\n".join(lines))
+
+        def update(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+
+        task = self.submit_bulk(
+            self.import_rows, path,
+            on_done=finish,
+            on_progress=update,
+            on_cancel=lambda: finish(),
+            on_error=lambda msg: (finish(), self.task_failed(msg)),
+        )
+        progress.canceled.connect(task.cancel)
+
+    def import_rows(self, task, path):
+        """Worker-thread part of Import File: read, compute and store in one transaction."""
+        from nlhi_import import import_file
+
+        return import_file(self.store, path, progress=task.report)
+
+    def submit_bulk(self, fn, *args, **kwargs):
+        """Queue a long store write on `writer` that closing the window may cancel."""
+        task = self.writer.submit(fn, *args, **kwargs)
+        self.bulk_tasks.add(task)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(lambda *_, t=task: self.bulk_tasks.discard(t))
+        return task
+
+    def task_failed(self, message):
+        QMessageBox.warning(self, "Error", message)
+
+    def closeEvent(self, event):
+        self.sync_timer.stop()
+        self.tasks.cancel_all()
+        # Bulk writes stop at their next progress report (each is one
+        # transaction, so nothing is half done); queued saves still run.
+        for task in list(self.bulk_tasks):
+            task.cancel()
+        self.writer.wait()
+        super().closeEvent(event)
 
     
+    @timed("app.view_dashboard")
     def view_dashboard(self):
-        if not self.data:
+        regions = self.store.regions()
+        if not regions:
             QMessageBox.warning(self, "No Data", "No data available to display.")
             return
 
-        
-        for region in self.data:
-            if not self.data[region]:
-                continue
-            
-            dates = sorted(self.data[region].keys())
-            
-            nlhi_values = [self._extract_nlhi(self.data[region][d]) for d in dates]
-
-            
-            domain_order = []
-            domain_set = set()
-            for d in dates:
-                entry = self.data[region][d]
-                dsav_map = self._extract_dsav_map(entry)
-                for dom in dsav_map.keys():
-                    if dom not in domain_set:
-                        domain_set.add(dom)
-                        domain_order.append(dom)
-
-            if not domain_order:
-                continue
-
-            
-            matrix = np.zeros((len(dates), len(domain_order)))
-            for i, d in enumerate(dates):
-                dsav_map = self._extract_dsav_map(self.data[region][d])
-                for j, dom in enumerate(domain_order):
-                    matrix[i, j] = dsav_map.get(dom, 0.0)
-
-            
-            fig, axs = plt.subplots(2, 1, figsize=(12, 8))
-            axs[0].plot(dates, nlhi_values, marker='o')
-            axs[0].set_title(f"NLHI Over Time - {region}")
-            axs[0].set_ylabel("NLHI (avg DSAV %)")
-            axs[0].grid(True)
-
-            im = axs[1].imshow(matrix.T, aspect='auto', cmap='viridis')
-            axs[1].set_title("DSAV Heatmap (Domains × Time)")
-            axs[1].set_yticks(np.arange(len(domain_order)))
-            axs[1].set_yticklabels(domain_order)
-            axs[1].set_xticks(np.arange(len(dates)))
-            axs[1].set_xticklabels(dates, rotation=45, ha='right')
-            fig.colorbar(im, ax=axs[1], orientation='vertical', label='DSAV (%)')
-            plt.tight_layout()
-            plt.show()
-
-    def _extract_nlhi(self, entry):
-        
-        if isinstance(entry, dict):
-            if "NLHI" in entry:
-                return safe_float(entry["NLHI"], 0.0)
-            if "NLCHI" in entry:
-                return safe_float(entry["NLCHI"], 0.0)
-        return 0.0
-
-    def _extract_dsav_map(self, entry):
-        
-        if isinstance(entry, dict):
-            if "DSAV" in entry and isinstance(entry["DSAV"], dict):
-                return {str(k): safe_float(v, 0.0) for k, v in entry["DSAV"].items()}
-            if "domains" in entry and isinstance(entry["domains"], dict):
-                return {str(k): safe_float(v.get("DSAV", 0.0), 0.0) for k, v in entry["domains"].items()}
-        return {}
-
+        if self.dashboard is None:
+            self.dashboard = DashboardDialog(self.series_cache, regions, self.tasks, self)
+        else:
+            self.dashboard.set_regions(regions)
+        region = self.region_input.text().strip()
+        if region in regions:
+            self.dashboard.region_combo.setCurrentText(region)
+        self.dashboard.show()
+        self.dashboard.raise_()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -556,4 +868,5 @@ if __name__ == '__main__':
     if login.exec_() == QDialog.Accepted and login.successful_login:
         window = NLHIApp(login.username_input.text().strip())
         window.show()
+        window.warm_up()
         sys.exit(app.exec_())
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from nlhi_columnar import columns_to_records, load_columns, records_to_columns, save_columns
+
+pytestmark = pytest.mark.benchmark(group="columnar")
+
+# Containers compared against the legacy nlhi_data.json file.
+PATHS = ("export.npz", "export.parquet", "export_npy")
+
+
+@pytest.fixture(scope="module")
+def columns(records):
+    return records_to_columns((region, d, r) for region, entries in records.items() for d, r in entries.items())[0]
+
+
+@pytest.fixture
+def json_file(tmp_path, records):
+    path = tmp_path / "nlhi_data.json"
+    with open(path, "w") as f:
+        json.dump(records, f, indent=2)
+    return path
+
+
+def bench_load_json(benchmark, json_file):
+    benchmark.extra_info["bytes"] = json_file.stat().st_size
+
+    def run():
+        with open(json_file) as f:
+            return json.load(f)
+
+    benchmark(run)
+
+
+@pytest.mark.parametrize("name", PATHS)
+def bench_load_dsav_column(benchmark, tmp_path, columns, name):
+    # Analytics read: one column, e.g. mean DSAV over every domain row.
+    path = str(tmp_path / name)
+    benchmark.extra_info["bytes"] = save_columns(columns, path)
+    benchmark(lambda: float(load_columns(path)["dsav"].sum()))
+
+
+@pytest.mark.parametrize("name", PATHS)
+def bench_load_records(benchmark, tmp_path, columns, name):
+    path = str(tmp_path / name)
+    save_columns(columns, path)
+    benchmark(lambda: list(columns_to_records(load_columns(path))))
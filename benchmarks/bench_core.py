@@ -0,0 +1,28 @@
+import pytest
+
+from nlhi_core import compute_batch, compute_domain_arrays, compute_record
+
+pytestmark = pytest.mark.benchmark(group="core")
+
+
+def bench_compute_batch(benchmark, rows):
+    _, records = benchmark(
+        compute_batch, rows["region"], rows["date"], rows["domain"], rows["tliphs"], rows["unit"],
+        rows["mortality"], rows["age"], rows["population"], rows["le"],
+    )
+    assert len(records["nlhi"]) == len(set(zip(rows["region"], rows["date"])))
+
+
+def bench_compute_domain_arrays(benchmark, rows):
+    benchmark(compute_domain_arrays, rows["tliphs"], rows["unit"], rows["mortality"],
+              rows["age"], rows["population"], rows["le"])
+
+
+def bench_compute_record_loop(benchmark, region_records):
+    # The per-record path used by Calculate and Save and by recompute.
+    inputs = [
+        (r["MeanAge"], r["Population"], r["AvgLifeExpectancy"],
+         [(name, d["TLIPHS"], d["TLIPHS_unit"], d["Mortality"]) for name, d in r["domains"].items()])
+        for r in region_records.values()
+    ]
+    benchmark(lambda: [compute_record(*args) for args in inputs])
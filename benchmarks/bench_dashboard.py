@@ -0,0 +1,67 @@
+import pytest
+
+from nlhi_migrate import normalize_record
+from nlhi_plot import prepare_region
+from nlhi_series import RegionSeries, SeriesCache, extract_dsav_map
+from nlhi_store import RecordStore
+
+pytestmark = pytest.mark.benchmark(group="dashboard")
+
+
+def bench_extract_dsav_map(benchmark, region_records):
+    entries = list(region_records.values())
+    benchmark(lambda: [extract_dsav_map(e) for e in entries])
+
+
+def bench_normalize_record(benchmark, region_records):
+    # Paid once per record by the store migration instead of on every read.
+    entries = list(region_records.values())
+    benchmark(lambda: [normalize_record(e) for e in entries])
+
+
+def bench_series_from_records(benchmark, region_records):
+    # The matrix construction view_dashboard used to repeat on every click.
+    benchmark(RegionSeries.from_records, region_records)
+
+
+def bench_series_upsert(benchmark, region_records):
+    series = RegionSeries.from_records(region_records)
+    date, record = next(reversed(region_records.items()))
+    benchmark(series.upsert, date, record)
+
+
+def bench_series_bytes_roundtrip(benchmark, region_records):
+    series = RegionSeries.from_records(region_records)
+    benchmark(lambda: RegionSeries.from_bytes(series.to_bytes()))
+
+
+def bench_series_cache_get(benchmark, tmp_path, region_records):
+    # Reopening the dashboard on an unchanged region: a memo hit.
+    with RecordStore(str(tmp_path / "bench.sqlite3")) as store:
+        store.put_records(("Region 0", d, r) for d, r in region_records.items())
+        cache = SeriesCache(store)
+        cache.get("Region 0")
+        benchmark(cache.get, "Region 0")
+
+
+def bench_prepare_region(benchmark, region_records):
+    benchmark(prepare_region, RegionSeries.from_records(region_records))
+
+
+def bench_render_agg(benchmark, region_records):
+    pytest.importorskip("matplotlib")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from nlhi_plot import RegionPlot
+
+    fig = Figure(figsize=(12, 8))
+    canvas = FigureCanvasAgg(fig)
+    plot = RegionPlot(fig)
+    series = RegionSeries.from_records(region_records)
+
+    def run():
+        plot.draw("Region 0", series)
+        canvas.draw()
+
+    benchmark(run)
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from nlhi_store import RecordStore
+
+pytestmark = pytest.mark.benchmark(group="store")
+
+
+@pytest.fixture
+def store(tmp_path):
+    with RecordStore(str(tmp_path / "bench.sqlite3")) as s:
+        yield s
+
+
+@pytest.fixture
+def filled_store(store, records):
+    store.put_records((region, d, r) for region, entries in records.items() for d, r in entries.items())
+    return store
+
+
+def bench_put_records_bulk(benchmark, tmp_path, records):
+    items = [(region, d, r) for region, entries in records.items() for d, r in entries.items()]
+    counter = iter(range(10**6))
+
+    def run():
+        with RecordStore(str(tmp_path / f"bulk{next(counter)}.sqlite3")) as s:
+            s.put_records(items)
+
+    benchmark.pedantic(run, rounds=3, iterations=1)
+
+
+def bench_put_record_single(benchmark, filled_store, region_records):
+    # Calculate and Save: one record into an already large store.
+    date, record = next(iter(region_records.items()))
+    benchmark(filled_store.put_record, "Region 0", date, record)
+
+
+def bench_region_records(benchmark, filled_store):
+    benchmark(filled_store.region_records, "Region 0")
+
+
+def bench_load_all(benchmark, filled_store):
+    benchmark(filled_store.load_all)
+
+
+def bench_legacy_json_roundtrip(benchmark, tmp_path, records):
+    # The old save_data/__init__ path: full rewrite and full reload of nlhi_data.json.
+    path = tmp_path / "nlhi_data.json"
+
+    def run():
+        with open(path, "w") as f:
+            json.dump(records, f, indent=2)
+        with open(path) as f:
+            return json.load(f)
+
+    benchmark(run)
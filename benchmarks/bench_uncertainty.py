@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from nlhi_recompute import RecordNotRecomputable
+from nlhi_uncertainty import analyze_inputs, record_inputs, row_percentiles
+
+pytestmark = pytest.mark.benchmark(group="uncertainty")
+
+
+def _inputs(entries):
+    rows = []
+    for record in entries.values():
+        try:
+            rows.append(record_inputs(record))
+        except RecordNotRecomputable:
+            pass
+    return np.array(rows)
+
+
+def bench_analyze_region(benchmark, region_records):
+    # 20,000 draws per record through the NLHI formula, percentiles and shares.
+    inputs = _inputs(region_records)
+    benchmark(analyze_inputs, inputs)
+
+
+def bench_row_percentiles(benchmark):
+    y = np.random.default_rng(0).standard_normal((50, 20_000))
+    benchmark(lambda: row_percentiles(y.copy(), (2.5, 50.0, 97.5)))
+
+
+def bench_numpy_percentile(benchmark):
+    # Reference for bench_row_percentiles.
+    y = np.random.default_rng(0).standard_normal((50, 20_000))
+    benchmark(lambda: np.percentile(y.copy(), (2.5, 50.0, 97.5), axis=1))
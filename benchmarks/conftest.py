@@ -0,0 +1,34 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_records, make_rows, scale  # noqa: E402
+
+# The suite needs the pytest-benchmark plugin (see requirements-dev.txt).
+if importlib.util.find_spec("pytest_benchmark") is None:
+    collect_ignore_glob = ["bench_*.py"]
+
+
+@pytest.fixture(scope="session")
+def sizes():
+    return scale()
+
+
+@pytest.fixture(scope="session")
+def rows(sizes):
+    return make_rows(*sizes)
+
+
+@pytest.fixture(scope="session")
+def records(sizes):
+    return make_records(*sizes)
+
+
+@pytest.fixture(scope="session")
+def region_records(records):
+    return next(iter(records.values()))
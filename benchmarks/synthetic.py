@@ -0,0 +1,63 @@
+"""
+Synthetic NLHI data for the benchmark suite.
+
+Sizes are N regions x M dates x K domains. NLHI_BENCH_SCALE selects a
+preset ("small" by default so the suite stays quick in CI; "medium" and
+"large" are meant for regression runs on a fixed machine).
+"""
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+from nlhi_core import UNIT_NAMES, compute_record
+
+SCALES = {
+    "small": (5, 60, 10),
+    "medium": (50, 365, 30),
+    "large": (200, 3650, 60),
+}
+
+
+def scale():
+    """(n_regions, n_dates, n_domains) for the current NLHI_BENCH_SCALE."""
+    return SCALES[os.environ.get("NLHI_BENCH_SCALE", "small")]
+
+
+def date_strings(n_dates, start=date(2015, 1, 1)):
+    return [(start + timedelta(days=i)).isoformat() for i in range(n_dates)]
+
+
+def make_rows(n_regions, n_dates, n_domains, seed=0):
+    """Flat domain-row columns, as read from an input file (see nlhi_io.INPUT_COLUMNS)."""
+    rng = np.random.default_rng(seed)
+    n = n_regions * n_dates * n_domains
+    regions = np.repeat([f"Region {r}" for r in range(n_regions)], n_dates * n_domains)
+    dates = np.tile(np.repeat(date_strings(n_dates), n_domains), n_regions)
+    domains = np.tile([f"Domain {k}" for k in range(n_domains)], n_regions * n_dates)
+    return {
+        "region": regions,
+        "date": dates,
+        "domain": domains,
+        "tliphs": rng.uniform(0, 5000, n),
+        "unit": np.asarray(UNIT_NAMES)[rng.integers(0, len(UNIT_NAMES), n)],
+        "mortality": rng.integers(0, 50, n).astype(float),
+        "age": np.repeat(rng.uniform(30, 45, n_regions * n_dates), n_domains),
+        "population": np.repeat(rng.uniform(1e4, 5e5, n_regions * n_dates), n_domains),
+        "le": np.repeat(rng.uniform(75, 85, n_regions * n_dates), n_domains),
+    }
+
+
+def make_records(n_regions, n_dates, n_domains, seed=0):
+    """Stored records as {region: {date: record}}, the nlhi_data.json layout."""
+    rng = np.random.default_rng(seed)
+    dates = date_strings(n_dates)
+    data = {}
+    for r in range(n_regions):
+        region = data[f"Region {r}"] = {}
+        for d in dates:
+            domains = [(f"Domain {k}", float(rng.uniform(0, 5000)), UNIT_NAMES[k % len(UNIT_NAMES)],
+                        float(rng.integers(0, 50))) for k in range(n_domains)]
+            region[d] = compute_record(float(rng.uniform(30, 45)), float(rng.uniform(1e4, 5e5)),
+                                       float(rng.uniform(75, 85)), domains)
+    return data
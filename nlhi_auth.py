@@ -0,0 +1,242 @@
+"""
+SQLite credential store for the NLHI login.
+
+One row per user, looked up through the primary-key index, so login and
+registration cost the same with ten accounts or ten thousand, and every
+change is a single transaction. Passwords are hashed with hashlib.scrypt
+and a random per-user salt; the scrypt cost is calibrated once per store
+so that one hash takes about `budget` seconds on this machine, and saved
+with the store so every login uses the same cost.
+
+Hashes are stored as self-describing strings:
+
+    scrypt$<n>$<r>$<p>$<salt, base64>$<key, base64>
+    sha256$<hex>                         (imported from credentials.json)
+
+A hash that is not at the store's current cost, including the legacy
+unsalted SHA-256 ones, is replaced by a fresh scrypt hash the next time
+the user logs in successfully.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import time
+from collections import namedtuple
+
+
+CREDENTIALS_DB = "credentials.sqlite3"
+
+# Target time for one password hash, in seconds.
+DEFAULT_BUDGET = 0.25
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+ScryptParams = namedtuple("ScryptParams", "n r p")
+
+# Calibration starts here and never goes below it (about 16 MiB of memory).
+MIN_PARAMS = ScryptParams(2 ** 14, 8, 1)
+MAX_N = 2 ** 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class CredentialError(ValueError):
+    """Raised for an invalid registration or credentials change."""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, params):
+    n, r, p = params
+    # OpenSSL needs about 128 * r * (n + p) bytes; leave some headroom.
+    maxmem = 128 * r * (n + p + 2) + (1 << 20)
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=KEY_BYTES)
+
+
+def hash_password(password, params=MIN_PARAMS):
+    """Encoded scrypt hash of `password` with a new random salt."""
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, params)
+    return f"scrypt${params.n}${params.r}${params.p}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(password, encoded):
+    """Check `password` against an encoded hash in constant time."""
+    scheme, _, rest = encoded.partition("$")
+    if scheme == "scrypt":
+        n, r, p, salt, key = rest.split("$")
+        params = ScryptParams(int(n), int(r), int(p))
+        candidate = _scrypt(password, base64.b64decode(salt), params)
+        return hmac.compare_digest(candidate, base64.b64decode(key))
+    if scheme == "sha256":
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, rest)
+    return False
+
+
+def hash_params(encoded):
+    """ScryptParams of an encoded hash, or None for a non-scrypt hash."""
+    parts = encoded.split("$")
+    if parts[0] != "scrypt":
+        return None
+    return ScryptParams(int(parts[1]), int(parts[2]), int(parts[3]))
+
+
+def calibrate(budget=DEFAULT_BUDGET, r=MIN_PARAMS.r, p=MIN_PARAMS.p, max_n=MAX_N):
+    """
+    Largest power-of-two scrypt n whose hash time stays within `budget` seconds.
+
+    Never returns less than MIN_PARAMS.n, even on a machine too slow to meet
+    the budget.
+    """
+    n = MIN_PARAMS.n
+    salt = secrets.token_bytes(SALT_BYTES)
+    while n < max_n:
+        start = time.perf_counter()
+        _scrypt("calibration", salt, ScryptParams(n, r, p))
+        elapsed = time.perf_counter() - start
+        # Doubling n doubles the time; stop if the next step would overshoot.
+        if elapsed * 2 > budget:
+            break
+        n *= 2
+    return ScryptParams(n, r, p)
+
+
+class CredentialStore:
+    """Usernames and password hashes in one SQLite file."""
+
+    def __init__(self, path=CREDENTIALS_DB, budget=DEFAULT_BUDGET, params=None, timeout=30.0):
+        self.path = path
+        self.budget = budget
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        self._params = params
+        self._dummy = None
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def params(self):
+        """The store's scrypt cost, calibrated against `budget` on first use."""
+        if self._params is None:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'scrypt'").fetchone()
+            if row is not None:
+                self._params = ScryptParams(*json.loads(row[0]))
+            else:
+                self.recalibrate()
+        return self._params
+
+    def recalibrate(self, budget=None):
+        """Measure this machine again; existing hashes are upgraded at their next login."""
+        if budget is not None:
+            self.budget = budget
+        self._params = calibrate(self.budget)
+        self._dummy = None
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('scrypt', ?)",
+                               (json.dumps(list(self._params)),))
+        return self._params
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def has_user(self, username):
+        cur = self._conn.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+        return cur.fetchone() is not None
+
+    def _hash(self, username):
+        row = self._conn.execute("SELECT hash FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def register(self, username, password):
+        """Add a user; raises CredentialError for empty fields or a taken name."""
+        if not username or not password:
+            raise CredentialError("Username and password cannot be empty.")
+        encoded = hash_password(password, self.params)
+        try:
+            with self._conn:
+                self._conn.execute("INSERT INTO users (username, hash) VALUES (?, ?)", (username, encoded))
+        except sqlite3.IntegrityError:
+            raise CredentialError("Username already exists.") from None
+
+    def verify(self, username, password):
+        """
+        True if the password matches; upgrades an outdated hash on success.
+
+        An unknown user costs one hash too, so response time does not reveal
+        which usernames exist.
+        """
+        encoded = self._hash(username)
+        if encoded is None:
+            if self._dummy is None:
+                self._dummy = hash_password(secrets.token_hex(8), self.params)
+            verify_password(password, self._dummy)
+            return False
+        if not verify_password(password, encoded):
+            return False
+        if hash_params(encoded) != self.params:
+            with self._conn:
+                self._conn.execute("UPDATE users SET hash = ? WHERE username = ?",
+                                   (hash_password(password, self.params), username))
+        return True
+
+    def change_credentials(self, username, new_username, new_password):
+        """Rename a user and set a new password in one transaction."""
+        if not new_username or not new_password:
+            raise CredentialError("Username and password cannot be empty.")
+        encoded = hash_password(new_password, self.params)
+        try:
+            with self._conn:
+                cur = self._conn.execute("UPDATE users SET username = ?, hash = ? WHERE username = ?",
+                                         (new_username, encoded, username))
+                if cur.rowcount == 0:
+                    raise CredentialError(f"Unknown user: {username!r}")
+        except sqlite3.IntegrityError:
+            raise CredentialError("Username already exists.") from None
+
+    def import_legacy(self, path):
+        """
+        Copy users from the old credentials.json ({username: sha256 hex}) once.
+
+        Users already in the store are kept. Returns the number imported.
+        """
+        if not os.path.exists(path):
+            return 0
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return 0
+        with open(path, "r") as f:
+            try:
+                credentials = json.load(f)
+            except json.JSONDecodeError:
+                credentials = {}
+        with self._conn:
+            cur = self._conn.executemany(
+                "INSERT OR IGNORE INTO users (username, hash) VALUES (?, ?)",
+                [(user, f"sha256${digest}") for user, digest in credentials.items() if isinstance(digest, str)],
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+        return cur.rowcount
@@ -0,0 +1,491 @@
+"""
+Command-line entry point for headless NLHI runs.
+
+    python nlhi_cli.py compute input.csv -o out.parquet
+
+Only nlhi_core/nlhi_io are imported, never PyQt5 or matplotlib, so the
+command starts fast on servers without a display.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import nlhi_metrics
+from nlhi_core import compute_domain_arrays
+from nlhi_io import (
+    DEFAULT_CHUNK_SIZE, DOMAIN_COLUMNS, RECORD_COLUMNS, InputFormatError,
+    TableWriter, file_kind, chunk_arrays, iter_chunks, normalize_dates, valid_rows,
+)
+from nlhi_store import STORE_FILE
+
+
+class _Factorizer:
+    """Assign stable integer codes to values seen across many chunks."""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def codes(self, arr):
+        names, inverse = np.unique(arr, return_inverse=True)
+        lookup = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names.tolist()):
+            code = self.index.get(name)
+            if code is None:
+                code = self.index[name] = len(self.values)
+                self.values.append(name)
+            lookup[i] = code
+        return lookup[inverse.reshape(-1)]
+
+
+def compute_file(input_path, output_path, domains_path=None, chunk_size=DEFAULT_CHUNK_SIZE, log=None):
+    """
+    Stream `input_path`, compute NLHI per (region, date) and write the results.
+
+    Record-level results go to `output_path` (.csv, .parquet or .json; the
+    JSON form is the nested {region: {date: record}} layout of nlhi_data.json).
+    Domain-level DSTLYA/DSAV rows are streamed to `domains_path` when given.
+
+    Each chunk is reduced to integer record/domain codes plus DSAV values, so
+    the final grouping matches nlhi_core.compute_batch (a domain repeated
+    within a record keeps its last row) whatever the chunk size. Rows with
+    missing or non-positive age, population or LE are skipped, as the form
+    rejects them; a kept row with an invalid date raises InputFormatError,
+    as `import` does. Returns a summary dict.
+    """
+    start = time.perf_counter()
+    nested = file_kind(output_path) == "json"
+    records = _Factorizer()
+    domains = _Factorizer()
+    rec_parts, dom_parts, dsav_parts, param_parts = [], [], [], []
+    nested_domains = {}
+    n_rows = 0
+    n_rejected = 0
+
+    domain_writer = TableWriter(domains_path, DOMAIN_COLUMNS) if domains_path else None
+    try:
+        for chunk in iter_chunks(input_path, chunk_size):
+            cols = chunk_arrays(chunk)
+            valid = valid_rows(cols)
+            keep = valid & (cols["domain"] != "")
+            normalize_dates(cols, keep, n_rows)
+            n_rows += len(cols["region"])
+            n_rejected += int((~valid).sum())
+            cols = {k: v[keep] for k, v in cols.items()}
+
+            tliphs_years, dstlya, dsav = compute_domain_arrays(
+                cols["tliphs"], cols["unit"], cols["mortality"],
+                cols["age"], cols["population"], cols["le"],
+            )
+            rec_codes = records.codes(np.char.add(np.char.add(cols["region"], "\x1f"), cols["date"]))
+            rec_parts.append(rec_codes)
+            dom_parts.append(domains.codes(cols["domain"]))
+            dsav_parts.append(dsav)
+            param_parts.append(np.column_stack((cols["age"], cols["population"], cols["le"])))
+
+            if nested:
+                for i, key in enumerate(rec_codes.tolist()):
+                    nested_domains.setdefault(key, {})[str(cols["domain"][i])] = {
+                        "TLIPHS": float(cols["tliphs"][i]),
+                        "TLIPHS_unit": str(cols["unit"][i]),
+                        "Mortality": float(cols["mortality"][i]),
+                        "TLIPHS_years": float(tliphs_years[i]),
+                        "DSTLYA": float(dstlya[i]),
+                        "DSAV": float(dsav[i]),
+                    }
+
+            if domain_writer is not None:
+                domain_writer.write({
+                    "region": cols["region"],
+                    "date": cols["date"],
+                    "domain": cols["domain"],
+                    "tliphs": cols["tliphs"],
+                    "unit": cols["unit"],
+                    "mortality": cols["mortality"],
+                    "tliphs_years": tliphs_years,
+                    "dstlya": dstlya,
+                    "dsav": dsav,
+                })
+            if log is not None:
+                log(f"processed {n_rows} rows, {len(records.values)} records")
+    finally:
+        if domain_writer is not None:
+            domain_writer.close()
+
+    n_records = len(records.values)
+    if rec_parts:
+        rec = np.concatenate(rec_parts)
+        dom = np.concatenate(dom_parts)
+        dsav = np.concatenate(dsav_parts)
+        params = np.concatenate(param_parts)
+    else:
+        rec = dom = np.zeros(0, dtype=np.int64)
+        dsav = np.zeros(0)
+        params = np.zeros((0, 3))
+
+    # Last row wins for a repeated (record, domain) pair and for the record parameters.
+    pair = rec * max(len(domains.values), 1) + dom
+    _, last_pair = np.unique(pair[::-1], return_index=True)
+    last_pair = len(pair) - 1 - last_pair
+    counts = np.bincount(rec[last_pair], minlength=n_records)
+    sums = np.bincount(rec[last_pair], weights=dsav[last_pair], minlength=n_records)
+    last_param = np.zeros(n_records, dtype=np.int64)
+    with_rows, last_row = np.unique(rec[::-1], return_index=True)
+    last_param[with_rows] = len(rec) - 1 - last_row
+    params = params[last_param]
+
+    keys = [tuple(v.split("\x1f", 1)) for v in records.values]
+    order = sorted(range(n_records), key=keys.__getitem__)
+    nlhi = sums / np.maximum(counts, 1)
+
+    if nested:
+        data = {}
+        for i in order:
+            region, date = keys[i]
+            detail = nested_domains[i]
+            data.setdefault(region, {})[date] = {
+                "MeanAge": float(params[i, 0]),
+                "Population": float(params[i, 1]),
+                "AvgLifeExpectancy": float(params[i, 2]),
+                "domains": detail,
+                "DSAV": {name: d["DSAV"] for name, d in detail.items()},
+                "NLHI": float(nlhi[i]),
+            }
+        if output_path == "-":
+            json.dump(data, sys.stdout)
+        else:
+            with open(output_path, "w") as f:
+                json.dump(data, f)
+    else:
+        with TableWriter(output_path, RECORD_COLUMNS) as writer:
+            writer.write({
+                "region": [keys[i][0] for i in order],
+                "date": [keys[i][1] for i in order],
+                "age": params[order, 0],
+                "population": params[order, 1],
+                "le": params[order, 2],
+                "n_domains": counts[order],
+                "nlhi": nlhi[order],
+            })
+
+    return {
+        "rows": n_rows,
+        "rejected_rows": n_rejected,
+        "records": n_records,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def cmd_compute(args):
+    log = (lambda msg: print(msg, file=sys.stderr)) if args.verbose else None
+    with nlhi_metrics.timer("cli.compute") as span:
+        summary = compute_file(args.input, args.output, args.domains, args.chunk_size, log)
+        for path in (args.output, args.domains):
+            if path and path != "-":
+                span.add_bytes(os.path.getsize(path))
+    if summary["rejected_rows"]:
+        print(f"Skipped {summary['rejected_rows']} row(s) with missing or non-positive "
+              f"age, population or life expectancy.", file=sys.stderr)
+    if args.verbose:
+        print(f"{summary['records']} records from {summary['rows']} rows "
+              f"in {summary['seconds']:.2f}s", file=sys.stderr)
+    return 0
+
+
+def _parse_assignments(items, what):
+    out = {}
+    for item in items or []:
+        key, sep, value = item.rpartition("=")
+        if not sep or not key:
+            raise ValueError(f"Expected NAME=VALUE for {what}, got {item!r}")
+        out[key] = float(value)
+    return out
+
+
+def cmd_recompute(args):
+    from nlhi_core import UNIT_CONVERSION
+    from nlhi_recompute import recompute_all
+    from nlhi_store import RecordStore
+
+    unit_conversion = None
+    if args.unit:
+        # Revised values are given per year, like "Week(s)=52.1775".
+        unit_conversion = dict(UNIT_CONVERSION)
+        for unit, per_year in _parse_assignments(args.unit, "--unit").items():
+            if unit not in unit_conversion:
+                raise ValueError(f"Unknown TLIPHS unit: {unit!r}")
+            unit_conversion[unit] = 1.0 / per_year
+    population = _parse_assignments(args.population, "--population") or None
+
+    log = (lambda done, total: print(f"chunk {done}/{total}", file=sys.stderr)) if args.verbose else None
+    with nlhi_metrics.timer("cli.recompute"), RecordStore(args.store) as store:
+        summary = recompute_all(store, args.jobs, args.region or None, unit_conversion, population, log)
+
+    print(f"Recomputed {summary['records']} records in {summary['regions']} regions "
+          f"({summary['chunks']} chunks) in {summary['seconds']:.2f}s")
+    if summary["skipped"]:
+        print(f"Skipped {summary['skipped']} record(s) without recomputable domain inputs.")
+    print(f"{'pid':>8} {'chunks':>6} {'regions':>7} {'records':>8} {'seconds':>8}")
+    for w in summary["workers"]:
+        print(f"{w['pid']:>8} {w['chunks']:>6} {w['regions']:>7} {w['records']:>8} {w['seconds']:>8.2f}")
+    return 0
+
+
+def cmd_uncertainty(args):
+    from nlhi_store import RecordStore
+    from nlhi_uncertainty import analyze_all
+
+    ci = _parse_assignments(args.ci, "--ci")
+    log = (lambda done, total: print(f"chunk {done}/{total}", file=sys.stderr)) if args.verbose else None
+    with nlhi_metrics.timer("cli.uncertainty"), RecordStore(args.store) as store:
+        summary = analyze_all(store, args.jobs, args.region or None, ci, args.samples, args.seed, log)
+
+    print(f"Analyzed {summary['records']} records in {summary['regions']} regions "
+          f"({summary['chunks']} chunks) with {args.samples} samples each in {summary['seconds']:.2f}s")
+    if summary["skipped"]:
+        print(f"Skipped {summary['skipped']} record(s) without domain inputs.")
+    print(f"{'pid':>8} {'chunks':>6} {'regions':>7} {'records':>8} {'seconds':>8}")
+    for w in summary["workers"]:
+        print(f"{w['pid']:>8} {w['chunks']:>6} {w['regions']:>7} {w['records']:>8} {w['seconds']:>8.2f}")
+    return 0
+
+
+def cmd_import(args):
+    from nlhi_import import import_file
+    from nlhi_store import RecordStore
+
+    log = (lambda done, total: print(f"rows {done}/{total}", file=sys.stderr)) if args.verbose else None
+    with RecordStore(args.store) as store:
+        summary = import_file(store, args.input, progress=log)
+    print(f"Imported {summary['records']} records for {summary['regions']} regions "
+          f"from {summary['rows']} rows in {summary['seconds']:.2f}s")
+    if summary["rejected_rows"]:
+        print(f"Skipped {summary['rejected_rows']} row(s) with missing or non-positive "
+              f"age, population or life expectancy.")
+    return 0
+
+
+def _groups(args, store):
+    """{group: [regions]} from --group NAME=R1,R2 and --region, default: every region alone."""
+    groups = {}
+    for spec in args.group or []:
+        name, sep, regions = spec.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Expected NAME=REGION[,REGION...], got {spec!r}")
+        groups[name.strip()] = [r.strip() for r in regions.split(",") if r.strip()]
+    for region in args.region or ([] if groups else store.regions()):
+        groups[region] = [region]
+    for regions in groups.values():
+        for region in regions:
+            if not store.has_region(region):
+                raise ValueError(f"Unknown region: {region!r}")
+    return groups
+
+
+def cmd_query(args):
+    import csv
+
+    from nlhi_query import QueryEngine
+    from nlhi_store import RecordStore
+
+    out = csv.writer(sys.stdout, lineterminator="\n")
+    with RecordStore(args.store) as store:
+        engine = QueryEngine(store)
+        groups = _groups(args, store)
+        start = time.perf_counter()
+        if args.domains:
+            out.writerow(["group", "domain", "dsav"])
+            for name, regions in groups.items():
+                means = engine.mean_dsav(regions, args.start, args.end, args.weighted)
+                for domain, value in sorted(means.items()):
+                    out.writerow([name, domain, value])
+        elif args.period:
+            out.writerow(["group", "period", "records", "nlhi"])
+            for name, regions in groups.items():
+                for row in engine.resample(regions, args.period, args.start, args.end, args.weighted):
+                    out.writerow([name, row["period"], row["records"], row["nlhi"]])
+        else:
+            out.writerow(["group", "nlhi"])
+            for name, value in engine.group_means(groups, args.start, args.end, args.weighted).items():
+                out.writerow([name, "" if value is None else value])
+        if args.verbose:
+            print(f"Queried {len(groups)} group(s) in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    return 0
+
+
+def cmd_report(args):
+    from nlhi_report import export_report
+    from nlhi_store import RecordStore
+
+    log = (lambda done, total: print(f"regions {done}/{total}", file=sys.stderr)) if args.verbose else None
+    with RecordStore(args.store) as store:
+        summary = export_report(store, args.output, args.format, args.region, args.jobs, args.dpi, progress=log)
+    print(f"Wrote charts for {summary['regions']} regions to {summary['output']} in {summary['seconds']:.2f}s")
+    if summary["workers"]:
+        print(f"{'pid':>8} {'chunks':>6} {'regions':>7} {'seconds':>8}")
+        for w in summary["workers"]:
+            print(f"{w['pid']:>8} {w['chunks']:>6} {w['regions']:>7} {w['seconds']:>8.2f}")
+    return 0
+
+
+def cmd_export(args):
+    from nlhi_columnar import export_columnar
+    from nlhi_store import RecordStore
+
+    with RecordStore(args.store) as store:
+        summary = export_columnar(store, args.output, args.region)
+    print(f"Exported {summary['records']} records ({summary['domain_rows']} domain rows) to {args.output}: "
+          f"{summary['bytes']} bytes in {summary['seconds']:.2f}s")
+    if summary["skipped"]:
+        print(f"Skipped {summary['skipped']} record(s) whose date is not YYYY-MM-DD.")
+    return 0
+
+
+def cmd_restore(args):
+    from nlhi_columnar import import_columnar
+    from nlhi_store import RecordStore
+
+    with RecordStore(args.store) as store:
+        summary = import_columnar(store, args.input)
+    print(f"Restored {summary['records']} records for {summary['regions']} regions in {summary['seconds']:.2f}s")
+    return 0
+
+
+def cmd_migrate(args):
+    from nlhi_store import RecordStore
+
+    start = time.perf_counter()
+    with RecordStore(args.store) as store:
+        count = store.import_json(args.input, args.regions)
+    print(f"Migrated {count} records in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_serve(args):
+    from nlhi_server import serve
+
+    serve(args.store, args.host, args.port)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nlhi", description="Headless NLHI tools.")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Record timings to PATH (.prom: Prometheus text, otherwise JSON lines).")
+    parser.add_argument("--profile", metavar="SECTIONS",
+                        help="Comma-separated sections to run under cProfile (e.g. cli.compute); "
+                             "stats are written next to --metrics as SECTION.prof.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("compute", help="Compute NLHI per region/date from a CSV or Parquet file.")
+    p.add_argument("input", help="Input .csv or .parquet with one domain row per line.")
+    p.add_argument("-o", "--output", default="-",
+                   help="Record-level output (.csv, .parquet or .json); default: CSV on stdout.")
+    p.add_argument("--domains", help="Optional domain-level output (.csv or .parquet).")
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                   help="Rows read per chunk (default: %(default)s).")
+    p.add_argument("-v", "--verbose", action="store_true", help="Report progress on stderr.")
+    p.set_defaults(func=cmd_compute)
+
+    p = sub.add_parser("recompute", help="Recompute every stored record in parallel.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count).")
+    p.add_argument("--region", action="append", help="Only recompute this region (repeatable).")
+    p.add_argument("--unit", action="append", metavar="UNIT=PER_YEAR",
+                   help='Revised units per year, e.g. "Week(s)=52.1775" (repeatable).')
+    p.add_argument("--population", action="append", metavar="REGION=POP",
+                   help="Revised population for all records of a region (repeatable).")
+    p.add_argument("-v", "--verbose", action="store_true", help="Report progress on stderr.")
+    p.set_defaults(func=cmd_recompute)
+
+    p = sub.add_parser("uncertainty", help="Store Monte Carlo NLHI bands and sensitivities for every record.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.add_argument("--region", action="append", help="Only analyze this region (repeatable).")
+    p.add_argument("--ci", action="append", metavar="INPUT=HALF_WIDTH",
+                   help="Relative 95%% half-width of age, population, le, mortality or tliphs, "
+                        "like le=0.05 (repeatable; defaults in nlhi_uncertainty.DEFAULT_CI).")
+    p.add_argument("--samples", type=int, default=20_000, help="Draws per record (default: %(default)s).")
+    p.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count).")
+    p.add_argument("-v", "--verbose", action="store_true", help="Report progress on stderr.")
+    p.set_defaults(func=cmd_uncertainty)
+
+    p = sub.add_parser("import", help="Compute and store every record of a CSV, Parquet or Excel file.")
+    p.add_argument("input", help="Input .csv, .parquet or .xlsx with one domain row per line.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.add_argument("-v", "--verbose", action="store_true", help="Report progress on stderr.")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("query", help="Mean NLHI or DSAV of stored records by region group and date range.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.add_argument("--region", action="append", help="Report this region on its own (repeatable).")
+    p.add_argument("--group", action="append", metavar="NAME=R1,R2",
+                   help="Report the pooled records of these regions as NAME (repeatable).")
+    p.add_argument("--from", dest="start", metavar="YYYY-MM-DD", help="First date, inclusive.")
+    p.add_argument("--to", dest="end", metavar="YYYY-MM-DD", help="Last date, inclusive.")
+    p.add_argument("--period", choices=["month", "quarter", "year"], help="One mean per calendar period.")
+    p.add_argument("--domains", action="store_true", help="Mean DSAV per domain instead of NLHI.")
+    p.add_argument("--weighted", action="store_true", help="Weight each record by its population.")
+    p.add_argument("-v", "--verbose", action="store_true", help="Report the query time on stderr.")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser("report", help="Export the dashboard chart of every region (PNG/SVG/PDF files or one PDF).")
+    p.add_argument("output", help="Directory for one file per region, or a .pdf path for one multi-page PDF.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.add_argument("--format", choices=["png", "svg", "pdf"],
+                   help="File format for directory output (default: png).")
+    p.add_argument("--region", action="append", help="Only export this region (repeatable).")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count).")
+    p.add_argument("--dpi", type=int, default=100, help="Resolution of PNG output (default: %(default)s).")
+    p.add_argument("-v", "--verbose", action="store_true", help="Report progress on stderr.")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("export", help="Export stored records to a compact columnar file (.npz, .parquet or .npy directory).")
+    p.add_argument("output", help="A .npz or .parquet file, or a directory for memory-mappable .npy columns.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.add_argument("--region", action="append", help="Only export this region (repeatable).")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("restore", help="Store every record of a columnar export made by `export`.")
+    p.add_argument("input", help="A .npz or .parquet file or .npy directory written by `export`.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("migrate", help="Store every record of a legacy nlhi_data.json file, normalized.")
+    p.add_argument("input", help="Legacy {region: {date: record}} JSON file (read one region at a time).")
+    p.add_argument("--regions", metavar="PATH", help="Legacy regions.json giving the region order.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("serve", help="Serve computation and stored records over local HTTP/JSON.")
+    p.add_argument("--store", default=STORE_FILE, help="Record store (default: %(default)s).")
+    p.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: %(default)s).")
+    p.add_argument("--port", type=int, default=8765, help="Port to listen on (default: %(default)s).")
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.profile and not args.metrics:
+        parser.error("--profile needs --metrics")
+    if args.metrics:
+        nlhi_metrics.configure(args.metrics, (args.profile or "").split(","))
+    try:
+        return args.func(args)
+    except (InputFormatError, ValueError, OSError) as e:
+        print(f"nlhi: error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if args.metrics:
+            # Writes the Prometheus file and profiles, then turns metrics off again.
+            nlhi_metrics.configure(None)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+Compact columnar export and import of stored records.
+
+nlhi_data.json repeats every domain name and key string in every record
+and keeps each DSAV twice (in "DSAV" and in "domains"). The columnar form
+holds each value once, in two tables linked by offsets:
+
+- records (one row per region/date): region code, date (datetime64[D]),
+  age, population, LE, NLHI, and domain_offsets, so that the domains of
+  record i are domain rows domain_offsets[i]:domain_offsets[i + 1];
+- domain rows: domain code, TLIPHS, unit code, mortality, TLIPHS in
+  years, DSTLYA and DSAV;
+
+plus the "regions", "domains" and "units" dictionaries the codes index.
+"units" starts with nlhi_core.UNIT_NAMES, so known units keep their
+UNIT_CODES; any other unit name found in a record is appended, so it
+survives a round trip ("" stands for a missing unit). Missing values are
+NaN; legacy records that only kept a DSAV map get domain rows with just
+the DSAV (unit code -1). When any record has an nlhi_uncertainty entry,
+its values get one record column each (UNCERTAINTY_COLUMNS, NaN for
+records without an entry).
+
+Three containers, chosen by the path:
+
+- "*.npz": one compressed NumPy archive, the most compact interchange file;
+- "*.parquet": one denormalized Parquet table (one row per domain row,
+  dictionary-encoded strings) for Arrow/pandas/DuckDB users; needs pyarrow;
+- any other path: a directory with one .npy file per column, which
+  load_columns() memory-maps, so analytics touch only the columns and
+  rows they read.
+"""
+import math
+import os
+import time
+
+import numpy as np
+
+from nlhi_core import UNIT_CODES, safe_float
+from nlhi_metrics import timer
+from nlhi_migrate import extract_nlhi
+from nlhi_uncertainty import INPUTS, PERCENTILES, SENSITIVITY_KEYS
+
+
+FORMAT_VERSION = 1
+
+RECORD_FIELDS = ("age", "population", "le", "nlhi")
+DOMAIN_FIELDS = ("tliphs", "mortality", "tliphs_years", "dstlya", "dsav")
+
+# Record keys of compute_record() for the float columns.
+_RECORD_KEYS = {"age": "MeanAge", "population": "Population", "le": "AvgLifeExpectancy"}
+_DOMAIN_KEYS = {"tliphs": "TLIPHS", "mortality": "Mortality", "tliphs_years": "TLIPHS_years",
+                "dstlya": "DSTLYA", "dsav": "DSAV"}
+_DETAIL_ORDER = ("TLIPHS", "TLIPHS_unit", "Mortality", "TLIPHS_years", "DSTLYA", "DSAV")
+
+# Record columns of the "Uncertainty" entry: {column: (key, subkey or None)}.
+UNCERTAINTY_COLUMNS = {
+    "uncertainty_samples": ("samples", None),
+    **{f"uncertainty_{key}_{sub}": (key, sub)
+       for key, subkeys in (("ci", INPUTS), ("NLHI", [f"p{p:g}" for p in PERCENTILES]),
+                            ("sensitivity", SENSITIVITY_KEYS), ("variance_share", INPUTS))
+       for sub in subkeys},
+}
+
+
+def container(path):
+    """"npz", "parquet" or "npy" (a directory of .npy files) for an export path."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext == ".npz":
+        return "npz"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    return "npy"
+
+
+def _day(date):
+    try:
+        return np.datetime64(str(date), "D") if len(str(date)) == 10 else None
+    except ValueError:
+        return None
+
+
+def _unit_dtype(n_units):
+    return np.int8 if n_units <= np.iinfo(np.int8).max else np.int32
+
+
+def records_to_columns(items):
+    """
+    Columns of (region, date, record) items; returns (columns, skipped).
+
+    Records whose date is not YYYY-MM-DD are skipped and counted.
+    """
+    regions, domains = {}, {}
+    region_codes, dates, domain_offsets = [], [], [0]
+    rec = {name: [] for name in RECORD_FIELDS}
+    dom = {name: [] for name in DOMAIN_FIELDS}
+    domain_codes, units = [], []
+    unit_index = dict(UNIT_CODES)
+    entries = []
+    skipped = 0
+    nan = math.nan
+    for region, date, record in items:
+        day = _day(date)
+        if day is None or not isinstance(record, dict):
+            skipped += 1
+            continue
+        region_codes.append(regions.setdefault(region, len(regions)))
+        dates.append(day)
+        for name, key in _RECORD_KEYS.items():
+            rec[name].append(safe_float(record.get(key), nan))
+        rec["nlhi"].append(extract_nlhi(record))
+        if isinstance(record.get("Uncertainty"), dict):
+            entries.append((len(dates) - 1, record["Uncertainty"]))
+
+        details = record.get("domains")
+        details = details if isinstance(details, dict) else {}
+        dsav_map = record.get("DSAV")
+        dsav_map = dsav_map if isinstance(dsav_map, dict) else {}
+        for name in list(details) + [n for n in dsav_map if n not in details]:
+            d = details.get(name)
+            if isinstance(d, dict):
+                unit = d.get("TLIPHS_unit")
+                units.append(unit_index.setdefault("" if unit is None else str(unit), len(unit_index)))
+            else:
+                d = {"DSAV": dsav_map.get(name)}
+                units.append(-1)
+            domain_codes.append(domains.setdefault(str(name), len(domains)))
+            for field, key in _DOMAIN_KEYS.items():
+                dom[field].append(safe_float(d.get(key), nan))
+        domain_offsets.append(len(domain_codes))
+
+    cols = {
+        "regions": np.array(list(regions), dtype=str),
+        "domains": np.array(list(domains), dtype=str),
+        "units": np.array(list(unit_index), dtype=str),
+        "record_region": np.array(region_codes, dtype=np.int32),
+        "record_date": np.array(dates, dtype="datetime64[D]"),
+        "domain_offsets": np.array(domain_offsets, dtype=np.int64),
+        "domain": np.array(domain_codes, dtype=np.int32),
+        "unit": np.array(units, dtype=_unit_dtype(len(unit_index))),
+    }
+    for name, values in rec.items():
+        cols[name] = np.array(values, dtype=np.float64)
+    for name, values in dom.items():
+        cols[name] = np.array(values, dtype=np.float64)
+    if entries:
+        values = np.full((len(dates), len(UNCERTAINTY_COLUMNS)), nan)
+        for i, entry in entries:
+            values[i] = [safe_float(entry.get(key) if sub is None else (entry.get(key) or {}).get(sub), nan)
+                         for key, sub in UNCERTAINTY_COLUMNS.values()]
+        for j, name in enumerate(UNCERTAINTY_COLUMNS):
+            cols[name] = values[:, j].copy()
+    return cols, skipped
+
+
+def columns_to_records(cols):
+    """Yield (region, date, record) from columns, in the shape compute_record builds."""
+    regions = cols["regions"].tolist()
+    domains = cols["domains"].tolist()
+    units = cols["units"].tolist()
+    region_codes = cols["record_region"].tolist()
+    dates = np.datetime_as_string(cols["record_date"], unit="D").tolist()
+    offsets = cols["domain_offsets"].tolist()
+    rec = {name: cols[name].tolist() for name in RECORD_FIELDS}
+    domain_codes = cols["domain"].tolist()
+    unit_codes = cols["unit"].tolist()
+    dom = {name: cols[name].tolist() for name in DOMAIN_FIELDS}
+    unc = {name: cols[name].tolist() for name in UNCERTAINTY_COLUMNS if name in cols}
+
+    for i, region in enumerate(region_codes):
+        record = {}
+        for name, key in _RECORD_KEYS.items():
+            if not math.isnan(rec[name][i]):
+                record[key] = rec[name][i]
+        details, dsavs = {}, {}
+        for j in range(offsets[i], offsets[i + 1]):
+            name = domains[domain_codes[j]]
+            dsavs[name] = dom["dsav"][j]
+            if unit_codes[j] >= 0:
+                detail = {key: dom[field][j] for field, key in _DOMAIN_KEYS.items()
+                          if field == "dsav" or not math.isnan(dom[field][j])}
+                if units[unit_codes[j]]:
+                    detail["TLIPHS_unit"] = units[unit_codes[j]]
+                details[name] = {key: detail[key] for key in _DETAIL_ORDER if key in detail}
+        if details:
+            record["domains"] = details
+        record["DSAV"] = dsavs
+        record["NLHI"] = rec["nlhi"][i]
+        if unc and not math.isnan(unc["uncertainty_samples"][i]):
+            entry = {}
+            for name, (key, sub) in UNCERTAINTY_COLUMNS.items():
+                if sub is None:
+                    entry[key] = int(unc[name][i])
+                else:
+                    entry.setdefault(key, {})[sub] = unc[name][i]
+            record["Uncertainty"] = entry
+        yield regions[region], dates[i], record
+
+
+def _write_parquet(cols, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    offsets = cols["domain_offsets"]
+    counts = np.diff(offsets)
+    # Records without domains keep one row with a null domain.
+    rows = np.maximum(counts, 1)
+    has_domain = np.ones(int(rows.sum()), dtype=bool)
+    has_domain[(np.cumsum(rows) - 1)[counts == 0]] = False
+
+    def per_domain(values):
+        out = np.zeros(len(has_domain), dtype=values.dtype)
+        out[has_domain] = values
+        return out
+
+    def dictionary(codes, names, mask=None):
+        return pa.DictionaryArray.from_arrays(pa.array(codes, mask=mask), pa.array(names.tolist(), pa.string()))
+
+    table = {
+        "region": dictionary(np.repeat(cols["record_region"], rows), cols["regions"]),
+        "date": pa.array(np.repeat(cols["record_date"], rows)),
+    }
+    for name in RECORD_FIELDS:
+        table[name] = np.repeat(cols[name], rows)
+    for name in UNCERTAINTY_COLUMNS:
+        if name in cols:
+            table[name] = np.repeat(cols[name], rows)
+    unit = per_domain(cols["unit"])
+    table["domain"] = dictionary(per_domain(cols["domain"]), cols["domains"], ~has_domain)
+    table["unit"] = dictionary(unit, cols["units"], (unit < 0) | ~has_domain)
+    for name in DOMAIN_FIELDS:
+        table[name] = pa.array(per_domain(cols[name]), mask=~has_domain)
+    pq.write_table(pa.table(table), path)
+
+
+def _read_parquet(path):
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, memory_map=True)
+
+    def codes(name):
+        column = table.column(name).combine_chunks()
+        if not hasattr(column, "dictionary"):
+            column = column.dictionary_encode()
+        indices = pc.fill_null(column.indices, -1).to_numpy(zero_copy_only=False)
+        return indices, column.dictionary.to_pylist()
+
+    region, regions = codes("region")
+    date = table.column("date").to_numpy().astype("datetime64[D]")
+    domain, domains = codes("domain")
+    unit, unit_names = codes("unit")
+    # Rows of one record are consecutive; a record starts where region or date changes.
+    starts = np.flatnonzero(np.r_[True, (region[1:] != region[:-1]) | (date[1:] != date[:-1])])
+    ends = np.r_[starts[1:], len(region)]
+    has_domain = domain >= 0
+    units = dict(UNIT_CODES)
+    for name in unit_names:
+        units.setdefault(name, len(units))
+    # The trailing -1 maps null units (index -1) to the missing-unit code.
+    unit_map = np.array([units[u] for u in unit_names] + [-1], dtype=_unit_dtype(len(units)))
+
+    cols = {
+        "regions": np.array(regions, dtype=str),
+        "domains": np.array(domains, dtype=str),
+        "units": np.array(list(units), dtype=str),
+        "record_region": region[starts].astype(np.int32),
+        "record_date": date[starts],
+        "domain_offsets": np.r_[0, np.cumsum(has_domain)[ends - 1]].astype(np.int64),
+        "domain": domain[has_domain].astype(np.int32),
+        "unit": unit_map[unit[has_domain]],
+    }
+    for name in RECORD_FIELDS:
+        cols[name] = table.column(name).to_numpy()[starts]
+    for name in UNCERTAINTY_COLUMNS:
+        if name in table.column_names:
+            cols[name] = table.column(name).to_numpy()[starts]
+    for name in DOMAIN_FIELDS:
+        cols[name] = table.column(name).to_numpy(zero_copy_only=False)[has_domain].astype(np.float64)
+    return cols
+
+
+def save_columns(cols, path):
+    """Write columns to `path` in the container its name selects; returns the bytes written."""
+    kind = container(path)
+    if kind == "parquet":
+        _write_parquet(cols, path)
+        return os.path.getsize(path)
+    arrays = dict(cols, format_version=np.array(FORMAT_VERSION))
+    if kind == "npz":
+        np.savez_compressed(path, **arrays)
+        return os.path.getsize(path)
+    os.makedirs(path, exist_ok=True)
+    size = 0
+    for name, values in arrays.items():
+        target = os.path.join(path, f"{name}.npy")
+        np.save(target, values)
+        size += os.path.getsize(target)
+    return size
+
+
+def load_columns(path, mmap=True):
+    """
+    Columns of an export as {name: array}.
+
+    A .npy directory is memory-mapped (unless mmap=False): nothing is read
+    until a column is used.
+    """
+    kind = container(path)
+    if kind == "parquet":
+        return _read_parquet(path)
+    if kind == "npz":
+        with np.load(path, allow_pickle=False) as z:
+            cols = {name: z[name] for name in z.files}
+    else:
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No columnar export at {path!r}")
+        cols = {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r" if mmap else None, allow_pickle=False)
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+    version = int(cols.pop("format_version", 0))
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar export version {version} in {path!r}")
+    return cols
+
+
+def export_columnar(store, path, regions=None):
+    """
+    Write the records of `regions` (default: all) from `store` to `path`.
+
+    Returns a summary with "records", "domain_rows", "skipped", "bytes" and "seconds".
+    """
+    start = time.perf_counter()
+    with timer("export.columnar") as span:
+        regions = store.regions() if regions is None else regions
+        items = ((region, date, record) for region in regions
+                 for date, record in store.region_records(region).items())
+        cols, skipped = records_to_columns(items)
+        size = save_columns(cols, path)
+        span.add_bytes(size)
+    return {
+        "records": len(cols["record_region"]),
+        "domain_rows": len(cols["domain"]),
+        "skipped": skipped,
+        "bytes": size,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def import_columnar(store, path):
+    """
+    Put every record of a columnar export into `store` in one transaction.
+
+    Existing records with the same region and date are replaced. Returns a
+    summary with "records", "regions" and "seconds".
+    """
+    start = time.perf_counter()
+    cols = load_columns(path)
+    store.put_records(columns_to_records(cols))
+    return {
+        "records": len(cols["record_region"]),
+        "regions": len(np.unique(cols["record_region"])),
+        "seconds": time.perf_counter() - start,
+    }
+
@@ -0,0 +1,230 @@
+"""
+Qt-free computation core for NLHI.
+
+The scalar functions implement the definitions from the paper for a single
+domain or record. The batch functions apply the same math to flat NumPy
+arrays of domain rows, so whole data drops can be computed in one pass
+without building any widgets. NumPy is imported by the batch functions on
+first use, so the scalar path (and the GUI's startup) does not load it.
+"""
+import functools
+
+
+UNIT_CONVERSION = {
+    "Day(s)": 1 / 365.25,
+    "Week(s)": 1 / 52.1429,
+    "Month(s)": 1 / 12.0,
+    "Year(s)": 1.0,
+}
+
+# Stable integer codes for the units, in UNIT_CONVERSION order.
+UNIT_NAMES = list(UNIT_CONVERSION.keys())
+UNIT_CODES = {name: code for code, name in enumerate(UNIT_NAMES)}
+
+
+@functools.lru_cache(maxsize=None)
+def _unit_factors():
+    """UNIT_CONVERSION factors as an array indexed by unit code, built on first use."""
+    import numpy as np
+    factors = np.array([UNIT_CONVERSION[n] for n in UNIT_NAMES])
+    factors.flags.writeable = False
+    return factors
+
+
+def safe_float(s, default=0.0):
+    """float(s) for numbers and numeric strings, `default` for anything else."""
+    try:
+        return float(str(s).strip())
+    except Exception:
+        return default
+
+
+def convert_to_years(value, unit, unit_conversion=None):
+    """
+    Convert a TLIPHS value expressed in `unit` to years.
+
+    unit_conversion: optional {unit: factor} replacing UNIT_CONVERSION.
+    """
+    factors = UNIT_CONVERSION if unit_conversion is None else unit_conversion
+    if unit not in factors:
+        raise ValueError(f"Unknown TLIPHS unit: {unit!r}")
+    return value * factors[unit]
+
+
+def compute_dstlya(tliphs, unit, mortality, le, age):
+    """DSTLYA = TLIPHS in years + mortality * (LE - mean age)."""
+    return convert_to_years(tliphs, unit) + mortality * (le - age)
+
+
+def compute_dsav(dstlya, age, pop):
+    """DSAV = 100 * DSTLYA / (mean age * population); 0.0 if the denominator is 0."""
+    denom = age * pop
+    if denom == 0:
+        return 0.0
+    return (dstlya * 100.0) / denom
+
+
+def compute_nlhi(dsavs):
+    """NLHI = mean of the domain DSAVs; 0.0 for an empty list."""
+    dsavs = list(dsavs)
+    if not dsavs:
+        return 0.0
+    return sum(dsavs) / float(len(dsavs))
+
+
+def compute_record(age, pop, le, domains, unit_conversion=None):
+    """
+    Build a stored record from the record parameters and domain inputs.
+
+    domains: iterable of (name, tliphs, unit, mortality). Rows with an empty
+    name are skipped; a repeated name replaces the earlier row.
+    unit_conversion: optional {unit: factor} replacing UNIT_CONVERSION.
+    Returns the record dict written to the data store, or None when there
+    are no named domains.
+    """
+    dsavs = {}
+    domains_detail = {}
+    for name, tliphs, unit, mortality in domains:
+        name = str(name).strip()
+        if not name:
+            continue
+        tliphs_years = convert_to_years(tliphs, unit, unit_conversion)
+        dstlya = tliphs_years + mortality * (le - age)
+        dsav = compute_dsav(dstlya, age, pop)
+        dsavs[name] = dsav
+        domains_detail[name] = {
+            "TLIPHS": tliphs,
+            "TLIPHS_unit": unit,
+            "Mortality": mortality,
+            "TLIPHS_years": tliphs_years,
+            "DSTLYA": dstlya,
+            "DSAV": dsav,
+        }
+    if not dsavs:
+        return None
+    return {
+        "MeanAge": age,
+        "Population": pop,
+        "AvgLifeExpectancy": le,
+        "domains": domains_detail,
+        "DSAV": dsavs,
+        "NLHI": compute_nlhi(dsavs.values()),
+    }
+
+
+def unit_codes(units):
+    """
+    Map an array of unit names (or integer unit codes) to integer codes.
+
+    Raises ValueError if any unit is not a key of UNIT_CONVERSION.
+    """
+    import numpy as np
+
+    units = np.asarray(units)
+    if units.dtype.kind in "iu":
+        if units.size and (units.min() < 0 or units.max() >= len(UNIT_NAMES)):
+            raise ValueError("Unit code out of range.")
+        return units.astype(np.int8, copy=False)
+    names, inverse = np.unique(units.astype(str), return_inverse=True)
+    unknown = [str(n) for n in names if n not in UNIT_CODES]
+    if unknown:
+        raise ValueError(f"Unknown TLIPHS unit(s): {', '.join(unknown)}")
+    lookup = np.array([UNIT_CODES[n] for n in names], dtype=np.int8)
+    return lookup[inverse.reshape(-1)]
+
+
+def compute_domain_arrays(tliphs, units, mortality, age, pop, le):
+    """
+    Vectorized DSTLYA/DSAV for flat arrays of domain rows.
+
+    Every argument is an array of the same length (scalars broadcast).
+    Returns (tliphs_years, dstlya, dsav) as float64 arrays.
+    """
+    import numpy as np
+
+    tliphs = np.asarray(tliphs, dtype=np.float64)
+    mortality = np.asarray(mortality, dtype=np.float64)
+    age = np.asarray(age, dtype=np.float64)
+    pop = np.asarray(pop, dtype=np.float64)
+    le = np.asarray(le, dtype=np.float64)
+
+    tliphs_years = tliphs * _unit_factors()[unit_codes(units)]
+    dstlya = tliphs_years + mortality * (le - age)
+    denom = age * pop
+    dsav = np.divide(dstlya * 100.0, denom,
+                     out=np.zeros(np.broadcast(dstlya, denom).shape),
+                     where=denom != 0)
+    return tliphs_years, dstlya, dsav
+
+
+def compute_batch(regions, dates, domains, tliphs, units, mortality, ages, pops, les):
+    """
+    Compute DSTLYA, DSAV and NLHI for many (region, date) records at once.
+
+    All arguments are equal-length arrays with one entry per domain row.
+    Rows with an empty domain name are dropped and a domain repeated within
+    a record keeps its last row, matching compute_record.
+
+    Returns (rows, records):
+      rows    -- dict of per-row arrays: "mask" (rows that were used, over the
+                 input), "record" (index into records), "tliphs_years",
+                 "dstlya", "dsav"; all but "mask" cover the used rows only.
+      records -- dict of per-record arrays: "region", "date", "age",
+                 "population", "le", "n_domains", "nlhi", sorted by
+                 (region, date). The record parameters come from the
+                 record's last row.
+    """
+    import numpy as np
+
+    regions = np.asarray(regions).astype(str)
+    dates = np.asarray(dates).astype(str)
+    domains = np.char.strip(np.asarray(domains).astype(str))
+    n = regions.shape[0]
+    for arr in (dates, domains):
+        if arr.shape[0] != n:
+            raise ValueError("All batch arrays must have the same length.")
+
+    region_names, region_idx = np.unique(regions, return_inverse=True)
+    date_names, date_idx = np.unique(dates, return_inverse=True)
+    domain_names, domain_idx = np.unique(domains, return_inverse=True)
+    record_key = region_idx.reshape(-1).astype(np.int64) * len(date_names) + date_idx.reshape(-1)
+
+    # Keep the last occurrence of each (record, domain) pair and drop empty names.
+    pair_key = record_key * len(domain_names) + domain_idx.reshape(-1)
+    _, last_from_end = np.unique(pair_key[::-1], return_index=True)
+    mask = np.zeros(n, dtype=bool)
+    mask[n - 1 - last_from_end] = True
+    mask &= domains != ""
+
+    ages = np.asarray(ages, dtype=np.float64)[mask]
+    pops = np.asarray(pops, dtype=np.float64)[mask]
+    les = np.asarray(les, dtype=np.float64)[mask]
+    tliphs_years, dstlya, dsav = compute_domain_arrays(
+        np.asarray(tliphs)[mask], np.asarray(units)[mask], np.asarray(mortality)[mask],
+        ages, pops, les,
+    )
+
+    keys, record_idx = np.unique(record_key[mask], return_inverse=True)
+    record_idx = record_idx.reshape(-1)
+    _, last_from_end = np.unique(record_idx[::-1], return_index=True)
+    last_row = len(record_idx) - 1 - last_from_end
+    counts = np.bincount(record_idx, minlength=len(keys))
+    sums = np.bincount(record_idx, weights=dsav, minlength=len(keys))
+
+    rows = {
+        "mask": mask,
+        "record": record_idx,
+        "tliphs_years": tliphs_years,
+        "dstlya": dstlya,
+        "dsav": dsav,
+    }
+    records = {
+        "region": region_names[keys // len(date_names)],
+        "date": date_names[keys % len(date_names)],
+        "age": ages[last_row],
+        "population": pops[last_row],
+        "le": les[last_row],
+        "n_domains": counts,
+        "nlhi": sums / counts,
+    }
+    return rows, records
@@ -0,0 +1,231 @@
+"""
+Domain editor model for the NLHI form.
+
+DomainRows keeps the domain inputs of one record in parallel arrays (name,
+TLIPHS value, unit code, mortality) instead of one set of widgets per
+domain. DomainTableModel exposes them to a QTableView, which only creates
+widgets for the visible cells and for the cell being edited, so adding,
+removing and clearing rows costs the same for five domains or five
+hundred.
+
+DSTLYA and DSAV are kept per row and the NLHI as a running sum, so editing
+one domain recomputes that row and adjusts the mean in O(1); only a change
+of the record parameters (age, population, LE) touches every row.
+"""
+from array import array
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+
+from nlhi_core import UNIT_CODES, UNIT_NAMES, compute_dsav, compute_dstlya, safe_float
+
+
+class DomainRows:
+    """Domain inputs and derived DSTLYA/DSAV of one record as parallel arrays."""
+
+    FIELDS = ("name", "tliphs", "unit", "mortality", "dstlya", "dsav")
+    INPUT_FIELDS = FIELDS[:4]
+
+    def __init__(self):
+        self.names = []
+        self.tliphs = array("d")
+        self.units = array("b")
+        self.mortality = array("d")
+        self.dstlya = array("d")
+        self.dsav = array("d")
+        self.age = self.pop = self.le = 0.0
+        # Like compute_record, only the last row of a repeated name counts,
+        # and rows without a name are ignored.
+        self._last = {}
+        self._dsav_sum = 0.0
+
+    def __len__(self):
+        return len(self.names)
+
+    def _compute(self, i):
+        self.dstlya[i] = compute_dstlya(self.tliphs[i], UNIT_NAMES[self.units[i]],
+                                        self.mortality[i], self.le, self.age)
+        self.dsav[i] = compute_dsav(self.dstlya[i], self.age, self.pop)
+
+    def _reindex(self):
+        self._last = {name: i for i, name in enumerate(self.names) if name}
+        self._dsav_sum = sum(self.dsav[i] for i in self._last.values())
+
+    def set_params(self, age, pop, le):
+        """Set the record's mean age, population and LE and recompute every row."""
+        self.age, self.pop, self.le = float(age), float(pop), float(le)
+        for i in range(len(self.names)):
+            self._compute(i)
+        self._reindex()
+
+    def append(self, name="", tliphs=0.0, unit="Day(s)", mortality=0.0):
+        """Add a row and return its index; an unknown unit falls back to Day(s)."""
+        name = str(name).strip()
+        self.names.append(name)
+        self.tliphs.append(safe_float(tliphs, 0.0))
+        self.units.append(UNIT_CODES.get(str(unit), 0))
+        self.mortality.append(safe_float(mortality, 0.0))
+        self.dstlya.append(0.0)
+        self.dsav.append(0.0)
+        i = len(self.names) - 1
+        self._compute(i)
+        if name:
+            previous = self._last.get(name)
+            if previous is not None:
+                self._dsav_sum -= self.dsav[previous]
+            self._last[name] = i
+            self._dsav_sum += self.dsav[i]
+        return i
+
+    def remove(self, i):
+        for column in (self.names, self.tliphs, self.units, self.mortality, self.dstlya, self.dsav):
+            del column[i]
+        self._reindex()
+
+    def clear(self):
+        """Remove every row; the record parameters are kept."""
+        age, pop, le = self.age, self.pop, self.le
+        self.__init__()
+        self.age, self.pop, self.le = age, pop, le
+
+    def get(self, i, field):
+        if field == "unit":
+            return UNIT_NAMES[self.units[i]]
+        return getattr(self, "names" if field == "name" else field)[i]
+
+    def set(self, i, field, value):
+        """
+        Set one input field from user input; returns False if the value is rejected.
+
+        Numbers must parse as floats (blank means 0, as in the old form) and
+        units must be keys of UNIT_CONVERSION. The row's DSTLYA/DSAV and the
+        NLHI sum are updated.
+        """
+        if field == "name":
+            self.names[i] = str(value).strip()
+            self._reindex()
+            return True
+        if field == "unit":
+            code = UNIT_CODES.get(str(value))
+            if code is None:
+                return False
+            self.units[i] = code
+        elif field in ("tliphs", "mortality"):
+            number = 0.0 if str(value).strip() == "" else safe_float(value, None)
+            if number is None:
+                return False
+            getattr(self, field)[i] = number
+        else:
+            return False
+        old = self.dsav[i]
+        self._compute(i)
+        if self._last.get(self.names[i]) == i:
+            self._dsav_sum += self.dsav[i] - old
+        return True
+
+    @property
+    def n_domains(self):
+        """Number of distinct named domains, the count the NLHI is averaged over."""
+        return len(self._last)
+
+    @property
+    def nlhi(self):
+        """Mean DSAV over the named domains, as compute_record would give."""
+        return self._dsav_sum / len(self._last) if self._last else 0.0
+
+    def row(self, i):
+        """(name, tliphs, unit, mortality) of row i, the shape compute_record takes."""
+        return self.names[i], self.tliphs[i], UNIT_NAMES[self.units[i]], self.mortality[i]
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield self.row(i)
+
+
+class DomainTableModel(QAbstractTableModel):
+    """Editable table model over a DomainRows store; DSTLYA and DSAV are read-only."""
+
+    HEADERS = ("Domain", "TLIPHS", "Unit", "Mortality", "DSTLYA", "DSAV (%)")
+    FIRST_DERIVED = len(DomainRows.INPUT_FIELDS)
+
+    nlhi_changed = pyqtSignal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = DomainRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        value = self.rows.get(index.row(), DomainRows.FIELDS[index.column()])
+        if isinstance(value, float):
+            # Text, not float: a float would get a two-decimal QDoubleSpinBox editor.
+            return f"{value:.6g}" if index.column() >= self.FIRST_DERIVED else f"{value:.12g}"
+        return value
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if index.column() >= self.FIRST_DERIVED:
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def _derived_changed(self, first, last):
+        last_column = len(self.HEADERS) - 1
+        self.dataChanged.emit(self.index(first, self.FIRST_DERIVED), self.index(last, last_column),
+                              [Qt.DisplayRole])
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        if not self.rows.set(index.row(), DomainRows.FIELDS[index.column()], value):
+            return False
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        self._derived_changed(index.row(), index.row())
+        self.nlhi_changed.emit(self.rows.nlhi)
+        return True
+
+    def set_params(self, age, pop, le):
+        """Set the record parameters; every row's DSTLYA/DSAV is recomputed."""
+        self.rows.set_params(age, pop, le)
+        if len(self.rows):
+            self._derived_changed(0, len(self.rows) - 1)
+        self.nlhi_changed.emit(self.rows.nlhi)
+
+    def add_row(self, name="", tliphs=0.0, unit="Day(s)", mortality=0.0):
+        n = len(self.rows)
+        self.beginInsertRows(QModelIndex(), n, n)
+        self.rows.append(name, tliphs, unit, mortality)
+        self.endInsertRows()
+        self.nlhi_changed.emit(self.rows.nlhi)
+        return n
+
+    def set_rows(self, rows):
+        """Replace all rows with (name, tliphs, unit, mortality) tuples in one model reset."""
+        self.beginResetModel()
+        self.rows.clear()
+        for row in rows:
+            self.rows.append(*row)
+        self.endResetModel()
+        self.nlhi_changed.emit(self.rows.nlhi)
+
+    def remove_row(self, i):
+        self.beginRemoveRows(QModelIndex(), i, i)
+        self.rows.remove(i)
+        self.endRemoveRows()
+        self.nlhi_changed.emit(self.rows.nlhi)
+
+    def clear(self):
+        self.set_rows([])
@@ -0,0 +1,121 @@
+"""
+Bulk import of domain rows from CSV, Parquet or Excel files into the record store.
+
+The file is streamed in chunks (nlhi_io.iter_chunks) and validated a
+chunk at a time; the rows that are used are then computed and grouped
+into records of the shape compute_record builds by
+nlhi_core.compute_batch. Nothing is written until the whole file has been
+read and validated; all records then go to the store in one transaction,
+so a bad unit, a bad date or a cancelled import leaves the store untouched.
+"""
+import time
+
+import numpy as np
+
+from nlhi_core import UNIT_NAMES, compute_batch
+from nlhi_io import (
+    INPUT_COLUMNS, InputFormatError, chunk_arrays, count_rows, iter_chunks, normalize_dates, valid_rows,
+)
+from nlhi_metrics import timer
+
+
+# Small chunks keep the progress bar moving on files of a few thousand rows.
+IMPORT_CHUNK_SIZE = 5_000
+
+def _check_units(cols, first_row):
+    named = cols["domain"] != ""
+    unknown = named & ~np.isin(cols["unit"], UNIT_NAMES)
+    if unknown.any():
+        i = int(np.flatnonzero(unknown)[0])
+        raise InputFormatError(
+            f"Unknown TLIPHS unit {str(cols['unit'][i])!r} on data row {first_row + i + 1}; "
+            f"expected one of: {', '.join(UNIT_NAMES)}")
+
+
+def read_records(path, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Read and compute every (region, date) record of an input file.
+
+    Uses the columns of nlhi_io.INPUT_COLUMNS. As in `nlhi_cli.py compute`,
+    rows without a positive age, population or LE are skipped and a domain
+    repeated within a record keeps its last row; the record's MeanAge,
+    Population and AvgLifeExpectancy come from its last row. Dates may
+    carry a time of day, which is dropped.
+    progress: optional callable(rows_done, rows_total); it may raise to stop.
+
+    Returns ({(region, date): record}, summary) with records in order of
+    first appearance. Raises InputFormatError for missing columns,
+    non-numeric values, dates that are not YYYY-MM-DD or units that are
+    not in UNIT_CONVERSION.
+    """
+    total = count_rows(path)
+    parts = []
+    n_rows = 0
+    n_rejected = 0
+    if progress is not None:
+        progress(0, total)
+    for chunk in iter_chunks(path, chunk_size):
+        cols = chunk_arrays(chunk)
+        _check_units(cols, n_rows)
+        valid = valid_rows(cols)
+        used = valid & (cols["domain"] != "")
+        normalize_dates(cols, used, n_rows)
+        n_rows += len(valid)
+        n_rejected += int((~valid).sum())
+        parts.append({k: v[used] for k, v in cols.items()})
+        if progress is not None:
+            progress(n_rows, max(total, n_rows))
+
+    cols = {k: np.concatenate([part[k] for part in parts]) for k in INPUT_COLUMNS} if parts else {}
+    records = {}
+    if cols and len(cols["region"]):
+        rows, batch = compute_batch(*(cols[k] for k in INPUT_COLUMNS))
+        kept = {k: v[rows["mask"]].tolist() for k, v in cols.items()}
+        record_of_row = rows["record"]
+        # compute_batch sorts records by (region, date); restore the file order.
+        _, first_row = np.unique(record_of_row, return_index=True)
+        details = [{} for _ in first_row]
+        for i, name, tliphs, unit, mortality, years, dst, dsv in zip(
+                record_of_row.tolist(), kept["domain"], kept["tliphs"], kept["unit"], kept["mortality"],
+                rows["tliphs_years"].tolist(), rows["dstlya"].tolist(), rows["dsav"].tolist()):
+            details[i][name] = {
+                "TLIPHS": tliphs,
+                "TLIPHS_unit": unit,
+                "Mortality": mortality,
+                "TLIPHS_years": years,
+                "DSTLYA": dst,
+                "DSAV": dsv,
+            }
+        for i in np.argsort(first_row, kind="stable").tolist():
+            detail = details[i]
+            records[(str(batch["region"][i]), str(batch["date"][i]))] = {
+                "MeanAge": float(batch["age"][i]),
+                "Population": float(batch["population"][i]),
+                "AvgLifeExpectancy": float(batch["le"][i]),
+                "domains": detail,
+                "DSAV": {name: d["DSAV"] for name, d in detail.items()},
+                "NLHI": float(batch["nlhi"][i]),
+            }
+    summary = {
+        "rows": n_rows,
+        "rejected_rows": n_rejected,
+        "records": len(records),
+        "regions": len({region for region, _ in records}),
+    }
+    return records, summary
+
+
+def import_file(store, path, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Import a file of domain rows into `store` in a single transaction.
+
+    Existing records with the same (region, date) are replaced and new
+    regions are registered in order of first appearance. See read_records()
+    for the input rules; returns its summary plus "seconds".
+    """
+    start = time.perf_counter()
+    with timer("import.file"):
+        records, summary = read_records(path, chunk_size, progress)
+        store.put_records((region, date, record) for (region, date), record in records.items())
+    summary["seconds"] = time.perf_counter() - start
+    return summary
@@ -0,0 +1,373 @@
+"""
+Tabular input/output for headless NLHI runs.
+
+Input files hold one domain row per line with the columns in INPUT_COLUMNS
+(header names are matched case-insensitively, see COLUMN_ALIASES). CSV is
+read with the standard library, or with the much faster pyarrow CSV reader
+when the optional `pyarrow` package is installed; Parquet needs pyarrow and
+Excel workbooks (.xlsx, first sheet) need `openpyxl`. None of these paths
+import Qt or matplotlib.
+"""
+import csv
+import datetime
+import os
+import re
+import sys
+
+import numpy as np
+
+
+# A date, optionally followed by a time of day (Parquet timestamps, spreadsheet exports).
+_DATE = re.compile(r"(\d{4}-\d{2}-\d{2})(?:[T ][0-9:.+\-Z]*)?")
+
+INPUT_COLUMNS = ("region", "date", "domain", "tliphs", "unit", "mortality", "age", "population", "le")
+
+COLUMN_ALIASES = {
+    "region": "region",
+    "date": "date",
+    "domain": "domain",
+    "tliphs": "tliphs",
+    "tliphs_unit": "unit",
+    "unit": "unit",
+    "mortality": "mortality",
+    "age": "age",
+    "meanage": "age",
+    "mean_age": "age",
+    "population": "population",
+    "pop": "population",
+    "le": "le",
+    "avglifeexpectancy": "le",
+    "life_expectancy": "le",
+}
+
+RECORD_COLUMNS = ("region", "date", "age", "population", "le", "n_domains", "nlhi")
+DOMAIN_COLUMNS = ("region", "date", "domain", "tliphs", "unit", "mortality",
+                  "tliphs_years", "dstlya", "dsav")
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+TEXT_COLUMNS = ("region", "date", "domain", "unit")
+
+
+class InputFormatError(ValueError):
+    """Raised when an input file is missing columns or holds bad values."""
+
+
+def file_kind(path):
+    """Classify a path as "csv", "parquet", "xlsx" or "json" by its extension."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if ext == ".json":
+        return "json"
+    return "csv"
+
+
+def _map_header(header):
+    mapping = {}
+    for i, name in enumerate(header):
+        key = COLUMN_ALIASES.get(str(name).strip().lower())
+        if key is not None and key not in mapping:
+            mapping[key] = i
+    missing = [c for c in INPUT_COLUMNS if c not in mapping]
+    if missing:
+        raise InputFormatError(f"Missing input column(s): {', '.join(missing)}")
+    return mapping
+
+
+def _csv_chunks(path, chunk_size):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        mapping = _map_header(header)
+        order = [mapping[c] for c in INPUT_COLUMNS]
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield _columns_from_rows(rows, order)
+                rows = []
+        if rows:
+            yield _columns_from_rows(rows, order)
+
+
+def _columns_from_rows(rows, order):
+    width = max(order) + 1
+    if min(map(len, rows)) < width:
+        rows = [r if len(r) >= width else r + [""] * (width - len(r)) for r in rows]
+    columns = list(zip(*rows))
+    return {name: columns[i] for name, i in zip(INPUT_COLUMNS, order)}
+
+
+def _arrow_csv_chunks(path, chunk_size):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), None)
+    if header is None:
+        return
+    mapping = _map_header(header)
+    names = [header[mapping[c]] for c in INPUT_COLUMNS]
+    types = {header[mapping[c]]: (pa.string() if c in TEXT_COLUMNS else pa.float64())
+             for c in INPUT_COLUMNS}
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=max(chunk_size, 1) * 64),
+        convert_options=pacsv.ConvertOptions(column_types=types, include_columns=names,
+                                             strings_can_be_null=False),
+    )
+    for batch in reader:
+        yield {c: batch.column(i).to_numpy(zero_copy_only=False) for i, c in enumerate(INPUT_COLUMNS)}
+
+
+def _parquet_chunks(path, chunk_size):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    mapping = _map_header(pf.schema_arrow.names)
+    names = pf.schema_arrow.names
+    for batch in pf.iter_batches(batch_size=chunk_size, columns=[names[mapping[c]] for c in INPUT_COLUMNS]):
+        yield {c: batch.column(i).to_numpy(zero_copy_only=False) for i, c in enumerate(INPUT_COLUMNS)}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _xlsx_chunks(path, chunk_size):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        mapping = _map_header(["" if h is None else h for h in header])
+        order = [mapping[c] for c in INPUT_COLUMNS]
+        chunk = []
+        for row in rows:
+            if row is None or all(v is None for v in row):
+                continue
+            chunk.append([_xlsx_cell(v) for v in row])
+            if len(chunk) >= chunk_size:
+                yield _columns_from_rows(chunk, order)
+                chunk = []
+        if chunk:
+            yield _columns_from_rows(chunk, order)
+    finally:
+        workbook.close()
+
+
+def count_rows(path):
+    """
+    Number of data rows in an input file, for progress reporting.
+
+    Cheap compared to parsing: CSV newlines are counted in binary blocks,
+    Parquet and Excel use the row counts in their metadata. CSV counts may
+    include blank lines.
+    """
+    kind = file_kind(path)
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+    if kind == "xlsx":
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            return max((workbook.worksheets[0].max_row or 1) - 1, 0)
+        finally:
+            workbook.close()
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def iter_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream an input file as dicts of column sequences, `chunk_size` rows at a time.
+
+    Columns are returned raw; use `chunk_arrays` to convert them to typed arrays.
+    """
+    kind = file_kind(path)
+    if kind == "parquet":
+        return _parquet_chunks(path, chunk_size)
+    if kind == "xlsx":
+        return _xlsx_chunks(path, chunk_size)
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return _csv_chunks(path, chunk_size)
+    return _arrow_csv_chunks(path, chunk_size)
+
+
+def _float_column(values, name, default=None):
+    try:
+        # Fast path: numeric columns, or strings NumPy can parse directly.
+        arr = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    else:
+        if default is not None:
+            arr = np.where(np.isnan(arr), float(default), arr)
+        return arr
+    arr = np.asarray(values)
+    if arr.dtype.kind == "O":
+        arr = np.array(["" if v is None else str(v) for v in arr])
+    arr = np.char.strip(arr.astype(str))
+    if default is not None:
+        arr = np.where(arr == "", str(default), arr)
+    try:
+        return arr.astype(np.float64)
+    except ValueError:
+        bad = next(v for v in arr if not _is_float(v))
+        raise InputFormatError(f"Column '{name}' has a non-numeric value: {bad!r}") from None
+
+
+def _is_float(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def chunk_arrays(chunk):
+    """
+    Convert a raw chunk to typed NumPy arrays keyed by INPUT_COLUMNS.
+
+    Empty (or NaN) TLIPHS and mortality cells count as 0, like blank fields in
+    the form. Empty age/population/LE cells become NaN so the record is rejected.
+    """
+    return {
+        "region": np.char.strip(np.asarray(chunk["region"]).astype(str)),
+        "date": np.char.strip(np.asarray(chunk["date"]).astype(str)),
+        "domain": np.char.strip(np.asarray(chunk["domain"]).astype(str)),
+        "tliphs": _float_column(chunk["tliphs"], "tliphs", 0.0),
+        "unit": np.char.strip(np.asarray(chunk["unit"]).astype(str)),
+        "mortality": _float_column(chunk["mortality"], "mortality", 0.0),
+        "age": _float_column(chunk["age"], "age", "nan"),
+        "population": _float_column(chunk["population"], "population", "nan"),
+        "le": _float_column(chunk["le"], "le", "nan"),
+    }
+
+
+def valid_rows(cols):
+    """Mask of rows with a region and positive, finite age, population and LE."""
+    valid = cols["region"] != ""
+    for name in ("age", "population", "le"):
+        valid &= np.isfinite(cols[name]) & (cols[name] > 0)
+    return valid
+
+
+def _iso_day(value):
+    """YYYY-MM-DD of a date or date-time string, or None if it is not one."""
+    match = _DATE.fullmatch(value)
+    if match is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(match.group(1)).isoformat()
+    except ValueError:
+        return None
+
+
+def normalize_dates(cols, used, first_row):
+    """
+    Replace the date column of `cols` by YYYY-MM-DD strings; a time of day is dropped.
+
+    Raises InputFormatError, naming the data row, for the first row in the
+    `used` mask whose date is not a valid date. `first_row` is the number
+    of data rows before this chunk.
+    """
+    names, inverse = np.unique(cols["date"], return_inverse=True)
+    days = [_iso_day(name) for name in names.tolist()]
+    bad = np.array([day is None for day in days], dtype=bool)[inverse.reshape(-1)] & used
+    if bad.any():
+        i = int(np.flatnonzero(bad)[0])
+        raise InputFormatError(
+            f"Invalid date {str(cols['date'][i])!r} on data row {first_row + i + 1}; expected YYYY-MM-DD")
+    cols["date"] = np.array([day or "" for day in days], dtype=str)[inverse.reshape(-1)]
+
+
+class TableWriter:
+    """
+    Append-only writer for CSV or Parquet output tables.
+
+    Rows are appended a column-dict at a time, so large outputs never have to
+    be held in memory. A path of "-" writes CSV to stdout. Use as a context
+    manager or call close().
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = tuple(columns)
+        self.kind = file_kind(path)
+        self._file = None
+        self._writer = None
+
+    def write(self, data):
+        if self.kind == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.table({c: np.asarray(data[c]) for c in self.columns})
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+            return
+        if self._writer is None:
+            if self.path == "-":
+                self._file = sys.stdout
+            else:
+                self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.columns)
+        cols = [np.asarray(data[c]).tolist() for c in self.columns]
+        self._writer.writerows(zip(*cols))
+
+    def close(self):
+        if self.kind == "parquet":
+            if self._writer is None:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                schema = pa.schema([(c, pa.string()) for c in self.columns])
+                pq.write_table(schema.empty_table(), self.path)
+            else:
+                self._writer.close()
+        else:
+            if self._file is None:
+                self.write({c: [] for c in self.columns})
+            if self._file is sys.stdout:
+                self._file.flush()
+            else:
+                self._file.close()
+        self._writer = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
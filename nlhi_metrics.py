@@ -0,0 +1,197 @@
+"""
+Opt-in timing instrumentation for the NLHI hot paths.
+
+Disabled unless NLHI_METRICS names an output file (or nlhi_cli.py is run
+with --metrics). Instrumented sections record wall time, call count and
+bytes written:
+
+- a path ending in ".prom" gets Prometheus text-format totals, written at exit;
+- any other path gets one JSON line per timed call, appended as it happens.
+
+NLHI_PROFILE (or --profile) is a comma-separated list of section names to
+also run under cProfile; the accumulated stats are dumped next to the
+metrics file as "<name>.prof" (read them with python -m pstats).
+
+When disabled, timer() returns one shared no-op context manager and
+allocates nothing per call.
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+METRICS_ENV = "NLHI_METRICS"
+PROFILE_ENV = "NLHI_PROFILE"
+
+
+class Span:
+    """One timed call; the body may add the bytes it wrote."""
+
+    __slots__ = ("name", "bytes")
+
+    def __init__(self, name):
+        self.name = name
+        self.bytes = 0
+
+    def add_bytes(self, n):
+        self.bytes += n
+
+
+class _NullSpan:
+    """Span and context manager of a disabled timer()."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_bytes(self, n):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """Per-section totals plus the JSON lines or Prometheus sink they go to."""
+
+    def __init__(self, path=None, profile=()):
+        self.path = path
+        self.enabled = path is not None
+        self.profile = set(profile)
+        self.stats = {}
+        self._profilers = {}
+        self._lock = threading.Lock()
+        if self.enabled:
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        path = environ.get(METRICS_ENV) or None
+        profile = [p.strip() for p in environ.get(PROFILE_ENV, "").split(",") if p.strip()]
+        return cls(path, profile)
+
+    @property
+    def prometheus(self):
+        return self.enabled and self.path.endswith(".prom")
+
+    def timer(self, name):
+        """Time the body of a with-block as section `name`; yields a Span."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        span = Span(name)
+        profiler = self._start_profile(name)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            self._record(span, seconds)
+
+    def _start_profile(self, name):
+        if name not in self.profile:
+            return None
+        with self._lock:
+            profiler = self._profilers.setdefault(name, cProfile.Profile())
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread (nested section).
+            return None
+        return profiler
+
+    def _record(self, span, seconds):
+        with self._lock:
+            entry = self.stats.setdefault(span.name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["bytes"] += span.bytes
+            if not self.prometheus:
+                event = {
+                    "ts": time.time(),
+                    "name": span.name,
+                    "seconds": seconds,
+                    "bytes": span.bytes,
+                    "pid": os.getpid(),
+                    "thread": threading.current_thread().name,
+                }
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(event) + "\n")
+
+    def prometheus_text(self):
+        """Totals in the Prometheus text exposition format."""
+        families = [
+            ("nlhi_calls_total", "counter", "Number of calls of an instrumented section.", "count"),
+            ("nlhi_seconds_total", "counter", "Wall time spent in an instrumented section.", "seconds"),
+            ("nlhi_seconds_max", "gauge", "Longest single call of an instrumented section.", "max_seconds"),
+            ("nlhi_bytes_written_total", "counter", "Bytes written by an instrumented section.", "bytes"),
+        ]
+        with self._lock:
+            stats = {name: dict(entry) for name, entry in self.stats.items()}
+        lines = []
+        for metric, kind, help_text, key in families:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name in sorted(stats):
+                lines.append(f'{metric}{{section="{name}"}} {stats[name][key]}')
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Write the Prometheus file and cProfile dumps; called at exit."""
+        if not self.enabled:
+            return
+        if self.prometheus:
+            with open(self.path, "w") as f:
+                f.write(self.prometheus_text())
+        out_dir = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            profilers = list(self._profilers.items())
+        for name, profiler in profilers:
+            profiler.dump_stats(os.path.join(out_dir, f"{name}.prof"))
+
+
+metrics = Metrics.from_env()
+
+
+def configure(path, profile=()):
+    """Enable instrumentation for this process (used by the --metrics CLI flag)."""
+    global metrics
+    if metrics.enabled:
+        metrics.flush()
+        atexit.unregister(metrics.flush)
+    metrics = Metrics(path, profile)
+    return metrics
+
+
+def timer(name):
+    """Shorthand for metrics.timer(name) on the current module-level Metrics."""
+    return metrics.timer(name)
+
+
+def timed(name):
+    """Decorator timing every call of a function as section `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return fn(*args, **kwargs)
+            with metrics.timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,169 @@
+"""
+Normalization of legacy NLHI records.
+
+Records written by older versions come in several shapes: the NLHI under
+"NLHI" or "NLCHI", DSAV values in a "DSAV" map or only inside "domains",
+and numbers stored as strings. normalize_record() turns any of them into
+the one shape compute_record builds, with float values. A missing
+TLIPHS_years or DSTLYA is derived from the other inputs when they are
+known; other missing values are left out rather than guessed:
+
+    {"MeanAge", "Population", "AvgLifeExpectancy",   (only when known)
+     "domains": {name: {"TLIPHS", "TLIPHS_unit", "Mortality",  (each only when known)
+                        "TLIPHS_years", "DSTLYA", "DSAV"}},
+     "DSAV": {name: dsav}, "NLHI": nlhi,
+     "Uncertainty": {...}}                           (only when analyzed)
+
+The record store normalizes legacy files as it imports them and, once,
+every record already stored (schema version 3), so readers such as
+RegionSeries and nlhi_query take the values directly instead of probing
+keys on every read.
+
+iter_legacy_json() reads a {region: {date: record}} JSON file one region
+at a time, so files larger than memory can be migrated.
+"""
+import json
+
+from nlhi_core import UNIT_CONVERSION, convert_to_years, safe_float
+
+
+_PARAM_KEYS = ("MeanAge", "Population", "AvgLifeExpectancy")
+_DETAIL_KEYS = ("TLIPHS", "TLIPHS_unit", "Mortality", "TLIPHS_years", "DSTLYA", "DSAV")
+
+
+def extract_nlhi(entry):
+    """NLHI of a stored record; older files used the key "NLCHI"."""
+    if isinstance(entry, dict):
+        if "NLHI" in entry:
+            return safe_float(entry["NLHI"], 0.0)
+        if "NLCHI" in entry:
+            return safe_float(entry["NLCHI"], 0.0)
+    return 0.0
+
+
+def extract_dsav_map(entry):
+    """{domain: DSAV} of a stored record, from the "DSAV" map or the "domains" details."""
+    if isinstance(entry, dict):
+        if "DSAV" in entry and isinstance(entry["DSAV"], dict):
+            return {str(k): safe_float(v, 0.0) for k, v in entry["DSAV"].items()}
+        if "domains" in entry and isinstance(entry["domains"], dict):
+            return {str(k): safe_float(v.get("DSAV"), 0.0) for k, v in entry["domains"].items()
+                    if isinstance(v, dict)}
+    return {}
+
+
+def _normalize_detail(d, dsav, params):
+    """One "domains" entry; TLIPHS_years and DSTLYA are derived when missing and derivable."""
+    detail = {}
+    for key in ("TLIPHS", "Mortality", "TLIPHS_years", "DSTLYA"):
+        value = safe_float(d.get(key), None)
+        if value is not None:
+            detail[key] = value
+    if d.get("TLIPHS_unit") is not None:
+        detail["TLIPHS_unit"] = str(d["TLIPHS_unit"])
+    if "TLIPHS_years" not in detail and "TLIPHS" in detail and detail.get("TLIPHS_unit") in UNIT_CONVERSION:
+        detail["TLIPHS_years"] = convert_to_years(detail["TLIPHS"], detail["TLIPHS_unit"])
+    age, le = params.get("MeanAge"), params.get("AvgLifeExpectancy")
+    if "DSTLYA" not in detail and None not in (detail.get("TLIPHS_years"), detail.get("Mortality"), age, le):
+        detail["DSTLYA"] = detail["TLIPHS_years"] + detail["Mortality"] * (le - age)
+    detail["DSAV"] = dsav
+    return {key: detail[key] for key in _DETAIL_KEYS if key in detail}
+
+
+def normalize_record(entry):
+    """A record of any legacy shape in the normalized shape; normalized records are returned unchanged."""
+    record = {}
+    if not isinstance(entry, dict):
+        entry = {}
+    for key in _PARAM_KEYS:
+        value = safe_float(entry.get(key), None)
+        if value is not None:
+            record[key] = value
+    dsavs = extract_dsav_map(entry)
+    details = entry.get("domains")
+    if isinstance(details, dict):
+        domains = {}
+        for name, d in details.items():
+            if not isinstance(d, dict):
+                continue
+            dsav = dsavs.get(str(name), safe_float(d.get("DSAV"), 0.0))
+            domains[str(name)] = _normalize_detail(d, dsav, record)
+        if domains:
+            record["domains"] = domains
+    record["DSAV"] = dsavs
+    record["NLHI"] = extract_nlhi(entry)
+    # Written by nlhi_uncertainty in normalized form already.
+    if isinstance(entry.get("Uncertainty"), dict):
+        record["Uncertainty"] = entry["Uncertainty"]
+    return record
+
+
+def iter_legacy_json(path, block_size=1 << 23):
+    """
+    Yield (region, entries) from a {region: {date: record}} JSON file, one region at a time.
+
+    Only one region's records (and a read buffer of at least block_size
+    characters) are in memory at once. A value cut off by the end of the
+    buffer is parsed again after the next read, so blocks much smaller
+    than a region slow the import down. Raises ValueError
+    (json.JSONDecodeError) for malformed JSON, after yielding the regions
+    before the error.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def more():
+            nonlocal buf, pos, eof
+            # Read at least as much again as is buffered, so reparsing a
+            # large value after each read stays linear overall.
+            chunk = f.read(max(block_size, len(buf) - pos))
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                more()
+
+        def expect(chars):
+            nonlocal pos
+            skip_ws()
+            if pos >= len(buf) or buf[pos] not in chars:
+                raise json.JSONDecodeError(f"Expecting one of {chars!r}", buf, pos)
+            pos += 1
+            return buf[pos - 1]
+
+        def value():
+            nonlocal pos
+            skip_ws()
+            while True:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    more()
+                    continue
+                # A number at the very end of the buffer may continue in the next block.
+                if end == len(buf) and not eof:
+                    more()
+                    continue
+                pos = end
+                return obj
+
+        more()
+        expect("{")
+        skip_ws()
+        if pos < len(buf) and buf[pos] == "}":
+            return
+        while True:
+            region = value()
+            expect(":")
+            yield str(region), value()
+            if expect(",}") == "}":
+                return
@@ -0,0 +1,166 @@
+"""
+Dashboard drawing on a plain matplotlib Figure.
+
+RegionPlot draws the NLHI line and DSAV heatmap of one RegionSeries and
+reuses its axes and artists when switched to another region. Long series
+are decimated before they reach matplotlib, so drawing cost is bounded by
+MAX_LINE_POINTS / MAX_HEATMAP_COLUMNS / MAX_HEATMAP_ROWS rather than by
+history length or domain count. No Qt
+import is needed; the GUI embeds the figure in a FigureCanvasQTAgg.
+"""
+import numpy as np
+
+
+MAX_LINE_POINTS = 2000
+MAX_HEATMAP_COLUMNS = 500
+MAX_HEATMAP_ROWS = 200
+MAX_TICK_LABELS = 10
+MAX_DOMAIN_LABELS = 25
+MARKER_LIMIT = 200
+
+# Inches; the dashboard window and exported reports use the same layout.
+FIGURE_SIZE = (12, 8)
+
+
+def decimate_line(y, max_points=MAX_LINE_POINTS):
+    """
+    Min/max decimation of a series to at most `max_points` points.
+
+    Returns (x, y) where x are indices into the original series; the
+    minimum and maximum of every bucket are kept so spikes stay visible.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n), y
+    bucket = -(-n // max(max_points // 2, 1))
+    rows = -(-n // bucket)
+    padded = np.concatenate([y, np.full(rows * bucket - n, y[-1])]).reshape(rows, bucket)
+    base = np.arange(rows) * bucket
+    lo = base + padded.argmin(axis=1)
+    hi = base + padded.argmax(axis=1)
+    x = np.unique(np.minimum(np.concatenate([lo, hi]), n - 1))
+    return x, y[x]
+
+
+def bin_rows(matrix, max_rows=MAX_HEATMAP_COLUMNS):
+    """
+    Average consecutive rows (dates) of `matrix` into at most `max_rows` bins.
+
+    Bins hold the same number of rows except possibly the last one.
+    Returns (binned, edges) where bin k covers rows edges[k]:edges[k+1].
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = matrix.shape[0]
+    if n <= max_rows:
+        return matrix, np.arange(n + 1)
+    bucket = -(-n // max_rows)
+    full = (n // bucket) * bucket
+    binned = matrix[:full].reshape(-1, bucket, matrix.shape[1]).mean(axis=1)
+    edges = list(range(0, full + 1, bucket))
+    if full < n:
+        binned = np.vstack([binned, matrix[full:].mean(axis=0)])
+        edges.append(n)
+    return binned, np.array(edges)
+
+
+def bin_heatmap(dsav, max_dates=MAX_HEATMAP_COLUMNS, max_domains=MAX_HEATMAP_ROWS):
+    """Average a dates x domains matrix into at most max_dates x max_domains bins."""
+    binned = bin_rows(dsav, max_dates)[0]
+    return bin_rows(binned.T, max_domains)[0].T
+
+
+def tick_positions(n, max_ticks=MAX_TICK_LABELS):
+    """At most `max_ticks` evenly spread indices in range(n)."""
+    if n == 0:
+        return np.zeros(0, dtype=int)
+    return np.unique(np.linspace(0, n - 1, min(n, max_ticks)).round().astype(int))
+
+
+def prepare_region(series):
+    """
+    Decimate a RegionSeries into the arrays RegionPlot.show() draws.
+
+    Pure NumPy work with no matplotlib objects, so it can run off the GUI thread.
+    """
+    n = len(series.dates)
+    date_ticks = tick_positions(n)
+    domain_ticks = tick_positions(len(series.domains), MAX_DOMAIN_LABELS)
+    x, y = decimate_line(series.nlhi)
+    band = None
+    if np.isfinite(series.lower).any():
+        # Sampled at the points the line keeps.
+        band = (x, series.lower[x], series.upper[x])
+    return {
+        "n_dates": n,
+        "domains": list(series.domains),
+        "line": (x, y),
+        "band": band,
+        "heatmap": bin_heatmap(series.dsav),
+        "date_ticks": date_ticks,
+        "date_labels": [series.dates[i] for i in date_ticks],
+        "domain_ticks": domain_ticks,
+        "domain_labels": [series.domains[j] for j in domain_ticks],
+    }
+
+
+class RegionPlot:
+    """NLHI-over-time line above a DSAV heatmap (domains x time) on one figure."""
+
+    def __init__(self, figure):
+        self.figure = figure
+        self.ax_line, self.ax_heat = figure.subplots(2, 1)
+        figure.subplots_adjust(left=0.2, right=0.92, bottom=0.12, top=0.95, hspace=0.6)
+
+        (self.line,) = self.ax_line.plot([], [], marker="o")
+        self.band = None
+        self.ax_line.set_ylabel("NLHI (avg DSAV %)")
+        self.ax_line.grid(True)
+
+        self.image = self.ax_heat.imshow(np.zeros((1, 1)), aspect="auto", cmap="viridis",
+                                         interpolation="nearest")
+        self.colorbar = figure.colorbar(self.image, ax=self.ax_heat, orientation="vertical",
+                                        label="DSAV (%)")
+
+    def draw(self, region, series):
+        """Point the artists at `series`; the caller redraws the canvas."""
+        self.show(region, prepare_region(series))
+
+    def show(self, region, data):
+        """Point the artists at the output of prepare_region(); the caller redraws the canvas."""
+        n = data["n_dates"]
+        x, y = data["line"]
+        self.line.set_data(x, y)
+        self.line.set_marker("o" if len(x) <= MARKER_LIMIT else "")
+        self.ax_line.set_title(f"NLHI Over Time - {region}")
+        self.ax_line.set_xlim(-0.5, max(n - 0.5, 0.5))
+        if self.band is not None:
+            self.band.remove()
+            self.band = None
+        bounds = [y]
+        if data.get("band") is not None:
+            bx, lower, upper = data["band"]
+            self.band = self.ax_line.fill_between(bx, lower, upper, color=self.line.get_color(),
+                                                  alpha=0.25, linewidth=0, label="95% interval")
+            bounds += [lower, upper]
+        values = np.concatenate(bounds)
+        values = values[np.isfinite(values)]
+        if values.size:
+            lo, hi = float(np.nanmin(values)), float(np.nanmax(values))
+            pad = (hi - lo) * 0.05 or abs(hi) * 0.05 or 1.0
+            self.ax_line.set_ylim(lo - pad, hi + pad)
+
+        matrix = data["heatmap"]
+        n_domains = len(data["domains"])
+        self.image.set_data(matrix.T if matrix.size else np.zeros((1, 1)))
+        self.image.set_extent((-0.5, max(n - 0.5, 0.5), max(n_domains - 0.5, 0.5), -0.5))
+        if matrix.size:
+            self.image.set_clim(float(matrix.min()), float(matrix.max()))
+        self.colorbar.update_normal(self.image)
+        self.ax_heat.set_title("DSAV Heatmap (Domains × Time)")
+
+        self.ax_heat.set_yticks(data["domain_ticks"])
+        self.ax_heat.set_yticklabels(data["domain_labels"])
+        for ax in (self.ax_line, self.ax_heat):
+            ax.set_xticks(data["date_ticks"])
+            ax.set_xticklabels(data["date_labels"], rotation=45, ha="right")
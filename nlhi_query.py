@@ -0,0 +1,231 @@
+"""
+Aggregate queries over stored NLHI records.
+
+For each region a RegionIndex holds the record dates (as day numbers),
+NLHI, population and DSAV per domain in sorted arrays, plus their prefix
+sums. A date-range mean is then two binary searches and a difference of
+prefix sums, whatever the length of the history; monthly/quarterly/yearly
+means and trailing windows are differences at many boundaries at once.
+
+Every aggregate can be unweighted (each record counts once) or
+population-weighted (each record counts with its Population). Indices are
+cached per region and rebuilt when the region's version in the store
+changes, as for nlhi_series.SeriesCache.
+"""
+import datetime
+import threading
+
+import numpy as np
+
+
+PERIODS = ("month", "quarter", "year")
+
+
+def _day_number(date_str):
+    try:
+        return datetime.date.fromisoformat(str(date_str)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def _query_day(date_str):
+    day = _day_number(date_str)
+    if day is None:
+        raise ValueError(f"Invalid date {date_str!r}; expected YYYY-MM-DD")
+    return day
+
+
+def _prefix(values):
+    """Prefix sums along axis 0 with a leading zero row: P[j] - P[i] sums values[i:j]."""
+    out = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+def period_keys(days, period):
+    """Integer period key of each day number: months and quarters count from year 0."""
+    dt = np.asarray(days, dtype=np.int64) - datetime.date(1970, 1, 1).toordinal()
+    months = dt.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) + 1970 * 12
+    if period == "month":
+        return months
+    if period == "quarter":
+        return months // 3
+    if period == "year":
+        return months // 12
+    raise ValueError(f"Unknown period {period!r}; expected one of: {', '.join(PERIODS)}")
+
+
+def period_label(key, period):
+    if period == "month":
+        return f"{key // 12:04d}-{key % 12 + 1:02d}"
+    if period == "quarter":
+        return f"{key // 4:04d}-Q{key % 4 + 1}"
+    return f"{key:04d}"
+
+
+class RegionIndex:
+    """Sorted per-record arrays and prefix sums of one region."""
+
+    def __init__(self, records):
+        rows = sorted((day, date) for date in records if (day := _day_number(date)) is not None)
+        self.dates = [date for _, date in rows]
+        self.days = np.array([day for day, _ in rows], dtype=np.int64)
+        entries = [records[date] for date in self.dates]
+        n = len(entries)
+        self.nlhi = np.fromiter((e.get("NLHI", 0.0) for e in entries), dtype=np.float64, count=n)
+        self.population = np.fromiter((e.get("Population", 0.0) for e in entries), dtype=np.float64, count=n)
+
+        maps = [e.get("DSAV") or {} for e in entries]
+        self.domains = list(dict.fromkeys(dom for m in maps for dom in m))
+        column = {dom: j for j, dom in enumerate(self.domains)}
+        dsav = np.zeros((n, len(self.domains)))
+        present = np.zeros((n, len(self.domains)))
+        for i, m in enumerate(maps):
+            if m:
+                cols = [column[dom] for dom in m]
+                dsav[i, cols] = list(m.values())
+                present[i, cols] = 1.0
+
+        pop = self.population[:, None]
+        self._count = _prefix(np.ones(n))
+        self._pop = _prefix(self.population)
+        self._nlhi = _prefix(self.nlhi)
+        self._pop_nlhi = _prefix(self.population * self.nlhi)
+        self._dsav = _prefix(dsav)
+        self._pop_dsav = _prefix(pop * dsav)
+        self._present = _prefix(present)
+        self._pop_present = _prefix(pop * present)
+        self._keys = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def span(self, start=None, end=None):
+        """Index range [i, j) of the records with start <= date <= end (ISO dates, inclusive)."""
+        i = 0 if start is None else int(np.searchsorted(self.days, _query_day(start), "left"))
+        j = len(self.days) if end is None else int(np.searchsorted(self.days, _query_day(end), "right"))
+        return i, max(i, j)
+
+    def sums(self, i, j, weighted=False):
+        """(weight, weighted NLHI sum) over records i:j; i and j may be arrays."""
+        if weighted:
+            return self._pop[j] - self._pop[i], self._pop_nlhi[j] - self._pop_nlhi[i]
+        return self._count[j] - self._count[i], self._nlhi[j] - self._nlhi[i]
+
+    def dsav_sums(self, i, j, weighted=False):
+        """(per-domain weight, per-domain weighted DSAV sum) over records i:j."""
+        if weighted:
+            return self._pop_present[j] - self._pop_present[i], self._pop_dsav[j] - self._pop_dsav[i]
+        return self._present[j] - self._present[i], self._dsav[j] - self._dsav[i]
+
+    def period_spans(self, period, i=0, j=None):
+        """(keys, starts, ends) of the records i:j split by calendar period."""
+        j = len(self.days) if j is None else j
+        keys = self._keys.get(period)
+        if keys is None:
+            keys = self._keys[period] = period_keys(self.days, period)
+        keys = keys[i:j]
+        if not len(keys):
+            return keys, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        breaks = np.flatnonzero(np.diff(keys)) + 1
+        starts = np.concatenate([[0], breaks]) + i
+        ends = np.concatenate([breaks, [len(keys)]]) + i
+        return keys[starts - i], starts, ends
+
+
+def _mean(total, weight):
+    return float(total / weight) if weight else None
+
+
+class QueryEngine:
+    """
+    Aggregated NLHI and DSAV over regions and date ranges.
+
+    `regions` arguments take a region name or a list of names (a region
+    group); dates are ISO "yyyy-mm-dd" strings and ranges are inclusive.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index(self, region):
+        """RegionIndex of a region, rebuilt only when the region changed in the store."""
+        version = self.store.region_version(region)
+        with self._lock:
+            cached = self._indexes.get(region)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = RegionIndex(self.store.region_records(region) if version is not None else {})
+        with self._lock:
+            self._indexes[region] = (version, index)
+        return index
+
+    def _regions(self, regions):
+        return [regions] if isinstance(regions, str) else list(regions)
+
+    def mean_nlhi(self, regions, start=None, end=None, weighted=False):
+        """Mean NLHI of all records in the range, or None if there are none."""
+        weight = total = 0.0
+        for region in self._regions(regions):
+            index = self.index(region)
+            w, s = index.sums(*index.span(start, end), weighted)
+            weight += w
+            total += s
+        return _mean(total, weight)
+
+    def mean_dsav(self, regions, start=None, end=None, weighted=False):
+        """{domain: mean DSAV} over the records in the range that include the domain."""
+        weight, total = {}, {}
+        for region in self._regions(regions):
+            index = self.index(region)
+            w, s = index.dsav_sums(*index.span(start, end), weighted)
+            for dom, wd, sd in zip(index.domains, w.tolist(), s.tolist()):
+                weight[dom] = weight.get(dom, 0.0) + wd
+                total[dom] = total.get(dom, 0.0) + sd
+        return {dom: _mean(total[dom], weight[dom]) for dom in weight if weight[dom]}
+
+    def group_means(self, groups, start=None, end=None, weighted=False):
+        """{group: mean NLHI} for {group: [regions]}."""
+        return {name: self.mean_nlhi(regions, start, end, weighted) for name, regions in groups.items()}
+
+    def resample(self, regions, period="month", start=None, end=None, weighted=False):
+        """
+        Mean NLHI per calendar period ("month", "quarter" or "year").
+
+        Returns a list of {"period", "records", "nlhi"} sorted by period;
+        periods without records are left out.
+        """
+        parts = []
+        for region in self._regions(regions):
+            index = self.index(region)
+            keys, starts, ends = index.period_spans(period, *index.span(start, end))
+            w, s = index.sums(starts, ends, weighted)
+            parts.append((keys, ends - starts, w, s))
+        if not parts:
+            return []
+        keys, counts, w, s = (np.concatenate(col) for col in zip(*parts))
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=counts, minlength=len(uniq))
+        w = np.bincount(inverse, weights=w, minlength=len(uniq))
+        s = np.bincount(inverse, weights=s, minlength=len(uniq))
+        return [
+            {"period": period_label(int(k), period), "records": int(c), "nlhi": _mean(sk, wk)}
+            for k, c, wk, sk in zip(uniq.tolist(), counts.tolist(), w.tolist(), s.tolist())
+        ]
+
+    def rolling(self, region, days, start=None, end=None, weighted=False):
+        """
+        Trailing `days`-day mean NLHI of one region at each of its record dates.
+
+        Returns (dates, means); the window of a date covers (date - days, date].
+        """
+        index = self.index(region)
+        i, j = index.span(start, end)
+        ends = np.arange(i, j) + 1
+        starts = np.searchsorted(index.days, index.days[i:j] - days, "right")
+        w, s = index.sums(starts, ends, weighted)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(w != 0, s / np.where(w != 0, w, 1), np.nan)
+        return index.dates[i:j], means
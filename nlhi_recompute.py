@@ -0,0 +1,149 @@
+"""
+Recompute every stored record after a unit-conversion or population revision.
+
+Regions are partitioned into balanced chunks (by record count) and
+recomputed in a ProcessPoolExecutor; each worker reads its regions from
+the store and returns the new records already JSON-encoded, so the parent
+only runs the SQL writes, one chunk per transaction. Workers are started
+with the "spawn" method so the pool is safe to create from the GUI's
+worker threads.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from nlhi_core import compute_record, safe_float
+from nlhi_store import RecordStore, encode_record
+
+
+class RecordNotRecomputable(ValueError):
+    """Raised for a stored record that has no per-domain inputs to recompute from."""
+
+
+def recompute_record(record, unit_conversion=None, population=None):
+    """
+    Recompute DSTLYA/DSAV/NLHI of one stored record from its stored inputs.
+
+    population: optional replacement for the record's Population.
+    Raises RecordNotRecomputable for records without "domains" details
+    (for example legacy entries that only kept the DSAV map) or with a
+    domain missing its TLIPHS, unit or mortality.
+    """
+    domains = record.get("domains") if isinstance(record, dict) else None
+    if not isinstance(domains, dict) or not domains:
+        raise RecordNotRecomputable("record has no domain inputs")
+    age = safe_float(record.get("MeanAge"), 0.0)
+    pop = safe_float(record.get("Population"), 0.0) if population is None else float(population)
+    le = safe_float(record.get("AvgLifeExpectancy"), 0.0)
+    rows = []
+    for name, d in domains.items():
+        if not all(key in d for key in ("TLIPHS", "TLIPHS_unit", "Mortality")):
+            raise RecordNotRecomputable(f"domain {name!r} has no TLIPHS, unit or mortality")
+        rows.append((name, safe_float(d["TLIPHS"], 0.0), d["TLIPHS_unit"], safe_float(d["Mortality"], 0.0)))
+    new = compute_record(age, pop, le, rows, unit_conversion)
+    if new is None:
+        raise RecordNotRecomputable("record has no named domains")
+    return new
+
+
+def _recompute_chunk(store_path, regions, unit_conversion, population):
+    start = time.perf_counter()
+    results = []
+    skipped = 0
+    with RecordStore(store_path) as store:
+        for region in regions:
+            pop = population.get(region) if population else None
+            for date, record in store.region_records(region).items():
+                try:
+                    new = recompute_record(record, unit_conversion, pop)
+                    results.append((region, date, encode_record(new)))
+                except ValueError:
+                    # No domain inputs, or a unit missing from unit_conversion.
+                    skipped += 1
+    timing = {
+        "pid": os.getpid(),
+        "regions": len(regions),
+        "records": len(results),
+        "skipped": skipped,
+        "seconds": time.perf_counter() - start,
+    }
+    return results, timing
+
+
+def partition_regions(counts, n_chunks):
+    """
+    Split {region: record count} into at most `n_chunks` lists of similar total size.
+
+    Greedy longest-processing-time assignment: biggest regions first, each
+    to the currently lightest chunk.
+    """
+    n_chunks = max(1, min(n_chunks, len(counts)))
+    chunks = [[] for _ in range(n_chunks)]
+    loads = [0] * n_chunks
+    for region, n in sorted(counts.items(), key=lambda item: -item[1]):
+        i = loads.index(min(loads))
+        chunks[i].append(region)
+        loads[i] += max(n, 1)
+    return [c for c in chunks if c]
+
+
+def recompute_all(store, workers=None, regions=None, unit_conversion=None, population=None, progress=None):
+    """
+    Recompute all records of `regions` (default: every region) in parallel.
+
+    store: an open RecordStore; results are merged into it.
+    workers: number of processes (default: os.cpu_count()).
+    population: optional {region: new population}.
+    progress: optional callable(done_chunks, total_chunks); it may raise to
+    stop early, in which case chunks already merged stay written.
+
+    Returns a summary dict with totals and one timing entry per worker
+    process ("pid", "chunks", "regions", "records", "skipped", "seconds").
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    counts = store.record_counts()
+    if regions is not None:
+        counts = {r: counts[r] for r in regions if r in counts}
+    # A few chunks per worker keeps processes busy when region sizes vary.
+    chunks = partition_regions(counts, workers * 4)
+
+    per_worker = {}
+    written = 0
+    skipped = 0
+    if progress is not None:
+        progress(0, len(chunks))
+    if chunks:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as pool:
+            futures = [pool.submit(_recompute_chunk, store.path, chunk, unit_conversion, population)
+                       for chunk in chunks]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    results, timing = future.result()
+                    store.put_records(results, encoded=True)
+                    written += len(results)
+                    skipped += timing["skipped"]
+                    entry = per_worker.setdefault(timing["pid"], {
+                        "pid": timing["pid"], "chunks": 0, "regions": 0,
+                        "records": 0, "skipped": 0, "seconds": 0.0,
+                    })
+                    entry["chunks"] += 1
+                    for key in ("regions", "records", "skipped", "seconds"):
+                        entry[key] += timing[key]
+                    if progress is not None:
+                        progress(done, len(chunks))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    return {
+        "regions": len(counts),
+        "records": written,
+        "skipped": skipped,
+        "chunks": len(chunks),
+        "workers": sorted(per_worker.values(), key=lambda w: w["pid"]),
+        "seconds": time.perf_counter() - start,
+    }
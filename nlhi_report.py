@@ -0,0 +1,195 @@
+"""
+Headless export of the dashboard charts for every region.
+
+    python nlhi_cli.py report charts/ --format svg -j 4
+    python nlhi_cli.py report report.pdf
+
+Each region is drawn with the dashboard's RegionPlot layout (NLHI line
+above the DSAV heatmap) on an Agg canvas; no Qt or pyplot is involved.
+
+- An output directory gets one PNG, SVG or PDF file per region. Regions
+  are split into chunks balanced by record count and rendered in worker
+  processes; each process draws every region of its chunks on one Figure,
+  reusing the axes and artists.
+- An output ending in ".pdf" gets a single multi-page PDF, one page per
+  region in store order. Pages of one file cannot be written from several
+  processes, so workers load and decimate the series (prepare_region) in
+  order and the parent draws them on one reused Figure.
+
+The export only reads the store.
+"""
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from nlhi_recompute import partition_regions
+from nlhi_store import RecordStore
+
+
+FORMATS = ("png", "svg", "pdf")
+DEFAULT_DPI = 100
+
+
+def report_filenames(regions, fmt):
+    """{region: file name}: unsafe characters become "_", clashes get a numeric suffix."""
+    names = {}
+    used = set()
+    for region in regions:
+        stem = re.sub(r"[^\w.-]+", "_", region).strip("._") or "region"
+        name, k = f"{stem}.{fmt}", 1
+        while name.lower() in used:
+            k += 1
+            name = f"{stem}_{k}.{fmt}"
+        used.add(name.lower())
+        names[region] = name
+    return names
+
+
+# One figure per worker process, reused for every region it draws.
+_plot = None
+
+
+def _region_plot():
+    global _plot
+    if _plot is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from nlhi_plot import FIGURE_SIZE, RegionPlot
+
+        figure = Figure(figsize=FIGURE_SIZE)
+        FigureCanvasAgg(figure)
+        _plot = RegionPlot(figure)
+    return _plot
+
+
+def _prepare(store, regions):
+    from nlhi_plot import prepare_region
+    from nlhi_series import RegionSeries
+
+    # Built from the records, not through SeriesCache: exporting must not write to the store.
+    return [(region, prepare_region(RegionSeries.from_records(store.region_records(region))))
+            for region in regions]
+
+
+def _render_chunk(store_path, items, out_dir, dpi):
+    start = time.perf_counter()
+    plot = _region_plot()
+    names = dict(items)
+    with RecordStore(store_path) as store:
+        for region, data in _prepare(store, list(names)):
+            plot.show(region, data)
+            plot.figure.savefig(os.path.join(out_dir, names[region]), dpi=dpi)
+    return {"pid": os.getpid(), "regions": len(items), "seconds": time.perf_counter() - start}
+
+
+def _prepare_chunk(store_path, regions):
+    with RecordStore(store_path) as store:
+        return _prepare(store, regions)
+
+
+def _pool(workers, n_chunks):
+    ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=min(workers, n_chunks), mp_context=ctx)
+
+
+def export_report(store, out, fmt=None, regions=None, workers=None, dpi=DEFAULT_DPI, progress=None):
+    """
+    Draw the dashboard chart of every region (default: all) into `out`.
+
+    store: an open RecordStore. out: a directory (created if needed) for
+    one file per region in `fmt` (default "png"), or a path ending in
+    ".pdf" for one multi-page PDF. workers: processes (default: CPU
+    count); with 1, everything runs in this process.
+    progress: optional callable(done_regions, total_regions); it may raise to stop.
+
+    Returns a summary with "regions", "output", "seconds" and, for
+    directory output, one timing entry per worker ("pid", "chunks",
+    "regions", "seconds").
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    counts = store.record_counts()
+    if regions is not None:
+        counts = {r: counts[r] for r in regions if r in counts}
+    total = len(counts)
+    if progress is not None:
+        progress(0, total)
+    if out.lower().endswith(".pdf"):
+        _export_pdf(store, out, list(counts), workers, dpi, progress)
+        per_worker = {}
+    else:
+        fmt = (fmt or "png").lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown report format {fmt!r}; expected one of: {', '.join(FORMATS)}")
+        os.makedirs(out, exist_ok=True)
+        per_worker = _export_files(store, out, fmt, counts, workers, dpi, progress)
+    return {
+        "regions": total,
+        "output": out,
+        "workers": sorted(per_worker.values(), key=lambda w: w["pid"]),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _export_files(store, out, fmt, counts, workers, dpi, progress):
+    names = report_filenames(counts, fmt)
+    # A few chunks per worker keeps processes busy when region sizes vary.
+    chunks = [[(region, names[region]) for region in chunk]
+              for chunk in partition_regions(counts, workers * 4)]
+    per_worker = {}
+    done = 0
+
+    def merge(timing):
+        nonlocal done
+        entry = per_worker.setdefault(timing["pid"], {"pid": timing["pid"], "chunks": 0, "regions": 0, "seconds": 0.0})
+        entry["chunks"] += 1
+        entry["regions"] += timing["regions"]
+        entry["seconds"] += timing["seconds"]
+        done += timing["regions"]
+        if progress is not None:
+            progress(done, len(counts))
+
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            merge(_render_chunk(store.path, chunk, out, dpi))
+        return per_worker
+    with _pool(workers, len(chunks)) as pool:
+        futures = [pool.submit(_render_chunk, store.path, chunk, out, dpi) for chunk in chunks]
+        try:
+            for future in as_completed(futures):
+                merge(future.result())
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return per_worker
+
+
+def _export_pdf(store, out, regions, workers, dpi, progress):
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    # Contiguous chunks, consumed in order, keep the pages in store order.
+    size = max(1, -(-len(regions) // (workers * 4)))
+    chunks = [regions[i:i + size] for i in range(0, len(regions), size)]
+    plot = _region_plot()
+    done = 0
+    with PdfPages(out) as pdf:
+        if workers == 1 or len(chunks) <= 1:
+            prepared = (_prepare(store, chunk) for chunk in chunks)
+            pool = None
+        else:
+            pool = _pool(workers, len(chunks))
+            prepared = pool.map(_prepare_chunk, [store.path] * len(chunks), chunks)
+        try:
+            for chunk in prepared:
+                for region, data in chunk:
+                    plot.show(region, data)
+                    pdf.savefig(plot.figure, dpi=dpi)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, len(regions))
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
@@ -0,0 +1,269 @@
+"""
+Columnar per-region time series for the dashboard.
+
+A RegionSeries holds the sorted dates, the NLHI vector and the
+dates x domains DSAV matrix of one region. SeriesCache keeps them in the
+record store, tagged with the region version they were built from, and
+updates them in place when a single record is saved. Recently used
+series are also kept in memory, up to a byte budget, so reopening the
+dashboard rebuilds only the regions that changed.
+
+Records are read in the normalized shape the store keeps (see
+nlhi_migrate): a float "NLHI" and a {domain: float} "DSAV" map. Records
+analyzed by nlhi_uncertainty also give the NLHI band (lower and upper
+vectors, NaN for records without one).
+"""
+import io
+import sys
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+import numpy as np
+
+# The extractors moved to nlhi_migrate; they are re-exported for existing callers.
+from nlhi_migrate import extract_dsav_map, extract_nlhi  # noqa: F401
+
+
+# Percentiles of the stored "Uncertainty" entry drawn as the NLHI band (95% interval).
+BAND = ("p2.5", "p97.5")
+
+# Bytes of RegionSeries a SeriesCache keeps in memory by default.
+MEMO_BUDGET = 64 << 20
+
+
+def _band(record):
+    entry = record.get("Uncertainty")
+    if entry is None:
+        return np.nan, np.nan
+    nlhi = entry["NLHI"]
+    return nlhi[BAND[0]], nlhi[BAND[1]]
+
+
+class RegionSeries:
+    """Dates, NLHI vector and band, and DSAV matrix (dates x domains) of one region."""
+
+    def __init__(self, dates=None, domains=None, nlhi=None, dsav=None, lower=None, upper=None):
+        self.dates = list(dates or [])
+        self.domains = list(domains or [])
+        self.nlhi = np.asarray(nlhi if nlhi is not None else np.zeros(len(self.dates)), dtype=np.float64)
+        self.lower = np.asarray(lower if lower is not None else np.full(len(self.dates), np.nan), dtype=np.float64)
+        self.upper = np.asarray(upper if upper is not None else np.full(len(self.dates), np.nan), dtype=np.float64)
+        if dsav is None:
+            dsav = np.zeros((len(self.dates), len(self.domains)))
+        self.dsav = np.asarray(dsav, dtype=np.float64).reshape(len(self.dates), len(self.domains))
+        self._domain_index = {name: j for j, name in enumerate(self.domains)}
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the series."""
+        arrays = self.nlhi.nbytes + self.lower.nbytes + self.upper.nbytes + self.dsav.nbytes
+        names = sys.getsizeof(self.dates) + sum(map(sys.getsizeof, self.dates))
+        names += 2 * sum(map(sys.getsizeof, self.domains))
+        return arrays + names
+
+    def copy(self):
+        return RegionSeries(self.dates, self.domains, self.nlhi.copy(), self.dsav.copy(),
+                            self.lower.copy(), self.upper.copy())
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build the series from {date: record}.
+
+        Domains are ordered by first appearance over the sorted dates, as in
+        the original dashboard.
+        """
+        dates = sorted(records.keys())
+        entries = [records[d] for d in dates]
+        nlhi = np.fromiter((e.get("NLHI", 0.0) for e in entries), dtype=np.float64, count=len(entries))
+        maps = [e.get("DSAV") or {} for e in entries]
+        bands = np.array([_band(e) for e in entries], dtype=np.float64).reshape(-1, 2)
+        domain_index = {}
+        for dsav_map in maps:
+            for dom in dsav_map:
+                if dom not in domain_index:
+                    domain_index[dom] = len(domain_index)
+        dsav = np.zeros((len(dates), len(domain_index)))
+        for i, dsav_map in enumerate(maps):
+            if dsav_map:
+                cols = [domain_index[dom] for dom in dsav_map]
+                dsav[i, cols] = list(dsav_map.values())
+        return cls(dates, list(domain_index), nlhi, dsav, bands[:, 0], bands[:, 1])
+
+    def upsert(self, date, record):
+        """Insert or replace the row for `date`; new domains are appended as columns."""
+        dsav_map = record.get("DSAV") or {}
+        new = [dom for dom in dsav_map if dom not in self._domain_index]
+        if new:
+            for dom in new:
+                self._domain_index[dom] = len(self.domains)
+                self.domains.append(dom)
+            self.dsav = np.hstack([self.dsav, np.zeros((len(self.dates), len(new)))])
+
+        row = np.zeros(len(self.domains))
+        for dom, value in dsav_map.items():
+            row[self._domain_index[dom]] = value
+
+        lower, upper = _band(record)
+        i = bisect_left(self.dates, date)
+        if i < len(self.dates) and self.dates[i] == date:
+            self.nlhi[i] = record.get("NLHI", 0.0)
+            self.lower[i], self.upper[i] = lower, upper
+            self.dsav[i] = row
+        else:
+            self.dates.insert(i, date)
+            self.nlhi = np.insert(self.nlhi, i, record.get("NLHI", 0.0))
+            self.lower = np.insert(self.lower, i, lower)
+            self.upper = np.insert(self.upper, i, upper)
+            self.dsav = np.insert(self.dsav, i, row, axis=0)
+
+    def to_bytes(self):
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            dates=np.array(self.dates, dtype=str),
+            domains=np.array(self.domains, dtype=str),
+            nlhi=self.nlhi,
+            dsav=self.dsav,
+            lower=self.lower,
+            upper=self.upper,
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        with np.load(io.BytesIO(payload), allow_pickle=False) as z:
+            # Series cached before bands existed have none.
+            bands = [z[name] if name in z.files else None for name in ("lower", "upper")]
+            return cls(z["dates"].tolist(), z["domains"].tolist(), z["nlhi"], z["dsav"], *bands)
+
+
+class SeriesCache:
+    """
+    Persistent RegionSeries per region, stored next to the records.
+
+    A cached series is valid only while its version equals the region's
+    version in the store, so writes from other tools force a rebuild.
+
+    In front of the stored series sits an in-memory LRU of at most
+    budget_bytes, keyed by region and version (versions never repeat,
+    not even for a region deleted and added again). Series returned by
+    get() are shared: treat them as read-only. Safe to use from several
+    threads.
+    """
+
+    def __init__(self, store, budget_bytes=MEMO_BUDGET):
+        self.store = store
+        self.budget_bytes = budget_bytes
+        self._memo = OrderedDict()  # region -> (version, series, nbytes), least recently used first
+        self._memo_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _load(self, region, version):
+        cached = self.store.get_series(region)
+        if cached is not None and cached[0] == version:
+            return RegionSeries.from_bytes(cached[1])
+        return None
+
+    def _lookup(self, region, version):
+        entry = self._memo.get(region)
+        if entry is not None and entry[0] == version:
+            self._memo.move_to_end(region)
+            return entry[1]
+        return None
+
+    def _forget(self, region):
+        entry = self._memo.pop(region, None)
+        if entry is not None:
+            self._memo_bytes -= entry[2]
+
+    def _remember(self, region, version, series):
+        nbytes = series.nbytes
+        with self._lock:
+            self._forget(region)
+            if nbytes > self.budget_bytes:
+                return
+            self._memo[region] = (version, series, nbytes)
+            self._memo_bytes += nbytes
+            while self._memo_bytes > self.budget_bytes:
+                _, (_, _, size) = self._memo.popitem(last=False)
+                self._memo_bytes -= size
+                self.evictions += 1
+
+    def get(self, region):
+        version = self.store.region_version(region)
+        with self._lock:
+            series = self._lookup(region, version)
+            if series is not None:
+                self.hits += 1
+                return series
+            self.misses += 1
+        if version is None:
+            with self._lock:
+                self._forget(region)
+            return RegionSeries()
+        series = self._load(region, version)
+        if series is None:
+            series = RegionSeries.from_records(self.store.region_records(region))
+            self.store.put_series(region, version, series.to_bytes())
+        self._remember(region, version, series)
+        return series
+
+    def record_saved(self, region, date, record, version):
+        """
+        Apply one saved record to the cached series of `region`.
+
+        `version` is the region version returned by the store write; the
+        cached series is patched only if it was current just before it.
+        """
+        with self._lock:
+            series = self._lookup(region, version - 1)
+        if series is not None:
+            # Patch a copy: readers may hold the memoized one.
+            series = series.copy()
+        else:
+            series = self._load(region, version - 1)
+        if series is None:
+            series = RegionSeries.from_records(self.store.region_records(region))
+        else:
+            series.upsert(date, record)
+        self.store.put_series(region, version, series.to_bytes())
+        self._remember(region, version, series)
+        return series
+
+    def adopt(self, region, version, series):
+        """
+        Memoize `series`, built by the caller, as the series of `region` at `version`.
+
+        The caller gives up the series: it is shared from then on.
+        """
+        self._remember(region, version, series)
+
+    def mark_dirty(self, *regions):
+        """
+        Drop the memoized series of `regions`, which the caller knows changed.
+
+        Not needed for correctness (get() compares versions); it frees the
+        memory of series that would only be rebuilt.
+        """
+        with self._lock:
+            for region in regions:
+                self._forget(region)
+
+    def invalidate(self, region):
+        self.mark_dirty(region)
+        self.store.delete_series(region)
+
+    def stats(self):
+        """Memo counters for tuning budget_bytes."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "regions": len(self._memo),
+                "bytes": self._memo_bytes,
+                "budget_bytes": self.budget_bytes,
+            }
@@ -0,0 +1,449 @@
+"""
+Local HTTP/JSON service for NLHI, built on asyncio and the standard library.
+
+    python nlhi_cli.py serve --store nlhi_data.sqlite3 --port 8765
+
+Endpoints (all JSON):
+
+    GET  /health                          status and number of unwritten records
+    GET  /regions                         [{"region", "records"}]
+    GET  /regions/{region}/series         dates, NLHI and the dates x domains DSAV
+                                          matrix, as drawn by the dashboard
+                                          (optional ?from=&to= date range)
+    GET  /regions/{region}/records/{date} one stored record
+    POST /records                         compute and save one record or a list:
+                                          {"region", "date", "age", "population",
+                                           "le", "domains": [{"name", "tliphs",
+                                           "unit", "mortality"}]}
+    GET  /query                           nlhi_query aggregates: ?regions=A,B
+                                          &from=&to=&period=month&weighted=1
+                                          &domains=1
+
+One event loop serves every connection. Region series come from one
+nlhi_series.SeriesCache, whose in-memory part is bounded by a byte
+budget. Submitted records are written to the store in batches
+(write-behind): every FLUSH_INTERVAL seconds, or sooner when FLUSH_BATCH
+records are waiting, in one transaction on a dedicated writer thread.
+Until then a region with unwritten records is served from a private copy
+of its cached series with those records applied, so reads see them
+immediately; the cache notices writes by other processes through the
+region versions in the store.
+"""
+import asyncio
+import datetime
+import json
+import math
+import sys
+import traceback
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from nlhi_core import UNIT_CONVERSION, compute_record, safe_float
+from nlhi_metrics import timer
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Write-behind: seconds between flushes, and the backlog that triggers an early one.
+FLUSH_INTERVAL = 0.25
+FLUSH_BATCH = 500
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """Turned into a JSON error response with the given status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _number(payload, key, positive=False):
+    value = safe_float(payload.get(key), None)
+    if value is None or not math.isfinite(value) or (positive and value <= 0):
+        kind = "a positive number" if positive else "a number"
+        raise HTTPError(400, f"{key!r} must be {kind}")
+    return value
+
+
+def parse_submission(payload):
+    """(region, date, record) from a POST /records item; raises HTTPError(400)."""
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Each record must be a JSON object")
+    region = str(payload.get("region") or "").strip()
+    if not region:
+        raise HTTPError(400, "'region' is required")
+    try:
+        date = datetime.date.fromisoformat(str(payload.get("date"))).isoformat()
+    except ValueError:
+        raise HTTPError(400, "'date' must be YYYY-MM-DD") from None
+    age = _number(payload, "age", positive=True)
+    pop = _number(payload, "population", positive=True)
+    le = _number(payload, "le", positive=True)
+    domains = payload.get("domains")
+    if not isinstance(domains, list):
+        raise HTTPError(400, "'domains' must be a list")
+    rows = []
+    for d in domains:
+        if not isinstance(d, dict):
+            raise HTTPError(400, "Each domain must be a JSON object")
+        unit = d.get("unit", "Day(s)")
+        if unit not in UNIT_CONVERSION:
+            raise HTTPError(400, f"Unknown TLIPHS unit {unit!r}; expected one of: {', '.join(UNIT_CONVERSION)}")
+        rows.append((str(d.get("name", "")), _number(d, "tliphs"), unit, _number(d, "mortality")))
+    record = compute_record(age, pop, le, rows)
+    if record is None:
+        raise HTTPError(400, "At least one named domain is required")
+    return region, date, record
+
+
+class _Overlay:
+    """Copy of a region's series at store `version` plus its unwritten records."""
+
+    __slots__ = ("version", "series")
+
+    def __init__(self, version, series):
+        self.version = version
+        self.series = series
+
+
+class NLHIService:
+    """
+    Shared series cache and write-behind queue over a RecordStore.
+
+    Coroutines run on the event loop; store access that can take more than
+    a few microseconds goes to a thread (reads) or the single writer thread.
+    """
+
+    def __init__(self, store, flush_interval=FLUSH_INTERVAL, flush_batch=FLUSH_BATCH):
+        from nlhi_series import SeriesCache
+
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.cache = SeriesCache(store)
+        self._overlays = {}
+        self._loads = {}
+        self._pending = {}
+        self._flushing = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlhi-writer")
+        self._wake = asyncio.Event()
+        self._query = None
+
+    # Writes
+    def submit(self, region, date, record):
+        """Queue a computed record and apply it to the overlay of its region, if any."""
+        self._pending[(region, date)] = record
+        overlay = self._overlays.get(region)
+        if overlay is not None:
+            overlay.series.upsert(date, record)
+        if len(self._pending) >= self.flush_batch:
+            self._wake.set()
+
+    def _write(self, batch):
+        with timer("server.flush"):
+            self.store.put_records((region, date, record) for (region, date), record in batch.items())
+        return {region: self.store.region_version(region) for region, _ in batch}
+
+    async def flush(self):
+        """Write every queued record in one transaction; returns the number written."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        try:
+            versions = await asyncio.get_running_loop().run_in_executor(self._writer, self._write, batch)
+        except Exception:
+            # Keep the records (newer submissions win) and retry on the next flush.
+            self._pending = {**batch, **self._pending}
+            raise
+        finally:
+            self._flushing = {}
+        pending = {region for region, _ in self._pending}
+        for region, version in versions.items():
+            overlay = self._overlays.pop(region, None)
+            # The overlay holds these records; reuse it only if no one else wrote in between.
+            if overlay is None or overlay.version is None or version != overlay.version + 1:
+                continue
+            if region in pending:
+                overlay.version = version
+                self._overlays[region] = overlay
+            else:
+                self.cache.adopt(region, version, overlay.series)
+        return len(batch)
+
+    async def run_flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                traceback.print_exc()
+
+    @property
+    def backlog(self):
+        return len(self._pending) + len(self._flushing)
+
+    def _unwritten(self):
+        return {**self._flushing, **self._pending}
+
+    # Reads
+    async def series(self, region):
+        """RegionSeries of a region including unwritten records; HTTPError(404) if unknown."""
+        version = self.store.region_version(region)
+        overlay = self._overlays.get(region)
+        if overlay is not None and (overlay.version == version or any(r == region for r, _ in self._flushing)):
+            return overlay.series
+        if version is None and not any(r == region for r, _ in self._unwritten()):
+            raise HTTPError(404, f"Unknown region: {region!r}")
+        load = self._loads.get(region)
+        if load is None:
+            load = self._loads[region] = asyncio.ensure_future(self._load(region, version))
+            load.add_done_callback(lambda _: self._loads.pop(region, None))
+        return await load
+
+    async def _load(self, region, version):
+        series = await asyncio.get_running_loop().run_in_executor(None, self.cache.get, region)
+        unwritten = [(date, record) for (r, date), record in self._unwritten().items() if r == region]
+        if not unwritten:
+            self._overlays.pop(region, None)
+            return series
+        # Cached series are shared and read-only; apply the unwritten records to a copy.
+        series = series.copy()
+        for date, record in unwritten:
+            series.upsert(date, record)
+        self._overlays[region] = _Overlay(version, series)
+        return series
+
+    def record(self, region, date):
+        record = self._unwritten().get((region, date))
+        if record is None:
+            record = self.store.get_record(region, date)
+        if record is None:
+            raise HTTPError(404, f"No record for {region!r} on {date}")
+        return record
+
+    async def regions(self):
+        unwritten = list(self._unwritten())
+
+        def count():
+            counts = self.store.record_counts()
+            for region, date in unwritten:
+                if region not in counts:
+                    counts[region] = 0
+                if self.store.get_record(region, date) is None:
+                    counts[region] += 1
+            return [{"region": region, "records": n} for region, n in counts.items()]
+
+        return await asyncio.get_running_loop().run_in_executor(None, count)
+
+    async def query(self, params):
+        """nlhi_query aggregates over the committed store; queued records are flushed first."""
+        from nlhi_query import PERIODS, QueryEngine
+
+        await self.flush()
+        if self._query is None:
+            self._query = QueryEngine(self.store)
+        regions = [r for r in params.get("regions", "").split(",") if r] or self.store.regions()
+        start, end = params.get("from") or None, params.get("to") or None
+        weighted = params.get("weighted", "") in ("1", "true", "yes")
+        period = params.get("period")
+        if period is not None and period not in PERIODS:
+            raise HTTPError(400, f"'period' must be one of: {', '.join(PERIODS)}")
+
+        def run():
+            if params.get("domains", "") in ("1", "true", "yes"):
+                return {"dsav": self._query.mean_dsav(regions, start, end, weighted)}
+            if period:
+                return {"periods": self._query.resample(regions, period, start, end, weighted)}
+            return {"nlhi": self._query.mean_nlhi(regions, start, end, weighted)}
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, run)
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+        return {"regions": regions, **result}
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+
+def series_json(region, series, start=None, end=None):
+    i = 0 if start is None else bisect_left(series.dates, start)
+    j = len(series.dates) if end is None else bisect_right(series.dates, end)
+    return {
+        "region": region,
+        "dates": series.dates[i:j],
+        "nlhi": series.nlhi[i:j].tolist(),
+        "domains": list(series.domains),
+        "dsav": series.dsav[i:j].tolist(),
+    }
+
+
+class NLHIServer:
+    """HTTP/1.1 front end (keep-alive, JSON bodies) for an NLHIService."""
+
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server = None
+        self._flusher = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._flusher = asyncio.ensure_future(self.service.run_flusher())
+
+    async def close(self):
+        """Stop accepting connections and write every queued record."""
+        self._server.close()
+        await self._server.wait_closed()
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        await self.service.flush()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Serving NLHI on http://{self.host}:{self.port}/", file=sys.stderr)
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                try:
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    traceback.print_exc()
+                    status, payload = 500, {"error": str(e)}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _readline(reader):
+        try:
+            return await reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+            raise HTTPError(400, "Request line or header too long") from None
+
+    async def _read_request(self, reader):
+        line = await self._readline(reader)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+        headers = {}
+        while True:
+            line = await self._readline(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length header")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+        return method.upper(), target, headers, body, keep_alive
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        """Route one request; returns the JSON payload or raises HTTPError."""
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        service = self.service
+
+        if parts == ["records"]:
+            if method != "POST":
+                raise HTTPError(405, "Use POST to submit records")
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                raise HTTPError(400, "Body is not valid JSON") from None
+            items = [parse_submission(p) for p in (payload if isinstance(payload, list) else [payload])]
+            for region, date, record in items:
+                service.submit(region, date, record)
+            results = [{"region": region, "date": date, "record": record} for region, date, record in items]
+            return results if isinstance(payload, list) else results[0]
+
+        if method != "GET":
+            raise HTTPError(405, f"{method} is not supported here")
+        if parts == ["health"]:
+            return {"status": "ok", "unwritten": service.backlog}
+        if parts == ["regions"]:
+            return await service.regions()
+        if len(parts) == 3 and parts[0] == "regions" and parts[2] == "series":
+            series = await service.series(parts[1])
+            return series_json(parts[1], series, params.get("from"), params.get("to"))
+        if len(parts) == 4 and parts[0] == "regions" and parts[2] == "records":
+            return service.record(parts[1], parts[3])
+        if parts == ["query"]:
+            return await service.query(params)
+        raise HTTPError(404, f"No route for {url.path}")
+
+
+def serve(store_path, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the service until interrupted."""
+    from nlhi_store import RecordStore
+
+    async def main():
+        with RecordStore(store_path) as store:
+            service = NLHIService(store)
+            try:
+                await NLHIServer(service, host, port).serve_forever()
+            finally:
+                service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
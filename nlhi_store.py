@@ -0,0 +1,439 @@
+"""
+SQLite-backed record store for NLHI.
+
+Each (region, date) record is one row, so saving a record costs O(record)
+instead of rewriting the whole history, and every write is an atomic
+transaction. Records are kept in the same dict shape that
+NLHIApp.calculate_and_save builds, serialized as compact JSON.
+
+A RecordStore may be used from several threads; each thread gets its own
+SQLite connection.
+
+Several app instances may share one store file. The store runs in WAL
+mode, so readers never wait for a writer and writers queue on SQLite's
+lock (for up to `timeout` seconds) instead of overwriting each other.
+WAL needs shared memory and does not work on network file systems; for a
+store on an SMB/NFS share set NLHI_JOURNAL_MODE=delete to use the
+rollback journal and its file locks instead.
+
+Every write is also appended to a change log in the same transaction.
+Another instance polls changes_since() with the last sequence number it
+has seen and reloads only the records and regions that changed.
+
+Records are stored normalized (see nlhi_migrate): every write and every
+imported legacy JSON file is normalized, and opening a store written by
+an older version normalizes its records once.
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import namedtuple
+
+from nlhi_metrics import timer
+from nlhi_migrate import iter_legacy_json, normalize_record
+
+
+STORE_FILE = "nlhi_data.sqlite3"
+
+JOURNAL_MODE_ENV = "NLHI_JOURNAL_MODE"
+
+# Change log entries kept for instances that poll; an instance that falls
+# further behind reloads everything.
+CHANGE_LOG_LIMIT = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS regions (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS records (
+    region TEXT NOT NULL,
+    date TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (region, date)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS series (
+    region TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS region_tombstones (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    region TEXT NOT NULL,
+    date TEXT,
+    writer TEXT NOT NULL
+);
+"""
+
+# Bumped whenever _SCHEMA changes; see RecordStore._upgrade().
+SCHEMA_VERSION = 4
+
+# One change log entry. date is None when the whole region changed (added,
+# deleted or written in bulk).
+Change = namedtuple("Change", "seq region date writer")
+
+
+def encode_record(record):
+    """Compact JSON payload of a record, as stored in the records table."""
+    return json.dumps(record, separators=(",", ":"))
+
+
+
+class RecordStore:
+    """Region list and per-(region, date) records in one SQLite file."""
+
+    def __init__(self, path=STORE_FILE, timeout=30.0, journal_mode=None):
+        self.path = path
+        self.timeout = timeout
+        # Identifies this instance's entries in the change log.
+        self.writer_id = uuid.uuid4().hex
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        journal_mode = journal_mode or os.environ.get(JOURNAL_MODE_ENV) or "wal"
+        self.journal_mode = self._conn.execute(f"PRAGMA journal_mode = {journal_mode}").fetchone()[0]
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._upgrade()
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _upgrade(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            columns = [r[1] for r in self._conn.execute("PRAGMA table_info(regions)")]
+            if "version" not in columns:
+                self._conn.execute("ALTER TABLE regions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        # Version 2 only added the changes table, which _SCHEMA creates.
+        if version < 3:
+            self._normalize_records()
+        # Version 4 only added the region_tombstones table, which _SCHEMA creates.
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _normalize_records(self):
+        """Rewrite every record not yet in normalized form, one region at a time."""
+        regions = [r[0] for r in self._conn.execute("SELECT DISTINCT region FROM records")]
+        if not regions:
+            return
+        changed = []
+        with timer("store.normalize_records") as span:
+            for region in regions:
+                rows = self._conn.execute(
+                    "SELECT date, payload FROM records WHERE region = ?", (region,)).fetchall()
+                updates = []
+                for date, payload in rows:
+                    record = json.loads(payload)
+                    normalized = normalize_record(record)
+                    if normalized != record:
+                        updates.append((encode_record(normalized), region, date))
+                        span.add_bytes(len(updates[-1][0]))
+                if updates:
+                    self._conn.executemany(
+                        "UPDATE records SET payload = ? WHERE region = ? AND date = ?", updates)
+                    changed.append(region)
+            if changed:
+                self._bump(changed)
+                self._conn.executemany("DELETE FROM series WHERE region = ?", [(r,) for r in changed])
+                self._log([(region, None) for region in changed])
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Regions
+    def regions(self):
+        """Region names in insertion order."""
+        return [r[0] for r in self._conn.execute("SELECT name FROM regions ORDER BY position")]
+
+    def has_region(self, region):
+        cur = self._conn.execute("SELECT 1 FROM regions WHERE name = ?", (region,))
+        return cur.fetchone() is not None
+
+    def _add_region(self, region):
+        """Insert a region if it is new; returns True if it was."""
+        # A region added again continues after the versions it had before it was deleted.
+        cur = self._conn.execute(
+            "INSERT OR IGNORE INTO regions (name, position, version) "
+            "SELECT ?, COALESCE(MAX(position), -1) + 1, "
+            "COALESCE((SELECT version + 1 FROM region_tombstones WHERE name = ?), 0) FROM regions",
+            (region, region),
+        )
+        return cur.rowcount > 0
+
+    def add_region(self, region):
+        """Register a region; a no-op if it already exists."""
+        with timer("store.add_region"), self._conn:
+            if self._add_region(region):
+                self._log([(region, None)])
+
+    def delete_region(self, region):
+        """
+        Delete a region, its records and its cached series in one transaction.
+
+        Its last version is kept, so that the versions of a region added
+        again under the same name never repeat.
+        """
+        with timer("store.delete_region"), self._conn:
+            self._conn.execute("DELETE FROM records WHERE region = ?", (region,))
+            self._conn.execute("DELETE FROM series WHERE region = ?", (region,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO region_tombstones (name, version) "
+                "SELECT name, version FROM regions WHERE name = ?", (region,))
+            self._conn.execute("DELETE FROM regions WHERE name = ?", (region,))
+            self._log([(region, None)])
+
+    def record_counts(self):
+        """{region: number of records}, from the (region, date) index."""
+        counts = {region: 0 for region in self.regions()}
+        for region, n in self._conn.execute("SELECT region, COUNT(*) FROM records GROUP BY region"):
+            counts[region] = n
+        return counts
+
+    def region_version(self, region):
+        """
+        Counter bumped on every record write to the region; None if it does not exist.
+
+        Never repeats for a name, even across delete_region() and re-adding,
+        so (region, version) identifies the region's contents.
+        """
+        row = self._conn.execute("SELECT version FROM regions WHERE name = ?", (region,)).fetchone()
+        return row[0] if row else None
+
+    # Records
+    def _put(self, region, date, payload):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO records (region, date, payload) VALUES (?, ?, ?)",
+            (region, date, payload),
+        )
+
+    def _bump(self, regions):
+        self._conn.executemany(
+            "UPDATE regions SET version = version + 1 WHERE name = ?", [(r,) for r in regions])
+
+    def put_record(self, region, date, record):
+        """
+        Insert or replace one record, registering the region if needed.
+
+        Only this (region, date) row is written, so instances saving other
+        records of the same store never overwrite each other's work. The
+        record is stored normalized (nlhi_migrate.normalize_record).
+        Returns the region's new version.
+        """
+        with timer("store.put_record") as span, self._conn:
+            payload = encode_record(normalize_record(record))
+            span.add_bytes(len(payload))
+            new_region = self._add_region(region)
+            self._put(region, date, payload)
+            self._bump([region])
+            self._log([(region, None if new_region else date)])
+            return self.region_version(region)
+
+    def put_records(self, items, encoded=False):
+        """
+        Insert or replace many (region, date, record) items in one transaction.
+
+        Records are stored normalized (nlhi_migrate.normalize_record). With
+        encoded=True they are already normalized JSON strings (as produced by
+        encode_record), which lets worker processes do the serialization.
+        Each touched region's version is bumped once and logged as one
+        whole-region change.
+        """
+        touched = {}
+        with timer("store.put_records") as span, self._conn:
+            for region, date, record in items:
+                if region not in touched:
+                    self._add_region(region)
+                    touched[region] = True
+                payload = record if encoded else encode_record(normalize_record(record))
+                span.add_bytes(len(payload))
+                self._put(region, date, payload)
+            self._bump(touched)
+            self._log([(region, None) for region in touched])
+
+    def get_record(self, region, date):
+        cur = self._conn.execute(
+            "SELECT payload FROM records WHERE region = ? AND date = ?", (region, date))
+        row = cur.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def dates(self, region):
+        """Sorted record dates of a region, read from the (region, date) index only."""
+        cur = self._conn.execute("SELECT date FROM records WHERE region = ? ORDER BY date", (region,))
+        return [r[0] for r in cur]
+
+    def region_records(self, region):
+        """All records of a region as {date: record}, sorted by date."""
+        cur = self._conn.execute(
+            "SELECT date, payload FROM records WHERE region = ? ORDER BY date", (region,))
+        return {date: json.loads(payload) for date, payload in cur}
+
+    def load_all(self):
+        """The whole store as {region: {date: record}}, like the legacy JSON file."""
+        data = {region: {} for region in self.regions()}
+        cur = self._conn.execute("SELECT region, date, payload FROM records ORDER BY region, date")
+        for region, date, payload in cur:
+            data.setdefault(region, {})[date] = json.loads(payload)
+        return data
+
+    # Change log
+    def _log(self, changes):
+        """Append (region, date) changes inside the caller's transaction."""
+        cur = self._conn.executemany(
+            "INSERT INTO changes (region, date, writer) VALUES (?, ?, ?)",
+            [(region, date, self.writer_id) for region, date in changes],
+        )
+        if cur.rowcount:
+            self._conn.execute(
+                "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (CHANGE_LOG_LIMIT,))
+
+    def last_change(self):
+        """Sequence number of the latest change, 0 if there is none."""
+        return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq):
+        """
+        Changes after sequence number `seq`, oldest first, as Change tuples.
+
+        Returns None if entries after `seq` have already been pruned from
+        the log; the caller must then reload everything.
+        """
+        oldest = self._conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        if oldest is not None and oldest > seq + 1:
+            return None
+        cur = self._conn.execute(
+            "SELECT seq, region, date, writer FROM changes WHERE seq > ? ORDER BY seq", (seq,))
+        return [Change(*row) for row in cur]
+
+    def data_version(self):
+        """
+        Counter that changes whenever another connection commits to the file.
+
+        Costs no I/O, so pollers check it before querying the change log.
+        """
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # Cached derived series (see nlhi_series.SeriesCache)
+    def get_series(self, region):
+        """(version, payload) of the cached series of a region, or None."""
+        row = self._conn.execute(
+            "SELECT version, payload FROM series WHERE region = ?", (region,)).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def put_series(self, region, version, payload):
+        with timer("store.put_series") as span, self._conn:
+            span.add_bytes(len(payload))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series (region, version, payload) VALUES (?, ?, ?)",
+                (region, version, sqlite3.Binary(payload)),
+            )
+
+    def delete_series(self, region):
+        with self._conn:
+            self._conn.execute("DELETE FROM series WHERE region = ?", (region,))
+
+    # Metadata
+    def get_meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # Legacy JSON files
+    def import_legacy(self, data_files, regions_file=None):
+        """
+        Copy the first existing legacy JSON data file (and regions.json) into the store.
+
+        Runs at most once per store; returns the number of records imported.
+        """
+        if self.get_meta("legacy_imported"):
+            return 0
+        path = next((p for p in data_files if os.path.exists(p)), None)
+        return self._import_json(path, regions_file, legacy=True)
+
+    def import_json(self, path, regions_file=None):
+        """
+        Store every record of a legacy {region: {date: record}} JSON file, normalized.
+
+        The file is read one region at a time (nlhi_migrate.iter_legacy_json),
+        so it may be larger than memory. Regions listed in `regions_file` are
+        registered first, in its order. A malformed data file imports no
+        records, as if it were empty; existing records with the same region
+        and date are replaced. Returns the number of records imported.
+        """
+        return self._import_json(path, regions_file)
+
+    def _import_json(self, path, regions_file, legacy=False):
+        # legacy=True also marks the store as imported, in the same transaction.
+        regions = []
+        if regions_file and os.path.exists(regions_file):
+            with open(regions_file, "r") as f:
+                try:
+                    regions = list(json.load(f))
+                except json.JSONDecodeError:
+                    pass
+
+        count = 0
+        with timer("store.import_legacy") as span, self._conn:
+            for region in regions:
+                self._add_region(region)
+            touched = dict.fromkeys(regions)
+            if path is not None:
+                # The savepoint must sit inside the import's transaction.
+                if not self._conn.in_transaction:
+                    self._conn.execute("BEGIN")
+                self._conn.execute("SAVEPOINT import_json")
+                try:
+                    for region, entries in iter_legacy_json(path):
+                        self._add_region(region)
+                        touched[region] = None
+                        if not isinstance(entries, dict):
+                            continue
+                        for date, record in entries.items():
+                            payload = encode_record(normalize_record(record))
+                            span.add_bytes(len(payload))
+                            self._put(region, date, payload)
+                            count += 1
+                except ValueError:
+                    self._conn.execute("ROLLBACK TO import_json")
+                    touched, count = dict.fromkeys(regions), 0
+                self._conn.execute("RELEASE import_json")
+            self._bump(touched)
+            self._log([(region, None) for region in touched])
+            if legacy:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+        return count
+
+    def export_json(self, path):
+        """Write the store in the legacy nested nlhi_data.json layout."""
+        with open(path, "w") as f:
+            json.dump(self.load_all(), f, indent=2)
@@ -0,0 +1,111 @@
+"""
+Background execution for the NLHI GUI.
+
+A Task wraps a plain function and runs it on a QThreadPool. The function
+receives the task as its first argument so it can report progress and
+check for cancellation; results, errors and progress come back to the GUI
+thread through Qt signals. A failing task's traceback is logged; the
+`failed` signal carries only the message, for display.
+"""
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+log = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task function when the task has been cancelled."""
+
+
+class TaskSignals(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Task(QRunnable):
+    """Run fn(task, *args, **kwargs) on a worker thread."""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self._cancel = threading.Event()
+        self.done = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    def report(self, done, total):
+        """Emit progress and raise TaskCancelled if the task was cancelled."""
+        self.signals.progress.emit(int(done), int(total))
+        self.check_cancelled()
+
+    def run(self):
+        try:
+            self.check_cancelled()
+            result = self.fn(self, *self.args, **self.kwargs)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            log.exception("Task %s failed", getattr(self.fn, "__qualname__", self.fn))
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+        finally:
+            self.done.set()
+
+
+class TaskRunner:
+    """
+    Submit Tasks to a thread pool and keep them alive until they finish.
+
+    max_threads=1 gives a serial queue, used for store writes so that saves
+    are applied in the order they were made.
+    """
+
+    def __init__(self, max_threads=None):
+        if max_threads is None:
+            self.pool = QThreadPool.globalInstance()
+        else:
+            self.pool = QThreadPool()
+            self.pool.setMaxThreadCount(max_threads)
+        self.active = set()
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, on_cancel=None, **kwargs):
+        task = Task(fn, *args, **kwargs)
+        if on_done is not None:
+            task.signals.finished.connect(on_done)
+        if on_error is not None:
+            task.signals.failed.connect(on_error)
+        if on_progress is not None:
+            task.signals.progress.connect(on_progress)
+        if on_cancel is not None:
+            task.signals.cancelled.connect(on_cancel)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(lambda *_, t=task: self.active.discard(t))
+        self.active.add(task)
+        self.pool.start(task)
+        return task
+
+    def cancel_all(self):
+        for task in list(self.active):
+            task.cancel()
+
+    def wait(self, msecs=-1):
+        """Block until all submitted tasks have finished."""
+        return self.pool.waitForDone(msecs)
@@ -0,0 +1,344 @@
+"""
+Monte Carlo uncertainty and sensitivity of stored NLHI values.
+
+Mean age, population, life expectancy, mortality and TLIPHS are point
+estimates with confidence intervals. Each input is drawn from a normal
+distribution whose 95% interval is the value +/- a relative half-width
+(DEFAULT_CI, clipped at 0), and the draws go through the DSTLYA/DSAV/NLHI
+formulas of nlhi_core. Domain inputs are drawn independently per domain;
+since NLHI = 100 * (mean TLIPHS years + mean mortality * (LE - age)) /
+(age * population), only the means over the domains are sampled, so the
+cost of a record does not depend on its number of domains.
+
+All records share one set of standard normal draws (common random
+numbers): results do not depend on how records are chunked across
+processes, and bands of neighbouring dates do not jitter from sampling
+noise. Records are processed in batches as (records x samples) arrays.
+
+analyze_all() adds an "Uncertainty" entry to every stored record:
+
+    {"samples": n, "ci": {input: half-width},
+     "NLHI": {"p2.5": ..., "p50": ..., "p97.5": ...},
+     "sensitivity": {"LE-age", "age", "population", "mortality", "TLIPHS"},
+     "variance_share": {input: share}}
+
+"sensitivity" is the change in NLHI per unit change of each parameter at
+the point estimate: per year of LE - age (age held), per year of age
+(LE - age held), per person, per unit of every domain's mortality and per
+year of every domain's TLIPHS. "variance_share" is the fraction of the
+sampled NLHI variance explained linearly by each input. Saving or
+recomputing a record drops its entry, so run the analysis again after
+changing records.
+"""
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from nlhi_recompute import RecordNotRecomputable, partition_regions
+from nlhi_store import RecordStore, encode_record
+
+
+INPUTS = ("age", "population", "le", "mortality", "tliphs")
+
+# Relative half-width of each input's 95% confidence interval.
+DEFAULT_CI = {"age": 0.02, "population": 0.05, "le": 0.02, "mortality": 0.10, "tliphs": 0.10}
+
+PERCENTILES = (2.5, 50.0, 97.5)
+SENSITIVITY_KEYS = ("LE-age", "age", "population", "mortality", "TLIPHS")
+DEFAULT_SAMPLES = 20_000
+DEFAULT_SEED = 0
+
+# Values per (records x samples) batch array; small enough to stay in cache.
+BATCH_VALUES = 1 << 16
+
+_Z95 = 1.959963984540054
+
+_PARAM_KEYS = ("MeanAge", "Population", "AvgLifeExpectancy")
+
+
+def check_ci(ci):
+    """DEFAULT_CI updated with `ci` ({input: relative half-width}); raises ValueError for bad entries."""
+    out = dict(DEFAULT_CI)
+    for name, value in (ci or {}).items():
+        if name not in out:
+            raise ValueError(f"Unknown uncertain input {name!r}; expected one of: {', '.join(INPUTS)}")
+        if not value >= 0:
+            raise ValueError(f"Confidence half-width of {name!r} must be >= 0, got {value!r}")
+        out[name] = float(value)
+    return out
+
+
+def record_inputs(record):
+    """
+    (age, population, LE, mean TLIPHS years, mean mortality, sd factors) of a stored record.
+
+    The sd factors scale the relative half-widths of mortality and TLIPHS
+    to the standard deviation of their means over independent domains.
+    Raises RecordNotRecomputable for records without complete domain inputs
+    or without a positive MeanAge, Population and AvgLifeExpectancy.
+    """
+    domains = record.get("domains") if isinstance(record, dict) else None
+    if not isinstance(domains, dict) or not domains:
+        raise RecordNotRecomputable("record has no domain inputs")
+    params = [record.get(key) for key in _PARAM_KEYS]
+    if not all(isinstance(v, (int, float)) and v > 0 for v in params):
+        raise RecordNotRecomputable(f"record has no positive {', '.join(_PARAM_KEYS)}")
+    if not all("TLIPHS_years" in d and "Mortality" in d for d in domains.values()):
+        raise RecordNotRecomputable("record has a domain without TLIPHS_years or Mortality")
+    ty = [d["TLIPHS_years"] for d in domains.values()]
+    mort = [d["Mortality"] for d in domains.values()]
+    n = len(domains)
+    return (
+        *params,
+        sum(ty) / n,
+        sum(mort) / n,
+        math.sqrt(sum(t * t for t in ty)) / n,
+        math.sqrt(sum(m * m for m in mort)) / n,
+    )
+
+
+def standard_draws(samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED):
+    """The (samples x len(INPUTS)) standard normal draws shared by all records."""
+    return np.random.default_rng(seed).standard_normal((samples, len(INPUTS)))
+
+
+def _nlhi(age, pop, le, ty, mort):
+    denom = age * pop
+    return np.divide(100.0 * (ty + mort * (le - age)), denom,
+                     out=np.zeros(np.broadcast(denom, ty).shape), where=denom != 0)
+
+
+def _sampled_nlhi(mean, sd, draws_t, low):
+    """
+    (records x samples) NLHI of the draws, in float32.
+
+    draws_t: (len(INPUTS), samples) float32 draws. low: (records,
+    len(INPUTS)) smallest value each input takes over the draws; inputs
+    that may fall below 0 are clipped at 0.
+    """
+    x = []
+    for k in range(len(INPUTS)):
+        values = np.multiply(sd[:, k, None], draws_t[k])
+        values += mean[:, k, None]
+        if (low[:, k] <= 0).any():
+            np.maximum(values, 0.0, out=values)
+        x.append(values)
+    age, pop, le, mort, ty = x
+    le -= age
+    le *= mort
+    le += ty
+    le *= 100.0
+    age *= pop
+    if (low[:, :2] > 0).all():
+        return np.divide(le, age, out=le)
+    return np.divide(le, age, out=np.zeros_like(le), where=age != 0)
+
+
+def _select(y, ks, lo, hi):
+    # Fix the middle order statistic first so each later partition only
+    # scans the slice between two fixed positions; one np.partition call
+    # with several kth is several times slower on long rows.
+    if not ks:
+        return
+    mid = len(ks) // 2
+    k = ks[mid]
+    y[:, lo:hi].partition(k - lo, axis=1)
+    _select(y, ks[:mid], lo, k)
+    _select(y, ks[mid + 1:], k + 1, hi)
+
+
+def row_percentiles(y, q):
+    """
+    np.percentile(y, q, axis=1) with linear interpolation, as (len(q), rows).
+
+    Partitions `y` in place, so the order of each row is lost.
+    """
+    n = y.shape[1]
+    pos = np.asarray(q, dtype=np.float64) / 100.0 * (n - 1)
+    ks = np.floor(pos).astype(int)
+    fixed = sorted(set(ks.tolist()))
+    _select(y, fixed, 0, n)
+    out = np.empty((len(ks), len(y)))
+    for i, (k, frac) in enumerate(zip(ks.tolist(), (pos - ks).tolist())):
+        below = y[:, k]
+        if k + 1 >= n:
+            out[i] = below
+            continue
+        # The next order statistic is the smallest value up to the next fixed position.
+        following = [f for f in fixed if f > k]
+        above = y[:, k + 1:(following[0] if following else n - 1) + 1].min(axis=1)
+        out[i] = below + frac * (above - below)
+    return out
+
+
+def analyze_inputs(inputs, ci=None, draws=None):
+    """
+    Percentiles, sensitivities and variance shares for many records at once.
+
+    inputs: (n, 7) rows as returned by record_inputs(). draws: shared
+    standard normal draws (default: standard_draws()). Returns a dict of
+    arrays: "percentiles" (n, len(PERCENTILES)), "sensitivity"
+    (n, len(SENSITIVITY_KEYS)) and "variance_share" (n, len(INPUTS)).
+    """
+    ci = check_ci(ci)
+    draws = standard_draws() if draws is None else np.asarray(draws, dtype=np.float64)
+    inputs = np.asarray(inputs, dtype=np.float64).reshape(-1, 7)
+    age, pop, le, ty, mort, ty_rms, mort_rms = inputs.T
+    rel = np.array([ci[name] for name in INPUTS]) / _Z95
+    mean = np.stack([age, pop, le, mort, ty], axis=1)
+    sd = np.abs(np.stack([age, pop, le, mort_rms, ty_rms], axis=1)) * rel
+    low = mean + sd * draws.min(axis=0)
+
+    # Samples are computed in float32, several times faster than float64
+    # here, with rounding far below the Monte Carlo error.
+    draws_t = np.ascontiguousarray(draws.T, dtype=np.float32)
+    mean32, sd32 = mean.astype(np.float32), sd.astype(np.float32)
+    # Least squares of NLHI on the draws; the same pseudo-inverse serves every record.
+    centered = draws - draws.mean(axis=0)
+    solve = np.linalg.pinv(centered).astype(np.float32)
+    draw_var = centered.var(axis=0)
+    n, samples = len(inputs), len(draws)
+    percentiles = np.empty((n, len(PERCENTILES)))
+    share = np.empty((n, len(INPUTS)))
+    batch = max(1, BATCH_VALUES // samples)
+    for i in range(0, n, batch):
+        s = slice(i, i + batch)
+        y = _sampled_nlhi(mean32[s], sd32[s], draws_t, low[s])
+        y_mean = y.mean(axis=1, keepdims=True, dtype=np.float64)
+        y -= y_mean.astype(np.float32)
+        beta = (y @ solve.T).astype(np.float64)
+        var = np.einsum("ij,ij->i", y, y, dtype=np.float64) / samples
+        explained = beta ** 2 * draw_var
+        # A spread below float32 resolution counts as none.
+        spread = var[:, None] > (1e-5 * y_mean) ** 2
+        share[s] = np.divide(explained, var[:, None], out=np.zeros_like(explained), where=spread)
+        # Last: selecting the percentiles reorders the samples.
+        percentiles[s] = (row_percentiles(y, PERCENTILES) + y_mean.T).T
+
+    denom = age * pop
+    point = _nlhi(age, pop, le, ty, mort)
+    unit = np.divide(100.0, denom, out=np.zeros_like(denom), where=denom != 0)
+    sensitivity = np.stack([
+        unit * mort,
+        -np.divide(point, age, out=np.zeros_like(point), where=age != 0),
+        -np.divide(point, pop, out=np.zeros_like(point), where=pop != 0),
+        unit * (le - age),
+        unit,
+    ], axis=1)
+    return {"percentiles": percentiles, "sensitivity": sensitivity, "variance_share": share}
+
+
+def uncertainty_entries(results, ci, samples):
+    """One record "Uncertainty" dict per row of analyze_inputs() results."""
+    ci = check_ci(ci)
+    labels = [f"p{p:g}" for p in PERCENTILES]
+    return [
+        {
+            "samples": samples,
+            "ci": ci,
+            "NLHI": dict(zip(labels, p)),
+            "sensitivity": dict(zip(SENSITIVITY_KEYS, s)),
+            "variance_share": dict(zip(INPUTS, v)),
+        }
+        for p, s, v in zip(results["percentiles"].tolist(), results["sensitivity"].tolist(),
+                           results["variance_share"].tolist())
+    ]
+
+
+def _analyze_chunk(store_path, regions, ci, samples, seed):
+    start = time.perf_counter()
+    keys, records, inputs = [], [], []
+    skipped = 0
+    with RecordStore(store_path) as store:
+        for region in regions:
+            for date, record in store.region_records(region).items():
+                try:
+                    inputs.append(record_inputs(record))
+                except RecordNotRecomputable:
+                    skipped += 1
+                    continue
+                record.pop("Uncertainty", None)
+                keys.append((region, date))
+                records.append(record)
+    results = []
+    if records:
+        entries = uncertainty_entries(analyze_inputs(inputs, ci, standard_draws(samples, seed)), ci, samples)
+        for (region, date), record, entry in zip(keys, records, entries):
+            record["Uncertainty"] = entry
+            results.append((region, date, encode_record(record)))
+    timing = {
+        "pid": os.getpid(),
+        "regions": len(regions),
+        "records": len(results),
+        "skipped": skipped,
+        "seconds": time.perf_counter() - start,
+    }
+    return results, timing
+
+
+def analyze_all(store, workers=None, regions=None, ci=None, samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED,
+                progress=None):
+    """
+    Store NLHI percentile bands and sensitivities for all records of `regions` (default: every region).
+
+    ci: {input: relative 95% half-width} overriding DEFAULT_CI. Runs in
+    worker processes like nlhi_recompute.recompute_all() and returns the
+    same kind of summary; records without domain inputs are skipped.
+    """
+    start = time.perf_counter()
+    ci = check_ci(ci)
+    if samples < 2:
+        raise ValueError(f"Need at least 2 samples, got {samples}")
+    workers = workers or os.cpu_count() or 1
+    counts = store.record_counts()
+    if regions is not None:
+        counts = {r: counts[r] for r in regions if r in counts}
+    chunks = partition_regions(counts, workers * 4)
+
+    per_worker = {}
+    written = 0
+    skipped = 0
+
+    def merge(done, results, timing):
+        nonlocal written, skipped
+        store.put_records(results, encoded=True)
+        written += len(results)
+        skipped += timing["skipped"]
+        entry = per_worker.setdefault(timing["pid"], {
+            "pid": timing["pid"], "chunks": 0, "regions": 0, "records": 0, "skipped": 0, "seconds": 0.0,
+        })
+        entry["chunks"] += 1
+        for key in ("regions", "records", "skipped", "seconds"):
+            entry[key] += timing[key]
+        if progress is not None:
+            progress(done, len(chunks))
+
+    if progress is not None:
+        progress(0, len(chunks))
+    if workers == 1 or len(chunks) <= 1:
+        for done, chunk in enumerate(chunks, 1):
+            merge(done, *_analyze_chunk(store.path, chunk, ci, samples, seed))
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as pool:
+            futures = [pool.submit(_analyze_chunk, store.path, chunk, ci, samples, seed) for chunk in chunks]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    merge(done, *future.result())
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    return {
+        "regions": len(counts),
+        "records": written,
+        "skipped": skipped,
+        "chunks": len(chunks),
+        "workers": sorted(per_worker.values(), key=lambda w: w["pid"]),
+        "seconds": time.perf_counter() - start,
+    }
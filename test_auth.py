@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from nlhi_auth import (
+    MIN_PARAMS, CredentialError, CredentialStore, ScryptParams, calibrate, hash_params,
+    hash_password, verify_password,
+)
+
+# Cheap cost so the tests stay fast; real stores are calibrated.
+FAST = ScryptParams(2 ** 10, 8, 1)
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CredentialStore(str(tmp_path / "credentials.sqlite3"), params=FAST) as s:
+        yield s
+
+
+def test_hash_is_salted_and_verifies():
+    a = hash_password("secret", FAST)
+    b = hash_password("secret", FAST)
+    assert a != b
+    assert a.startswith("scrypt$1024$8$1$")
+    assert hash_params(a) == FAST
+    assert verify_password("secret", a)
+    assert not verify_password("Secret", a)
+
+
+def test_register_and_verify(store):
+    store.register("alice", "pw1")
+    assert store.verify("alice", "pw1")
+    assert not store.verify("alice", "pw2")
+    assert not store.verify("bob", "pw1")
+    with pytest.raises(CredentialError, match="already exists"):
+        store.register("alice", "other")
+    with pytest.raises(CredentialError, match="cannot be empty"):
+        store.register("carol", "")
+    assert len(store) == 1
+
+
+def test_change_credentials_is_atomic(store):
+    store.register("alice", "pw1")
+    store.register("bob", "pw2")
+    with pytest.raises(CredentialError, match="already exists"):
+        store.change_credentials("alice", "bob", "new")
+    assert store.verify("alice", "pw1") and store.verify("bob", "pw2")
+    store.change_credentials("alice", "alicia", "new")
+    assert not store.has_user("alice")
+    assert store.verify("alicia", "new")
+
+
+def test_legacy_sha256_users_are_upgraded_on_login(tmp_path):
+    import hashlib
+
+    legacy = tmp_path / "credentials.json"
+    legacy.write_text(json.dumps({"alice": hashlib.sha256(b"pw").hexdigest()}))
+    path = str(tmp_path / "credentials.sqlite3")
+    with CredentialStore(path, params=FAST) as store:
+        assert store.import_legacy(str(legacy)) == 1
+        assert store.import_legacy(str(legacy)) == 0
+        assert store._hash("alice").startswith("sha256$")
+        assert not store.verify("alice", "wrong")
+        assert store.verify("alice", "pw")
+        assert hash_params(store._hash("alice")) == FAST
+        assert store.verify("alice", "pw")
+
+
+def test_calibrated_cost_is_saved(tmp_path):
+    path = str(tmp_path / "credentials.sqlite3")
+    assert calibrate(budget=0.0) == MIN_PARAMS
+    with CredentialStore(path, budget=0.0) as store:
+        assert store.params == MIN_PARAMS
+    with CredentialStore(path, budget=10.0) as store:
+        # The saved cost is reused until recalibrate() is called.
+        assert store.params == MIN_PARAMS
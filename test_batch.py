@@ -0,0 +1,70 @@
+import math
+import numpy as np
+import pytest
+from nlhi_core import compute_record, compute_batch, compute_domain_arrays, unit_codes
+
+
+def test_compute_record_matches_scalar_math():
+    record = compute_record(40, 1000, 80, [
+        ("Respiratory", 730.5, "Day(s)", 10),
+        ("", 5, "Day(s)", 1),
+        ("Cardio", 1, "Year(s)", 0),
+    ])
+    assert set(record["domains"]) == {"Respiratory", "Cardio"}
+    assert math.isclose(record["domains"]["Respiratory"]["DSTLYA"], 2.0 + 400, rel_tol=1e-9)
+    assert math.isclose(record["DSAV"]["Cardio"], 100.0 / 40000, rel_tol=1e-9)
+    assert math.isclose(record["NLHI"], (record["DSAV"]["Respiratory"] + record["DSAV"]["Cardio"]) / 2)
+
+
+def test_compute_record_without_domains():
+    assert compute_record(40, 1000, 80, [("  ", 1, "Day(s)", 0)]) is None
+
+
+def test_unit_codes_rejects_unknown_units():
+    assert list(unit_codes(["Day(s)", "Year(s)"])) == [0, 3]
+    with pytest.raises(ValueError):
+        unit_codes(["Day(s)", "Fortnight(s)"])
+
+
+def test_domain_arrays_zero_denominator():
+    _, _, dsav = compute_domain_arrays([1.0], ["Year(s)"], [0.0], [0.0], [10.0], [80.0])
+    assert dsav[0] == 0.0
+
+
+def test_batch_matches_compute_record():
+    rows = [
+        ("East", "2024-01-01", "Resp", 730.5, "Day(s)", 10, 40, 1000, 80),
+        ("East", "2024-01-01", "Cardio", 3, "Month(s)", 2, 40, 1000, 80),
+        ("West", "2024-01-01", "Resp", 4, "Week(s)", 1, 35, 500, 79),
+        ("East", "2024-02-01", "Resp", 1, "Year(s)", 0, 41, 1100, 80),
+        ("East", "2024-01-01", "Resp", 365.25, "Day(s)", 5, 40, 1000, 80),
+        ("West", "2024-01-01", "", 99, "Day(s)", 99, 35, 500, 79),
+    ]
+    cols = list(zip(*rows))
+    out_rows, records = compute_batch(*cols)
+
+    assert list(records["region"]) == ["East", "East", "West"]
+    assert list(records["date"]) == ["2024-01-01", "2024-02-01", "2024-01-01"]
+    assert list(records["n_domains"]) == [2, 1, 1]
+    assert out_rows["mask"].tolist() == [False, True, True, True, True, False]
+
+    for i, (region, date) in enumerate(zip(records["region"], records["date"])):
+        domains = [(r[2], r[3], r[4], r[5]) for r in rows if r[0] == region and r[1] == date]
+        age, pop, le = next(r[6:] for r in rows if r[0] == region and r[1] == date)
+        expected = compute_record(age, pop, le, domains)
+        assert math.isclose(records["nlhi"][i], expected["NLHI"], rel_tol=1e-12)
+
+
+def test_batch_large_input_is_vectorized():
+    n = 200_000
+    rng = np.random.default_rng(0)
+    regions = rng.integers(0, 50, n).astype(str)
+    dates = np.char.add("2024-01-", rng.integers(10, 29, n).astype(str))
+    domains = np.char.add("D", np.arange(n).astype(str))
+    units = np.array(["Day(s)", "Week(s)", "Month(s)", "Year(s)"])[rng.integers(0, 4, n)]
+    tliphs = rng.uniform(0, 1000, n)
+    mort = rng.integers(0, 20, n)
+    out_rows, records = compute_batch(regions, dates, domains, tliphs, units, mort,
+                                      np.full(n, 40.0), np.full(n, 1e5), np.full(n, 80.0))
+    assert records["n_domains"].sum() == n
+    assert np.isclose(out_rows["dsav"].sum(), (records["nlhi"] * records["n_domains"]).sum())
@@ -0,0 +1,121 @@
+import csv
+import json
+import math
+import subprocess
+import sys
+
+import pytest
+
+from nlhi_core import compute_record
+from nlhi_cli import compute_file, main
+
+ROWS = [
+    ("East", "2024-01-01", "Resp", "730.5", "Day(s)", "10", "40", "1000", "80"),
+    ("East", "2024-01-01", "Cardio", "3", "Month(s)", "", "40", "1000", "80"),
+    ("West", "2024-01-01", "Resp", "4", "Week(s)", "1", "35", "500", "79"),
+    ("West", "2024-02-01", "Resp", "4", "Week(s)", "1", "0", "500", "79"),
+    ("East", "2024-02-01", "Resp", "1", "Year(s)", "0", "41", "1100", "80"),
+]
+
+
+def write_input(path, rows=ROWS):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["Region", "Date", "Domain", "TLIPHS", "Unit", "Mortality", "Age", "Population", "LE"])
+        w.writerows(rows)
+
+
+def test_compute_csv_in_chunks(tmp_path):
+    src = tmp_path / "in.csv"
+    write_input(src)
+    out = tmp_path / "out.csv"
+    summary = compute_file(str(src), str(out), chunk_size=2)
+    assert summary == {**summary, "rows": 5, "rejected_rows": 1, "records": 3}
+
+    with open(out) as f:
+        result = list(csv.DictReader(f))
+    assert [(r["region"], r["date"]) for r in result] == [
+        ("East", "2024-01-01"), ("East", "2024-02-01"), ("West", "2024-01-01")]
+    expected = compute_record(40, 1000, 80, [("Resp", 730.5, "Day(s)", 10), ("Cardio", 3, "Month(s)", 0)])
+    assert result[0]["n_domains"] == "2"
+    assert math.isclose(float(result[0]["nlhi"]), expected["NLHI"], rel_tol=1e-12)
+
+
+def test_last_row_sets_record_parameters(tmp_path):
+    src = tmp_path / "in.csv"
+    rows = [("East", "2024-01-01", f"D{k}", "1", "Year(s)", "1", str(40 + k), "1000", "80") for k in range(50)]
+    write_input(src, rows)
+    out = tmp_path / "out.csv"
+    compute_file(str(src), str(out), chunk_size=7)
+    with open(out) as f:
+        (result,) = csv.DictReader(f)
+    assert float(result["age"]) == 89.0
+
+
+def test_compute_nested_json_and_domains(tmp_path):
+    src = tmp_path / "in.csv"
+    write_input(src)
+    out = tmp_path / "out.json"
+    domains = tmp_path / "domains.csv"
+    compute_file(str(src), str(out), str(domains))
+
+    with open(out) as f:
+        data = json.load(f)
+    record = data["East"]["2024-01-01"]
+    expected = compute_record(40, 1000, 80, [("Resp", 730.5, "Day(s)", 10), ("Cardio", 3, "Month(s)", 0)])
+    assert record["DSAV"] == expected["DSAV"]
+    assert record["domains"]["Resp"]["DSTLYA"] == expected["domains"]["Resp"]["DSTLYA"]
+    with open(domains) as f:
+        assert len(list(csv.DictReader(f))) == 4
+
+
+def test_unknown_unit_is_an_error(tmp_path, capsys):
+    src = tmp_path / "in.csv"
+    write_input(src, [("East", "2024-01-01", "Resp", "1", "Decade(s)", "0", "40", "1000", "80")])
+    assert main(["compute", str(src), "-o", str(tmp_path / "out.csv")]) == 2
+    assert "Decade(s)" in capsys.readouterr().err
+
+
+def test_compute_validates_dates(tmp_path, capsys):
+    src = tmp_path / "in.csv"
+    write_input(src, ROWS[:2] + [("West", "2024-01-01T08:00:00", "Resp", "4", "Week(s)", "1", "35", "500", "79"),
+                                 ("West", "02/01/2024", "Resp", "4", "Week(s)", "1", "35", "500", "79")])
+    out = tmp_path / "out.csv"
+    assert main(["compute", str(src), "-o", str(out), "--chunk-size", "2"]) == 2
+    assert "Invalid date '02/01/2024' on data row 4" in capsys.readouterr().err
+
+    write_input(src, ROWS[:3] + [("West", "2024-01-01T08:00:00", "Resp", "4", "Week(s)", "1", "35", "500", "79")])
+    compute_file(str(src), str(out), chunk_size=2)
+    with open(out) as f:
+        assert [(r["region"], r["date"]) for r in csv.DictReader(f)] == [
+            ("East", "2024-01-01"), ("West", "2024-01-01")]
+
+
+def test_cli_does_not_import_gui_modules():
+    code = ("import sys, nlhi_cli; "
+            "print(any(m.split('.')[0] in ('PyQt5', 'matplotlib') for m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_stdlib_and_arrow_csv_readers_agree(tmp_path):
+    pytest.importorskip("pyarrow")
+    import numpy as np
+    from nlhi_io import _arrow_csv_chunks, _csv_chunks, chunk_arrays
+
+    src = tmp_path / "in.csv"
+    write_input(src)
+    plain = chunk_arrays(next(_csv_chunks(str(src), 100)))
+    arrow = chunk_arrays(next(_arrow_csv_chunks(str(src), 100)))
+    for name in plain:
+        assert np.array_equal(plain[name], arrow[name]), name
+
+
+def test_parquet_output(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    src = tmp_path / "in.csv"
+    write_input(src)
+    out = tmp_path / "out.parquet"
+    assert main(["compute", str(src), "-o", str(out)]) == 0
+    table = pq.read_table(out)
+    assert table.column("region").to_pylist() == ["East", "East", "West"]
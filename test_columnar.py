@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pytest
+
+from nlhi_cli import main
+from nlhi_columnar import columns_to_records, export_columnar, import_columnar, load_columns, records_to_columns
+from nlhi_core import compute_record
+from nlhi_store import RecordStore
+
+ITEMS = [
+    ("East", "2024-01-01", compute_record(40, 1000, 80, [("Resp", 730.5, "Day(s)", 10.0), ("Cardio", 3, "Month(s)", 0.0)])),
+    ("East", "2024-02-01", compute_record(41, 1000, 80, [("Cardio", 2, "Year(s)", 0.5)])),
+    ("West", "2024-01-01", {"DSAV": {"Resp": 0.5}, "NLHI": 0.5}),
+    ("West", "2024-03-01", {"NLHI": 0.0, "DSAV": {}}),
+]
+
+
+def test_columns_hold_each_value_once():
+    cols, skipped = records_to_columns(ITEMS + [("West", "March", {"NLHI": 1.0})])
+    assert skipped == 1
+    assert cols["regions"].tolist() == ["East", "West"]
+    assert cols["domains"].tolist() == ["Resp", "Cardio"]
+    assert cols["domain_offsets"].tolist() == [0, 2, 3, 4, 4]
+    assert cols["record_date"].dtype == np.dtype("datetime64[D]")
+    assert cols["unit"].tolist() == [0, 2, 3, -1]
+    assert math.isnan(cols["tliphs"][3]) and cols["dsav"][3] == 0.5
+    assert not any(name.startswith("uncertainty_") for name in cols)
+
+
+@pytest.mark.parametrize("name", ["export.npz", "export.parquet", "export_npy"])
+def test_roundtrip(tmp_path, name):
+    path = str(tmp_path / name)
+    with RecordStore(str(tmp_path / "a.sqlite3")) as store:
+        store.put_records(ITEMS)
+        summary = export_columnar(store, path)
+    assert summary["records"] == 4 and summary["domain_rows"] == 4
+    with RecordStore(str(tmp_path / "b.sqlite3")) as store:
+        assert import_columnar(store, path)["records"] == 4
+        restored = store.load_all()
+    assert restored["East"] == {date: record for region, date, record in ITEMS if region == "East"}
+    # Records that only kept a DSAV map come back without domain details.
+    assert restored["West"] == {"2024-01-01": {"DSAV": {"Resp": 0.5}, "NLHI": 0.5},
+                                "2024-03-01": {"DSAV": {}, "NLHI": 0.0}}
+
+
+@pytest.mark.parametrize("name", ["export.npz", "export.parquet", "export_npy"])
+def test_roundtrip_keeps_unknown_units(tmp_path, name):
+    record = compute_record(40, 1000, 80, [("Resp", 730.5, "Day(s)", 10.0), ("Cardio", 3, "Month(s)", 0.0)])
+    record["domains"]["Cardio"]["TLIPHS_unit"] = "Fortnight(s)"
+    path = str(tmp_path / name)
+    with RecordStore(str(tmp_path / "a.sqlite3")) as store:
+        store.put_records([("East", "2024-01-01", record)])
+        export_columnar(store, path)
+    cols = load_columns(path)
+    assert cols["units"].tolist()[-1] == "Fortnight(s)" and cols["unit"].tolist() == [0, 4]
+    with RecordStore(str(tmp_path / "b.sqlite3")) as store:
+        import_columnar(store, path)
+        assert store.get_record("East", "2024-01-01") == record
+
+    # Legacy details that lack a unit or derived values come back without them.
+    legacy = {"MeanAge": 40.0, "domains": {"Resp": {"TLIPHS": 2.0, "DSAV": 0.25}}, "NLHI": 0.25}
+    with RecordStore(str(tmp_path / "c.sqlite3")) as store:
+        store.put_record("Old", "2020-01-01", legacy)
+        stored = store.get_record("Old", "2020-01-01")
+        export_columnar(store, path)
+    assert stored["domains"] == legacy["domains"]
+    with RecordStore(str(tmp_path / "d.sqlite3")) as store:
+        import_columnar(store, path)
+        assert store.get_record("Old", "2020-01-01") == stored
+
+
+@pytest.mark.parametrize("name", ["export.npz", "export.parquet", "export_npy"])
+def test_roundtrip_keeps_uncertainty_entries(tmp_path, name):
+    from nlhi_uncertainty import analyze_all
+
+    path = str(tmp_path / name)
+    with RecordStore(str(tmp_path / "a.sqlite3")) as store:
+        store.put_records(ITEMS)
+        analyze_all(store, workers=1, samples=500)
+        original = store.load_all()
+        export_columnar(store, path)
+    assert "Uncertainty" in original["East"]["2024-01-01"]
+    with RecordStore(str(tmp_path / "b.sqlite3")) as store:
+        import_columnar(store, path)
+        assert store.load_all() == original
+
+
+def test_npy_directory_is_memory_mapped(tmp_path):
+    path = str(tmp_path / "cols")
+    with RecordStore(str(tmp_path / "a.sqlite3")) as store:
+        store.put_records(ITEMS)
+        export_columnar(store, path, regions=["East"])
+    cols = load_columns(path)
+    assert isinstance(cols["dsav"], np.memmap)
+    assert [region for region, _, _ in columns_to_records(cols)] == ["East", "East"]
+
+
+def test_cli_export_and_restore(tmp_path, capsys):
+    src, dst, out = (str(tmp_path / n) for n in ("a.sqlite3", "b.sqlite3", "x.npz"))
+    with RecordStore(src) as store:
+        store.put_records(ITEMS)
+    assert main(["export", out, "--store", src]) == 0
+    assert main(["restore", out, "--store", dst]) == 0
+    assert "Restored 4 records for 2 regions" in capsys.readouterr().out
+    with RecordStore(dst) as store:
+        assert store.record_counts() == {"East": 2, "West": 2}
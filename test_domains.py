@@ -0,0 +1,99 @@
+import math
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt5.QtCore")
+
+from nlhi_core import compute_record
+from nlhi_domains import DomainRows, DomainTableModel
+
+
+def test_domain_rows_store_and_validate():
+    rows = DomainRows()
+    rows.append("Resp", "730.5", "Day(s)", 10)
+    rows.append("Cardio", 3, "Month(s)", "")
+    rows.append("Bad", 1, "Fortnight(s)", 1)
+    assert len(rows) == 3
+    assert rows.row(1) == ("Cardio", 3.0, "Month(s)", 0.0)
+    assert rows.get(2, "unit") == "Day(s)"
+
+    assert rows.set(2, "tliphs", "4.5")
+    assert rows.set(2, "mortality", " ")
+    assert not rows.set(2, "tliphs", "abc")
+    assert not rows.set(2, "unit", "Fortnight(s)")
+    assert rows.set(2, "unit", "Week(s)")
+    assert rows.row(2) == ("Bad", 4.5, "Week(s)", 0.0)
+
+    rows.remove(0)
+    assert [r[0] for r in rows] == ["Cardio", "Bad"]
+    assert compute_record(40, 1000, 80, rows) == compute_record(
+        40, 1000, 80, [("Cardio", 3.0, "Month(s)", 0.0), ("Bad", 4.5, "Week(s)", 0.0)])
+    rows.clear()
+    assert len(rows) == 0 and list(rows) == []
+
+
+def test_table_model_edits_and_signals():
+    model = DomainTableModel()
+    inserted, removed, changed = [], [], []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append(first))
+    model.rowsRemoved.connect(lambda parent, first, last: removed.append(first))
+    model.dataChanged.connect(lambda tl, br, roles: changed.append((tl.row(), tl.column())))
+
+    model.add_row("Resp", 730.5, "Day(s)", 10)
+    model.add_row()
+    assert inserted == [0, 1]
+    assert model.rowCount() == 2 and model.columnCount() == 6
+    assert model.data(model.index(0, 1)) == "730.5"
+    assert model.data(model.index(0, 2)) == "Day(s)"
+
+    assert model.setData(model.index(1, 0), "Neuro")
+    assert not model.setData(model.index(1, 3), "many")
+    assert changed == [(1, 0), (1, 4)]
+
+    model.remove_row(0)
+    assert removed == [0]
+    assert list(model.rows) == [("Neuro", 0.0, "Day(s)", 0.0)]
+    model.clear()
+    assert model.rowCount() == 0
+
+
+def test_live_nlhi_matches_compute_record():
+    rows = DomainRows()
+    rows.set_params(40, 1000, 80)
+    rows.append("Resp", 730.5, "Day(s)", 10)
+    rows.append("Cardio", 3, "Month(s)", 2)
+    rows.append("Resp", 2, "Year(s)", 1)
+    rows.append("", 5, "Day(s)", 5)
+
+    def check():
+        expected = compute_record(rows.age, rows.pop, rows.le, rows)
+        assert rows.n_domains == len(expected["DSAV"])
+        assert math.isclose(rows.nlhi, expected["NLHI"], rel_tol=1e-12)
+        for i, row in enumerate(rows):
+            single = compute_record(rows.age, rows.pop, rows.le, [("x",) + row[1:]])
+            assert rows.dsav[i] == single["DSAV"]["x"]
+
+    check()
+    rows.set(1, "tliphs", "12")
+    check()
+    rows.set(0, "mortality", "50")  # shadowed by the later "Resp" row
+    check()
+    rows.set(3, "name", "Neuro")
+    check()
+    rows.remove(2)
+    check()
+    rows.set_params(45, 2000, 81)
+    check()
+
+
+def test_table_model_emits_live_nlhi():
+    model = DomainTableModel()
+    seen = []
+    model.nlhi_changed.connect(seen.append)
+    model.set_params(40, 1000, 80)
+    model.set_rows([("Resp", 730.5, "Day(s)", 10), ("Cardio", 3, "Month(s)", 2)])
+    assert model.rowCount() == 2
+    assert math.isclose(seen[-1], compute_record(40, 1000, 80, model.rows)["NLHI"])
+    assert model.setData(model.index(0, 1), "800")
+    assert math.isclose(seen[-1], compute_record(40, 1000, 80, model.rows)["NLHI"])
+    assert not model.flags(model.index(0, 5)) & QtCore.Qt.ItemIsEditable
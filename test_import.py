@@ -0,0 +1,94 @@
+import math
+
+import pytest
+
+from nlhi_cli import main
+from nlhi_core import compute_record
+from nlhi_import import import_file, read_records
+from nlhi_io import InputFormatError, count_rows
+from nlhi_store import RecordStore
+from test_cli import ROWS, write_input
+
+
+def assert_records_close(actual, expected):
+    assert list(actual["domains"]) == list(expected["domains"])
+    for name, d in expected["domains"].items():
+        for key, value in d.items():
+            if isinstance(value, float):
+                assert math.isclose(actual["domains"][name][key], value, rel_tol=1e-12)
+            else:
+                assert actual["domains"][name][key] == value
+    assert math.isclose(actual["NLHI"], expected["NLHI"], rel_tol=1e-12)
+
+
+def test_import_csv_in_one_transaction(tmp_path):
+    src = tmp_path / "in.csv"
+    write_input(src)
+    assert count_rows(src) == len(ROWS)
+    seen = []
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        store.put_record("East", "2024-01-01", {"NLHI": -1.0})
+        summary = import_file(store, str(src), chunk_size=2, progress=lambda d, t: seen.append((d, t)))
+        assert summary["records"] == 3
+        assert summary["rejected_rows"] == 1
+        assert store.regions() == ["East", "West"]
+        assert store.region_version("East") == 2
+        east = store.get_record("East", "2024-01-01")
+    expected = compute_record(40.0, 1000.0, 80.0, [("Resp", 730.5, "Day(s)", 10.0), ("Cardio", 3.0, "Month(s)", 0.0)])
+    assert_records_close(east, expected)
+    assert seen[0] == (0, 5) and seen[-1] == (5, 5)
+
+
+def test_unknown_unit_leaves_store_untouched(tmp_path):
+    src = tmp_path / "in.csv"
+    write_input(src, ROWS + [("North", "2024-01-01", "Resp", "1", "Fortnight(s)", "0", "40", "10", "80")])
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        with pytest.raises(InputFormatError, match="'Fortnight\\(s\\)' on data row 6"):
+            import_file(store, str(src), chunk_size=2)
+        assert store.regions() == []
+
+
+def test_import_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    import datetime
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Region", "Date", "Domain", "TLIPHS", "Unit", "Mortality", "Age", "Population", "LE"])
+    ws.append(["East", datetime.datetime(2024, 1, 1), "Resp", 730.5, "Day(s)", 10, 40, 1000, 80])
+    ws.append(["East", "2024-01-01", "Cardio", 3, "Month(s)", None, 40, 1000, 80])
+    path = tmp_path / "in.xlsx"
+    wb.save(path)
+
+    assert count_rows(path) == 2
+    records, summary = read_records(str(path))
+    assert summary["rows"] == 2
+    expected = compute_record(40.0, 1000.0, 80.0, [("Resp", 730.5, "Day(s)", 10.0), ("Cardio", 3.0, "Month(s)", 0.0)])
+    assert_records_close(records[("East", "2024-01-01")], expected)
+
+
+def test_cli_import(tmp_path, capsys):
+    src = tmp_path / "in.csv"
+    write_input(src)
+    store_path = tmp_path / "store.sqlite3"
+    assert main(["import", str(src), "--store", str(store_path)]) == 0
+    assert "Imported 3 records for 2 regions" in capsys.readouterr().out
+    with RecordStore(str(store_path)) as store:
+        assert store.dates("East") == ["2024-01-01", "2024-02-01"]
+
+
+def test_dates_are_validated_and_normalized(tmp_path):
+    src = tmp_path / "in.csv"
+    rows = [("East", "2024-01-01T00:00:00", "Resp", "1", "Year(s)", "0", "40", "1000", "80"),
+            ("East", "2024-01-01", "Cardio", "1", "Year(s)", "0", "40", "1000", "80"),
+            ("East", "01/02/2024", "Resp", "1", "Year(s)", "0", "0", "1000", "80")]
+    write_input(src, rows)
+    records, summary = read_records(str(src))
+    assert list(records) == [("East", "2024-01-01")]
+    assert list(records[("East", "2024-01-01")]["domains"]) == ["Resp", "Cardio"]
+    assert summary["rejected_rows"] == 1
+
+    for bad in ("01/02/2024", "2024-02-30", "2024", ""):
+        write_input(src, rows[:2] + [("East", bad, "Resp", "1", "Year(s)", "0", "40", "1000", "80")])
+        with pytest.raises(InputFormatError, match=f"Invalid date {bad!r} on data row 3"):
+            read_records(str(src), chunk_size=2)
@@ -0,0 +1,61 @@
+import json
+import pstats
+
+import nlhi_metrics
+from nlhi_cli import main
+from nlhi_metrics import Metrics
+from nlhi_store import RecordStore
+from test_cli import write_input
+
+
+def test_disabled_metrics_record_nothing(tmp_path):
+    metrics = Metrics()
+    with metrics.timer("x") as span:
+        span.add_bytes(10)
+    assert metrics.stats == {}
+    assert list(tmp_path.iterdir()) == []
+    assert metrics.timer("x") is metrics.timer("y")
+
+
+def test_json_lines_and_store_bytes(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    nlhi_metrics.configure(str(path))
+    try:
+        with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+            store.put_record("East", "2024-01-01", {"DSAV": {}, "NLHI": 1.0})
+            store.put_records([("East", "2024-01-02", {"DSAV": {}, "NLHI": 2.0}), ("West", "2024-01-02", {"DSAV": {}, "NLHI": 3.0})])
+        stats = nlhi_metrics.metrics.stats
+    finally:
+        nlhi_metrics.configure(None)
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["name"] for e in events] == ["store.put_record", "store.put_records"]
+    assert events[0]["bytes"] == len('{"DSAV":{},"NLHI":1.0}')
+    assert events[1]["bytes"] == len('{"DSAV":{},"NLHI":2.0}') + len('{"DSAV":{},"NLHI":3.0}')
+    assert stats["store.put_record"]["count"] == 1
+
+
+def test_prometheus_text_and_profile(tmp_path):
+    metrics = Metrics(str(tmp_path / "nlhi.prom"), profile=["work"])
+    for _ in range(3):
+        with metrics.timer("work") as span:
+            sum(range(1000))
+            span.add_bytes(5)
+    metrics.flush()
+    text = (tmp_path / "nlhi.prom").read_text()
+    assert "# TYPE nlhi_calls_total counter" in text
+    assert 'nlhi_calls_total{section="work"} 3' in text
+    assert 'nlhi_bytes_written_total{section="work"} 15' in text
+    assert pstats.Stats(str(tmp_path / "work.prof")).total_calls > 0
+
+
+def test_cli_metrics_flag(tmp_path):
+    src = tmp_path / "in.csv"
+    write_input(src)
+    out = tmp_path / "out.csv"
+    prom = tmp_path / "run.prom"
+    assert main(["--metrics", str(prom), "--profile", "cli.compute", "compute", str(src), "-o", str(out)]) == 0
+    text = prom.read_text()
+    assert 'nlhi_calls_total{section="cli.compute"} 1' in text
+    assert f'nlhi_bytes_written_total{{section="cli.compute"}} {out.stat().st_size}' in text
+    assert (tmp_path / "cli.compute.prof").exists()
+    assert not nlhi_metrics.metrics.enabled
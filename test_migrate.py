@@ -0,0 +1,98 @@
+import json
+import sqlite3
+
+import pytest
+
+from nlhi_core import compute_record
+from nlhi_migrate import iter_legacy_json, normalize_record
+from nlhi_store import RecordStore
+
+LEGACY = {
+    "MeanAge": "40", "Population": 1000,
+    "NLCHI": "0.5",
+    "domains": {"Resp": {"TLIPHS": "2", "TLIPHS_unit": "Year(s)", "Mortality": 0, "DSAV": "0.25"}},
+}
+
+
+def test_normalize_record_is_typed_and_idempotent():
+    record = normalize_record(LEGACY)
+    assert record == {
+        "MeanAge": 40.0, "Population": 1000.0,
+        "domains": {"Resp": {"TLIPHS": 2.0, "TLIPHS_unit": "Year(s)", "Mortality": 0.0,
+                             "TLIPHS_years": 2.0, "DSAV": 0.25}},
+        "DSAV": {"Resp": 0.25},
+        "NLHI": 0.5,
+    }
+    assert normalize_record(record) == record
+    # DSTLYA is derived once the life expectancy is known; nothing is made up without it.
+    assert normalize_record({**LEGACY, "AvgLifeExpectancy": 80})["domains"]["Resp"]["DSTLYA"] == 2.0
+    assert normalize_record({"domains": {"Resp": {"TLIPHS": 3, "DSAV": 1}, "Bad": 5}}) == {
+        "domains": {"Resp": {"TLIPHS": 3.0, "DSAV": 1.0}}, "DSAV": {"Resp": 1.0}, "NLHI": 0.0}
+    assert normalize_record({"NLHI": 1, "DSAV": {"A": "2"}}) == {"DSAV": {"A": 2.0}, "NLHI": 1.0}
+    assert normalize_record("bad") == {"DSAV": {}, "NLHI": 0.0}
+    computed = compute_record(40.0, 1000.0, 80.0, [("Resp", 1.0, "Year(s)", 0.1)])
+    assert normalize_record(computed) == computed
+
+
+def test_iter_legacy_json_streams_regions(tmp_path):
+    data = {f"R{k}": {f"2024-01-{d:02d}": {"NLHI": k * 1.25 + d, "DSAV": {"A": 12345.6789}}
+                      for d in range(1, 30)} for k in range(5)}
+    data["Empty"] = {}
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(data, indent=2))
+    # Tiny blocks split keys, strings and numbers across reads.
+    for block_size in (1, 7, 1 << 20):
+        assert dict(iter_legacy_json(str(path), block_size)) == data
+
+    path.write_text(" { } ")
+    assert list(iter_legacy_json(str(path))) == []
+    path.write_text('{"A": {"2024-01-01": {"NLHI": 1}}, "B": {"2024')
+    regions = iter_legacy_json(str(path), 4)
+    assert next(regions)[0] == "A"
+    with pytest.raises(ValueError):
+        next(regions)
+
+
+def test_import_json_normalizes_and_ignores_malformed_files(tmp_path):
+    data = tmp_path / "nlchi_data.json"
+    data.write_text(json.dumps({"Old": {"2020-01-01": LEGACY}, "Bare": {"2020-01-01": {"NLHI": "2"}}}))
+    regions = tmp_path / "regions.json"
+    regions.write_text(json.dumps(["Empty", "Old"]))
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        assert store.import_json(str(data), str(regions)) == 2
+        assert store.regions() == ["Empty", "Old", "Bare"]
+        assert store.get_record("Old", "2020-01-01") == normalize_record(LEGACY)
+        assert store.get_record("Bare", "2020-01-01") == {"DSAV": {}, "NLHI": 2.0}
+
+        data.write_text('{"New": {"2020-01-01": {"NLHI": 1}}, "Broken": [')
+        assert store.import_json(str(data)) == 0
+        assert not store.has_region("New")
+
+
+def test_writes_are_normalized(tmp_path):
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        store.put_record("Old", "2020-01-01", LEGACY)
+        store.put_records([("Old", "2020-01-02", {"NLCHI": "0.25"})])
+        assert store.get_record("Old", "2020-01-01") == normalize_record(LEGACY)
+        assert store.get_record("Old", "2020-01-02") == {"DSAV": {}, "NLHI": 0.25}
+
+
+def test_upgrade_normalizes_stored_records(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    with RecordStore(path) as store:
+        store.put_record("Old", "2020-01-01", {"DSAV": {}, "NLHI": 0.0})
+        store.put_record("New", "2020-01-01", {"NLHI": 1.0, "DSAV": {"A": 1.0}})
+        versions = {r: store.region_version(r) for r in ("Old", "New")}
+        seq = store.last_change()
+    # A record written by a version that stored records as given.
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE records SET payload = ? WHERE region = 'Old'", (json.dumps(LEGACY),))
+    conn.execute("PRAGMA user_version = 2")
+    conn.commit()
+    conn.close()
+
+    with RecordStore(path) as store:
+        assert store.get_record("Old", "2020-01-01") == normalize_record(LEGACY)
+        assert store.region_version("Old") == versions["Old"] + 1
+        assert store.region_version("New") == versions["New"]
+        assert [(c.region, c.date) for c in store.changes_since(seq)] == [("Old", None)]
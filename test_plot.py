@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+import pytest
+
+from nlhi_plot import (
+    MAX_HEATMAP_COLUMNS, MAX_HEATMAP_ROWS, MAX_LINE_POINTS, bin_heatmap, bin_rows, decimate_line, tick_positions,
+)
+from nlhi_series import RegionSeries
+
+
+def big_series(n_dates=100_000, n_domains=300):
+    rng = np.random.default_rng(0)
+    dates = [f"d{i:06d}" for i in range(n_dates)]
+    domains = [f"D{j}" for j in range(n_domains)]
+    return RegionSeries(dates, domains, rng.random(n_dates), rng.random((n_dates, n_domains)))
+
+
+def test_decimate_line_keeps_extremes():
+    y = np.zeros(100_000)
+    y[12_345] = 5.0
+    y[54_321] = -3.0
+    x, yd = decimate_line(y, 1000)
+    assert len(x) <= 1000
+    assert np.all(np.diff(x) > 0)
+    assert yd.max() == 5.0 and yd.min() == -3.0
+    assert decimate_line([1.0, 2.0], 1000)[1].tolist() == [1.0, 2.0]
+
+
+def test_bin_rows_averages():
+    m = np.arange(10, dtype=float).reshape(10, 1)
+    binned, edges = bin_rows(m, 5)
+    assert binned[:, 0].tolist() == [0.5, 2.5, 4.5, 6.5, 8.5]
+    assert edges.tolist() == [0, 2, 4, 6, 8, 10]
+    binned, edges = bin_rows(m, 4)
+    assert binned[:, 0].tolist() == [1.0, 4.0, 7.0, 9.0]
+    assert edges.tolist() == [0, 3, 6, 9, 10]
+    assert bin_rows(m, 20)[0].shape == (10, 1)
+
+
+def test_bin_heatmap_bins_both_axes():
+    m = np.arange(12, dtype=float).reshape(3, 4)
+    assert bin_heatmap(m, 3, 2).tolist() == [[0.5, 2.5], [4.5, 6.5], [8.5, 10.5]]
+    assert bin_heatmap(m, 2, 4).tolist() == [[2.0, 3.0, 4.0, 5.0], [8.0, 9.0, 10.0, 11.0]]
+    assert bin_heatmap(np.zeros((10, 1000))).shape == (10, MAX_HEATMAP_ROWS)
+
+
+def test_tick_positions():
+    assert tick_positions(0).size == 0
+    assert tick_positions(3).tolist() == [0, 1, 2]
+    assert tick_positions(1000, 5).tolist() == [0, 250, 500, 749, 999]
+
+
+def test_region_plot_draw_is_bounded():
+    pytest.importorskip("matplotlib")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from nlhi_plot import RegionPlot
+
+    fig = Figure(figsize=(12, 8))
+    canvas = FigureCanvasAgg(fig)
+    plot = RegionPlot(fig)
+    small = RegionSeries(["2024-01-01", "2024-02-01"], ["A"], [1.0, 2.0], [[1.0], [2.0]])
+    plot.draw("Small", small)
+    canvas.draw()
+
+    def redraw(name, series):
+        start = time.perf_counter()
+        plot.draw(name, series)
+        canvas.draw()
+        return time.perf_counter() - start
+
+    baseline = redraw("Small", small)
+    series = big_series()
+    elapsed = redraw("Big", series)
+    assert len(plot.line.get_xdata()) <= MAX_LINE_POINTS
+    assert plot.image.get_array().shape[0] <= MAX_HEATMAP_ROWS
+    assert plot.image.get_array().shape[1] <= MAX_HEATMAP_COLUMNS
+    assert len(plot.ax_heat.get_xticks()) <= 12
+    # Decimation keeps the redraw independent of the history length; the
+    # absolute time depends on the machine (see benchmarks/bench_dashboard.py).
+    assert elapsed < 10 * baseline + 0.1
+
+
+def test_region_plot_all_nan_line():
+    pytest.importorskip("matplotlib")
+    from matplotlib.figure import Figure
+
+    from nlhi_plot import RegionPlot
+
+    plot = RegionPlot(Figure())
+    ylim = plot.ax_line.get_ylim()
+    plot.draw("Empty", RegionSeries(["2024-01-01", "2024-02-01"], ["A"], [np.nan, np.nan], [[1.0], [2.0]]))
+    assert plot.ax_line.get_ylim() == ylim
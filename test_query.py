@@ -0,0 +1,125 @@
+import datetime
+import math
+import random
+
+import numpy as np
+import pytest
+
+from nlhi_cli import main
+from nlhi_query import QueryEngine, period_keys, period_label
+from nlhi_store import RecordStore
+
+
+def make_record(nlhi, pop, dsav):
+    return {"Population": pop, "NLHI": nlhi, "DSAV": dsav}
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = random.Random(7)
+    items = []
+    day = datetime.date(2023, 11, 20)
+    for i in range(120):
+        date = (day + datetime.timedelta(days=3 * i)).isoformat()
+        for region in ("East", "West"):
+            dsav = {"Resp": rng.uniform(0, 5)}
+            if i % 2:
+                dsav["Cardio"] = rng.uniform(0, 5)
+            items.append((region, date, make_record(rng.uniform(0, 5), rng.uniform(100, 1000), dsav)))
+    with RecordStore(str(tmp_path / "store.sqlite3")) as s:
+        s.put_records(items)
+        yield s
+
+
+def brute(store, regions, start=None, end=None, weighted=False, key=lambda r: r["NLHI"]):
+    total = weight = 0.0
+    for region in regions:
+        for date, record in store.region_records(region).items():
+            if (start and date < start) or (end and date > end) or key(record) is None:
+                continue
+            w = record["Population"] if weighted else 1.0
+            total += w * key(record)
+            weight += w
+    return total / weight if weight else None
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_range_means_match_a_full_scan(store, weighted):
+    engine = QueryEngine(store)
+    for regions, start, end in [(["East"], None, None), (["East", "West"], "2024-02-01", "2024-06-30"),
+                                (["West"], "2024-03-02", "2024-03-02"), (["East"], "2030-01-01", None)]:
+        expected = brute(store, regions, start, end, weighted)
+        actual = engine.mean_nlhi(regions, start, end, weighted)
+        assert actual == pytest.approx(expected) if expected is not None else actual is None
+        dsav = engine.mean_dsav(regions, start, end, weighted)
+        for domain in ("Resp", "Cardio"):
+            expected = brute(store, regions, start, end, weighted, key=lambda r: r["DSAV"].get(domain))
+            assert dsav.get(domain) == pytest.approx(expected) if expected is not None else domain not in dsav
+
+
+def test_resample_by_period(store):
+    engine = QueryEngine(store)
+    rows = engine.resample(["East", "West"], "quarter", weighted=True)
+    assert [r["period"] for r in rows] == ["2023-Q4", "2024-Q1", "2024-Q2", "2024-Q3", "2024-Q4"]
+    assert sum(r["records"] for r in rows) == 240
+    q2 = next(r for r in rows if r["period"] == "2024-Q2")
+    assert q2["nlhi"] == pytest.approx(brute(store, ["East", "West"], "2024-04-01", "2024-06-30", True))
+
+    months = engine.resample("East", "month", "2024-01-15", "2024-02-29")
+    assert [r["period"] for r in months] == ["2024-01", "2024-02"]
+    assert months[0]["nlhi"] == pytest.approx(brute(store, ["East"], "2024-01-15", "2024-01-31"))
+    assert [r["period"] for r in engine.resample("West", "year")] == ["2023", "2024"]
+
+
+def test_rolling_window(store):
+    engine = QueryEngine(store)
+    dates, means = engine.rolling("East", 30, start="2024-05-01", end="2024-05-31")
+    assert dates[0] >= "2024-05-01" and dates[-1] <= "2024-05-31"
+    for date, mean in zip(dates, means):
+        first = (datetime.date.fromisoformat(date) - datetime.timedelta(days=29)).isoformat()
+        assert mean == pytest.approx(brute(store, ["East"], first, date))
+
+
+def test_index_is_rebuilt_when_the_region_changes(store):
+    engine = QueryEngine(store)
+    before = engine.index("East")
+    assert engine.index("East") is before
+    store.put_record("East", "2025-06-01", make_record(100.0, 1.0, {"Resp": 100.0}))
+    assert engine.index("East") is not before
+    assert engine.mean_nlhi("East", "2025-06-01") == 100.0
+    assert engine.mean_nlhi("Nowhere") is None
+
+
+def test_index_of_a_deleted_and_re_added_region(store):
+    engine = QueryEngine(store)
+    store.put_record("Fresh", "2024-01-01", make_record(0.0025, 1.0, {"Resp": 0.0025}))
+    assert engine.mean_nlhi("Fresh") == 0.0025
+    store.delete_region("Fresh")
+    store.put_record("Fresh", "2024-01-01", make_record(0.25, 1.0, {"Resp": 0.25}))
+    assert engine.mean_nlhi("Fresh") == 0.25
+
+
+def test_period_keys_and_labels():
+    days = [datetime.date(2024, m, 1).toordinal() for m in (1, 3, 4, 12)]
+    assert [period_label(k, "month") for k in period_keys(days, "month")] == [
+        "2024-01", "2024-03", "2024-04", "2024-12"]
+    assert [period_label(k, "quarter") for k in period_keys(days, "quarter")] == [
+        "2024-Q1", "2024-Q1", "2024-Q2", "2024-Q4"]
+    with pytest.raises(ValueError):
+        period_keys(np.array(days), "week")
+
+
+def test_cli_query(store, capsys):
+    assert main(["query", "--store", store.path, "--group", "All=East,West", "--region", "East",
+                 "--from", "2024-01-01", "--to", "2024-12-31"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "group,nlhi"
+    group, value = lines[1].split(",")
+    assert group == "All"
+    assert math.isclose(float(value), brute(store, ["East", "West"], "2024-01-01", "2024-12-31"))
+    assert lines[2].startswith("East,")
+
+    assert main(["query", "--store", store.path, "--period", "year", "--weighted"]) == 0
+    assert capsys.readouterr().out.splitlines()[0] == "group,period,records,nlhi"
+    assert main(["query", "--store", store.path, "--region", "Nowhere"]) == 2
+    assert main(["query", "--store", store.path, "--from", "yesterday"]) == 2
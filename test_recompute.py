@@ -0,0 +1,53 @@
+import math
+
+import pytest
+
+from nlhi_core import UNIT_CONVERSION, compute_record
+from nlhi_recompute import RecordNotRecomputable, partition_regions, recompute_all, recompute_record
+from nlhi_store import RecordStore
+
+
+def make_record(pop=1000.0):
+    return compute_record(40, pop, 80, [("Resp", 52.1429, "Week(s)", 1), ("Cardio", 12, "Month(s)", 0)])
+
+
+def test_recompute_record_with_revised_inputs():
+    record = make_record()
+    assert recompute_record(record) == record
+
+    units = dict(UNIT_CONVERSION, **{"Week(s)": 1 / 52.0})
+    revised = recompute_record(record, units, population=2000)
+    assert revised["Population"] == 2000
+    assert math.isclose(revised["domains"]["Resp"]["TLIPHS_years"], 52.1429 / 52.0)
+    expected = compute_record(40, 2000, 80, [("Resp", 52.1429, "Week(s)", 1), ("Cardio", 12, "Month(s)", 0)], units)
+    assert revised["NLHI"] == expected["NLHI"]
+
+    with pytest.raises(RecordNotRecomputable):
+        recompute_record({"NLHI": 1.0, "DSAV": {"A": 1.0}})
+    # A legacy detail without its unit is not recomputed with a guessed one.
+    with pytest.raises(RecordNotRecomputable):
+        recompute_record({**record, "domains": {"Resp": {"TLIPHS": 1.0, "Mortality": 0.0, "DSAV": 1.0}}})
+
+
+def test_partition_regions_balances_record_counts():
+    counts = {"A": 100, "B": 60, "C": 50, "D": 10, "E": 0}
+    chunks = partition_regions(counts, 2)
+    loads = sorted(sum(counts[r] for r in c) for c in chunks)
+    assert sorted(r for c in chunks for r in c) == sorted(counts)
+    assert loads == [100, 120] or loads == [110, 110]
+    assert partition_regions({}, 4) == []
+
+
+def test_recompute_all_merges_results(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    with RecordStore(path) as store:
+        store.put_records([(f"R{k}", f"2024-01-{d:02d}", make_record()) for k in range(5) for d in range(1, 4)])
+        store.put_record("Legacy", "2020-01-01", {"DSAV": {"A": 0.5}, "NLHI": 0.5})
+
+        summary = recompute_all(store, workers=2, population={"R0": 500.0})
+        assert summary["records"] == 15
+        assert summary["skipped"] == 1
+        assert sum(w["records"] for w in summary["workers"]) == 15
+        assert store.get_record("R0", "2024-01-01") == make_record(500.0)
+        assert store.get_record("R1", "2024-01-01") == make_record()
+        assert store.get_record("Legacy", "2020-01-01") == {"DSAV": {"A": 0.5}, "NLHI": 0.5}
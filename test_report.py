@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from nlhi_cli import main
+from nlhi_core import compute_record
+from nlhi_report import export_report, report_filenames
+from nlhi_store import RecordStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    with RecordStore(str(tmp_path / "store.sqlite3")) as s:
+        s.put_records(
+            (region, f"2024-{m:02d}-01", compute_record(40, 1000, 80, [("Resp", m, "Month(s)", 0.01), ("Cardio", 2, "Week(s)", 0)]))
+            for region in ("East", "West / North", "South") for m in range(1, 7)
+        )
+        s.add_region("Empty")
+        yield s
+
+
+def test_report_filenames_are_safe_and_unique():
+    assert report_filenames(["East", "West / North", "West_North", "..", "east"], "png") == {
+        "East": "East.png", "West / North": "West_North.png", "West_North": "West_North_2.png",
+        "..": "region.png", "east": "east_2.png",
+    }
+
+
+@pytest.mark.parametrize("fmt", ["png", "svg"])
+def test_one_file_per_region(store, tmp_path, fmt):
+    out = str(tmp_path / "charts")
+    seen = []
+    summary = export_report(store, out, fmt, workers=1, progress=lambda d, t: seen.append((d, t)))
+    assert summary["regions"] == 4
+    assert sorted(os.listdir(out)) == sorted(f"{n}.{fmt}" for n in ("East", "West_North", "South", "Empty"))
+    assert seen[0] == (0, 4) and seen[-1] == (4, 4)
+    with open(os.path.join(out, f"East.{fmt}"), "rb") as f:
+        head = f.read(200)
+    assert head.startswith(b"\x89PNG") if fmt == "png" else b"<svg" in head or b"<?xml" in head
+
+
+def test_multi_page_pdf_in_worker_processes(store, tmp_path):
+    out = str(tmp_path / "report.pdf")
+    summary = export_report(store, out, regions=["South", "East"], workers=2)
+    assert summary["regions"] == 2
+    with open(out, "rb") as f:
+        pdf = f.read()
+    assert pdf.startswith(b"%PDF") and pdf.count(b"/Type /Page\n") + pdf.count(b"/Type /Page ") >= 2
+    # Exporting only reads the store.
+    assert store.get_series("East") is None and store.get_series("South") is None
+
+
+def test_cli_report(store, tmp_path, capsys):
+    out = str(tmp_path / "pdfs")
+    assert main(["report", out, "--store", store.path, "--format", "pdf", "-j", "2", "--region", "East"]) == 0
+    assert os.listdir(out) == ["East.pdf"]
+    assert "Wrote charts for 1 regions" in capsys.readouterr().out
@@ -0,0 +1,108 @@
+import numpy as np
+
+from nlhi_migrate import normalize_record
+from nlhi_series import RegionSeries, SeriesCache, extract_dsav_map, extract_nlhi
+from nlhi_store import RecordStore
+
+LEGACY = {"NLCHI": "1.5", "domains": {"B": {"DSAV": 1.5}}}
+
+RECORDS = {
+    "2024-02-01": {"NLHI": 2.0, "DSAV": {"A": 1.0, "B": 3.0}},
+    "2024-01-01": normalize_record(LEGACY),
+    "2024-03-01": {"NLHI": 4.0, "DSAV": {"C": 4.0}},
+}
+
+
+def test_extractors_handle_legacy_shapes():
+    assert extract_nlhi(LEGACY) == 1.5
+    assert extract_dsav_map(LEGACY) == {"B": 1.5}
+    assert extract_nlhi("bad") == 0.0 and extract_dsav_map(None) == {}
+
+
+def test_from_records_builds_matrix():
+    series = RegionSeries.from_records(RECORDS)
+    assert series.dates == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert series.domains == ["B", "A", "C"]
+    assert series.nlhi.tolist() == [1.5, 2.0, 4.0]
+    assert series.dsav.tolist() == [[1.5, 0, 0], [3.0, 1.0, 0], [0, 0, 4.0]]
+
+
+def test_upsert_matches_rebuild_and_roundtrips():
+    series = RegionSeries.from_records({d: RECORDS[d] for d in ("2024-01-01", "2024-03-01")})
+    series.upsert("2024-02-01", RECORDS["2024-02-01"])
+    full = RegionSeries.from_records(RECORDS)
+    assert series.dates == full.dates
+    order = [series.domains.index(d) for d in full.domains]
+    assert np.array_equal(series.dsav[:, order], full.dsav)
+
+    series.upsert("2024-02-01", {"NLHI": 9.0, "DSAV": {"A": 9.0}})
+    copy = RegionSeries.from_bytes(series.to_bytes())
+    assert copy.dates == series.dates and copy.domains == series.domains
+    assert copy.nlhi.tolist() == [1.5, 9.0, 4.0]
+    assert np.array_equal(copy.dsav, series.dsav)
+
+
+def test_cache_tracks_store_versions(tmp_path):
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        cache = SeriesCache(store)
+        store.put_records([("R", d, r) for d, r in RECORDS.items()])
+        assert cache.get("R").nlhi.tolist() == [1.5, 2.0, 4.0]
+        assert store.get_series("R")[0] == store.region_version("R")
+
+        record = {"NLHI": 5.0, "DSAV": {"A": 5.0}}
+        version = store.put_record("R", "2024-04-01", record)
+        cache.record_saved("R", "2024-04-01", record, version)
+        assert store.get_series("R")[0] == version
+
+        # A write that bypasses the cache makes the stored series stale.
+        store.put_record("R", "2024-05-01", {"NLHI": 6.0, "DSAV": {"A": 6.0}})
+        assert cache.get("R").nlhi.tolist() == [1.5, 2.0, 4.0, 5.0, 6.0]
+
+        store.delete_region("R")
+        assert store.get_series("R") is None
+        assert cache.get("R").dates == []
+
+
+def test_cache_memoizes_by_version_within_budget(tmp_path):
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        store.put_records([(r, d, rec) for r in ("R", "S", "T") for d, rec in RECORDS.items()])
+        size = RegionSeries.from_records(RECORDS).nbytes
+        cache = SeriesCache(store, budget_bytes=2 * size)
+        first = cache.get("R")
+        assert cache.get("R") is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # Saving through the cache patches a copy and memoizes it.
+        record = {"NLHI": 5.0, "DSAV": {"A": 5.0}}
+        saved = cache.record_saved("R", "2024-04-01", record, store.put_record("R", "2024-04-01", record))
+        assert cache.get("R") is saved and first.dates == sorted(RECORDS)
+        # Other writers bump the version.
+        store.put_record("R", "2024-05-01", record)
+        assert cache.get("R").dates[-1] == "2024-05-01"
+        assert (cache.hits, cache.misses) == (2, 2)
+
+        # Least recently used regions are evicted to stay within the budget.
+        cache.get("S")
+        cache.get("T")
+        stats = cache.stats()
+        assert stats["evictions"] == 1 and stats["bytes"] <= stats["budget_bytes"]
+        assert stats["regions"] == 2
+        cache.get("T")
+        cache.get("R")
+        assert (cache.hits, cache.misses) == (3, 5)
+
+
+def test_cache_rebuilds_deleted_and_re_added_regions(tmp_path):
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        store.put_record("R", "2024-01-01", RECORDS["2024-01-01"])
+        cache = SeriesCache(store)
+        assert cache.get("R").dates == ["2024-01-01"]
+
+        store.delete_region("R")
+        store.put_record("R", "2024-03-01", RECORDS["2024-03-01"])
+        assert cache.get("R").dates == ["2024-03-01"]
+        assert cache.stats()["misses"] == 2
+
+        cache.mark_dirty("R")
+        assert cache.stats()["regions"] == 0
+        assert cache.get("R").dates == ["2024-03-01"]
@@ -0,0 +1,196 @@
+import asyncio
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nlhi_core import compute_record
+from nlhi_server import NLHIServer, NLHIService
+from nlhi_store import RecordStore
+
+
+def submission(region="East", date="2024-01-01", age=40.0):
+    return {"region": region, "date": date, "age": age, "population": 1000, "le": 80,
+            "domains": [{"name": "Resp", "tliphs": 730.5, "unit": "Day(s)", "mortality": 10},
+                        {"name": "Cardio", "tliphs": 3, "unit": "Month(s)", "mortality": 0}]}
+
+
+@pytest.fixture
+def server(tmp_path):
+    store = RecordStore(str(tmp_path / "store.sqlite3"))
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    holder = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        holder["server"] = NLHIServer(NLHIService(store, flush_interval=60, flush_batch=10_000), port=0)
+        loop.run_until_complete(holder["server"].start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait(10)
+    yield holder["server"], store
+    asyncio.run_coroutine_threadsafe(holder["server"].close(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+    holder["server"].service.close()
+    store.close()
+
+
+def request(server, method, path, body=None, conn=None):
+    own = conn is None
+    conn = conn or http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    data = None if body is None else json.dumps(body)
+    conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    payload = json.loads(response.read())
+    if own:
+        conn.close()
+    return response.status, payload
+
+
+def flush(server):
+    server_obj, store = server
+    loop = server_obj._server.get_loop()
+    return asyncio.run_coroutine_threadsafe(server_obj.service.flush(), loop).result(10)
+
+
+def test_submit_computes_like_the_app_and_is_written_behind(server):
+    srv, store = server
+    status, body = request(srv, "POST", "/records", submission())
+    assert status == 200
+    expected = compute_record(40.0, 1000.0, 80.0, [("Resp", 730.5, "Day(s)", 10.0), ("Cardio", 3.0, "Month(s)", 0.0)])
+    assert body["record"]["NLHI"] == pytest.approx(expected["NLHI"])
+
+    # Readable at once, but not in the store until the next flush.
+    assert store.get_record("East", "2024-01-01") is None
+    assert request(srv, "GET", "/regions/East/records/2024-01-01")[1]["NLHI"] == pytest.approx(expected["NLHI"])
+    assert request(srv, "GET", "/regions")[1] == [{"region": "East", "records": 1}]
+    assert request(srv, "GET", "/health")[1]["unwritten"] == 1
+    assert flush(server) == 1
+    assert store.get_record("East", "2024-01-01")["NLHI"] == pytest.approx(expected["NLHI"])
+
+
+def test_series_matches_the_dashboard_and_sees_new_records(server):
+    srv, store = server
+    store.put_record("East", "2024-01-01", compute_record(40.0, 1000.0, 80.0, [("Resp", 1.0, "Year(s)", 0.0)]))
+    status, series = request(srv, "GET", "/regions/East/series")
+    assert status == 200
+    assert series["dates"] == ["2024-01-01"] and series["domains"] == ["Resp"]
+
+    request(srv, "POST", "/records", [submission(date="2024-02-01"), submission(date="2023-12-01")])
+    series = request(srv, "GET", "/regions/East/series")[1]
+    assert series["dates"] == ["2023-12-01", "2024-01-01", "2024-02-01"]
+    assert series["domains"] == ["Resp", "Cardio"]
+    assert len(series["dsav"]) == 3 and series["dsav"][1][1] == 0.0
+    assert request(srv, "GET", "/regions/East/series?from=2024-01-01")[1]["dates"] == ["2024-01-01", "2024-02-01"]
+
+    # A write by another process is picked up through the region version.
+    flush(server)
+    store.put_record("East", "2025-01-01", compute_record(40.0, 1000.0, 80.0, [("Resp", 1.0, "Year(s)", 0.0)]))
+    assert request(srv, "GET", "/regions/East/series")[1]["dates"][-1] == "2025-01-01"
+
+
+def test_series_come_from_one_bounded_cache(server):
+    srv, store = server
+    service = srv.service
+    store.put_record("East", "2024-01-01", compute_record(40.0, 1000.0, 80.0, [("Resp", 1.0, "Year(s)", 0.0)]))
+    request(srv, "GET", "/regions/East/series")
+    shared = service.cache.get("East")
+    assert service.cache.stats()["budget_bytes"] > 0
+
+    # Unwritten records go to a copy, never into the shared cached series.
+    request(srv, "POST", "/records", submission(date="2024-02-01"))
+    assert len(request(srv, "GET", "/regions/East/series")[1]["dates"]) == 2
+    assert shared.dates == ["2024-01-01"]
+
+    # After the flush the server's copy becomes the cached series of the new version.
+    flush(server)
+    assert service.cache.get("East").dates == ["2024-01-01", "2024-02-01"]
+    hits = service.cache.stats()["hits"]
+    assert len(request(srv, "GET", "/regions/East/series")[1]["dates"]) == 2
+    assert service.cache.stats()["hits"] == hits + 1
+
+
+def test_many_concurrent_clients(server):
+    srv, store = server
+
+    def client(k):
+        conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=30)
+        for i in range(10):
+            status, _ = request(srv, "POST", "/records", submission(f"R{k % 4}", f"2024-01-{i + 1:02d}", 30 + k),
+                                conn=conn)
+            assert status == 200
+            assert request(srv, "GET", f"/regions/R{k % 4}/series", conn=conn)[0] == 200
+        conn.close()
+
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(client, range(16)))
+    assert flush(server) == 40
+    assert store.record_counts() == {f"R{k}": 10 for k in range(4)}
+    for k in range(4):
+        assert len(request(srv, "GET", f"/regions/R{k}/series")[1]["dates"]) == 10
+
+
+def test_query_and_errors(server):
+    srv, store = server
+    request(srv, "POST", "/records", [submission("East"), submission("West", age=50)])
+    status, body = request(srv, "GET", "/query?regions=East,West&period=year&weighted=1")
+    assert status == 200 and body["periods"][0]["records"] == 2
+    assert request(srv, "GET", "/query?domains=1")[1]["dsav"].keys() == {"Resp", "Cardio"}
+
+    assert request(srv, "POST", "/records", {**submission(), "age": -1})[0] == 400
+    bad_unit = submission()
+    bad_unit["domains"][0]["unit"] = "Fortnight(s)"
+    assert "Unknown TLIPHS unit" in request(srv, "POST", "/records", bad_unit)[1]["error"]
+    assert request(srv, "GET", "/regions/Nowhere/series")[0] == 404
+    assert request(srv, "GET", "/records")[0] == 405
+    assert request(srv, "GET", "/query?period=week")[0] == 400
+
+
+def test_series_of_a_region_deleted_and_re_added_elsewhere(server):
+    srv, store = server
+    store.put_record("East", "2024-01-01", compute_record(40.0, 1000.0, 80.0, [("Resp", 1.0, "Year(s)", 0.0)]))
+    assert request(srv, "GET", "/regions/East/series")[1]["dates"] == ["2024-01-01"]
+    # Another process replaces the region; its versions do not start over.
+    other = RecordStore(store.path)
+    other.delete_region("East")
+    other.put_record("East", "2030-01-01", compute_record(40.0, 1000.0, 80.0, [("Cardio", 1.0, "Year(s)", 0.0)]))
+    other.close()
+    series = request(srv, "GET", "/regions/East/series")[1]
+    assert series["dates"] == ["2030-01-01"] and series["domains"] == ["Cardio"]
+
+
+def test_rejects_bad_numbers_and_headers(server):
+    srv, store = server
+    for value in ("nan", "inf", float("nan"), float("-inf")):
+        status, body = request(srv, "POST", "/records", {**submission(), "population": value})
+        assert status == 400 and "'population'" in body["error"]
+    bad = submission()
+    bad["domains"][0]["mortality"] = float("inf")
+    assert request(srv, "POST", "/records", bad)[0] == 400
+    assert request(srv, "GET", "/regions")[1] == []
+
+    for length in ("ten", "-1"):
+        conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=10)
+        conn.putrequest("POST", "/records")
+        conn.putheader("Content-Length", length)
+        conn.endheaders()
+        response = conn.getresponse()
+        assert response.status == 400
+        assert json.loads(response.read()) == {"error": "Invalid Content-Length header"}
+        conn.close()
+
+    conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=10)
+    conn.putrequest("GET", "/health")
+    conn.putheader("X-Padding", "x" * 200_000)
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == 400
+    assert json.loads(response.read()) == {"error": "Request line or header too long"}
+    conn.close()
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWidgets")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Cold-start budgets in seconds, measured in a fresh interpreter from the
+# first import of NLHI_v1.0.py. They are generous so slow CI machines pass;
+# the import checks below are what keep startup lazy.
+LOGIN_BUDGET = 5.0
+MAIN_WINDOW_BUDGET = 5.0
+HEAVY_MODULES = ("numpy", "matplotlib")
+
+SCRIPT = r"""
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("nlhi_app", sys.argv[1])
+app_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app_module)
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+login = app_module.LoginDialog()
+login.show()
+app.processEvents()
+login_seconds = time.perf_counter() - start
+at_login = [m for m in sys.argv[2:] if m in sys.modules]
+
+start = time.perf_counter()
+window = app_module.NLHIApp("tester")
+window.show()
+app.processEvents()
+main_seconds = time.perf_counter() - start
+at_main = [m for m in sys.argv[2:] if m in sys.modules]
+
+window.warm_up()
+window.tasks.wait()
+warmed = [m for m in sys.argv[2:] if m in sys.modules]
+print(json.dumps({"login": login_seconds, "main": main_seconds,
+                  "at_login": at_login, "at_main": at_main, "warmed": warmed}))
+"""
+
+
+def test_cold_start(tmp_path):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", MPLBACKEND="Agg",
+               PYTHONPATH=os.pathsep.join([HERE, os.environ.get("PYTHONPATH", "")]))
+    env.pop("NLHI_METRICS", None)
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT, os.path.join(HERE, "NLHI_v1.0.py"), *HEAVY_MODULES],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120, check=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["at_login"] == []
+    assert result["at_main"] == []
+    assert result["warmed"] == list(HEAVY_MODULES)
+    assert result["login"] < LOGIN_BUDGET
+    assert result["main"] < MAIN_WINDOW_BUDGET
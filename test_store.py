@@ -0,0 +1,142 @@
+import json
+
+from nlhi_store import RecordStore
+
+
+def test_put_and_read_records(tmp_path):
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        store.add_region("West")
+        store.put_record("East", "2024-02-01", {"DSAV": {}, "NLHI": 2.0})
+        store.put_record("East", "2024-01-01", {"DSAV": {}, "NLHI": 1.0})
+        store.put_record("East", "2024-01-01", {"DSAV": {}, "NLHI": 1.5})
+        assert store.regions() == ["West", "East"]
+        assert list(store.region_records("East")) == ["2024-01-01", "2024-02-01"]
+        assert store.dates("East") == ["2024-01-01", "2024-02-01"]
+        assert store.region_records("West") == {}
+        assert store.get_record("East", "2024-01-01") == {"DSAV": {}, "NLHI": 1.5}
+        assert store.load_all() == {
+            "West": {},
+            "East": {"2024-01-01": {"DSAV": {}, "NLHI": 1.5}, "2024-02-01": {"DSAV": {}, "NLHI": 2.0}},
+        }
+
+
+def test_delete_region_removes_records(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    with RecordStore(path) as store:
+        store.put_records([("A", "2024-01-01", {"DSAV": {}, "NLHI": 1.0}),
+                           ("B", "2024-01-01", {"DSAV": {}, "NLHI": 2.0})])
+        store.delete_region("A")
+    with RecordStore(path) as store:
+        assert store.load_all() == {"B": {"2024-01-01": {"DSAV": {}, "NLHI": 2.0}}}
+        # Versions of a region added again continue where they stopped.
+        version = store.region_version("B")
+        store.delete_region("B")
+        store.add_region("B")
+        assert store.region_version("B") == version + 1
+
+
+def test_failed_batch_is_rolled_back(tmp_path):
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        try:
+            store.put_records([("A", "2024-01-01", {"DSAV": {}, "NLHI": 1.0}),
+                               ("B", "2024-01-01", {"DSAV": {}, "NLHI": 2.0, "Uncertainty": {"draws": object()}})])
+        except TypeError:
+            pass
+        assert store.load_all() == {}
+
+
+def test_import_legacy_runs_once(tmp_path):
+    old = tmp_path / "nlchi_data.json"
+    old.write_text(json.dumps({"Old": {"2020-01-01": {"NLCHI": 0.5}}}))
+    regions = tmp_path / "regions.json"
+    regions.write_text(json.dumps(["Old", "Empty"]))
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        assert store.import_legacy([str(tmp_path / "nlhi_data.json"), str(old)], str(regions)) == 1
+        store.delete_region("Old")
+        assert store.import_legacy([str(old)], str(regions)) == 0
+        assert store.load_all() == {"Empty": {}}
+
+
+def test_upgrade_adds_region_version(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "store.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE regions (name TEXT PRIMARY KEY, position INTEGER NOT NULL);
+        CREATE TABLE records (region TEXT NOT NULL, date TEXT NOT NULL, payload TEXT NOT NULL,
+                              PRIMARY KEY (region, date));
+        INSERT INTO regions VALUES ('A', 0);
+    """)
+    conn.commit()
+    conn.close()
+    with RecordStore(path) as store:
+        assert store.region_version("A") == 0
+        assert store.put_record("A", "2024-01-01", {"DSAV": {}, "NLHI": 1.0}) == 1
+
+
+def test_store_is_usable_from_worker_threads(tmp_path):
+    import threading
+
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        def write(region):
+            for i in range(20):
+                store.put_record(region, f"2024-01-{i + 1:02d}", {"NLHI": i})
+
+        threads = [threading.Thread(target=write, args=(f"R{k}",)) for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(store.regions()) == ["R0", "R1", "R2", "R3"]
+        assert all(store.region_version(f"R{k}") == 20 for k in range(4))
+
+
+def test_change_log_tracks_writes_of_other_instances(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    with RecordStore(path) as mine, RecordStore(path) as theirs:
+        assert mine.journal_mode == "wal"
+        cursor = mine.last_change()
+        seen = mine.data_version()
+        theirs.put_record("East", "2024-01-01", {"DSAV": {}, "NLHI": 1.0})
+        theirs.put_record("East", "2024-01-02", {"DSAV": {}, "NLHI": 2.0})
+        theirs.put_records([("West", "2024-01-01", {"DSAV": {}, "NLHI": 3.0})])
+        theirs.delete_region("West")
+        assert mine.data_version() != seen
+        changes = mine.changes_since(cursor)
+        assert [(c.region, c.date) for c in changes] == [
+            ("East", None), ("East", "2024-01-02"), ("West", None), ("West", None)]
+        assert {c.writer for c in changes} == {theirs.writer_id}
+        assert mine.changes_since(changes[-1].seq) == []
+
+
+def test_pruned_change_log_asks_for_a_full_reload(tmp_path, monkeypatch):
+    import nlhi_store
+
+    monkeypatch.setattr(nlhi_store, "CHANGE_LOG_LIMIT", 3)
+    with RecordStore(str(tmp_path / "store.sqlite3")) as store:
+        for i in range(6):
+            store.put_record("East", f"2024-01-{i + 1:02d}", {"NLHI": i})
+        assert store.changes_since(2) is None
+        assert [c.date for c in store.changes_since(3)] == ["2024-01-04", "2024-01-05", "2024-01-06"]
+
+
+def test_instances_sharing_a_file_keep_each_others_records(tmp_path):
+    import threading
+
+    path = str(tmp_path / "store.sqlite3")
+    stores = [RecordStore(path) for _ in range(3)]
+
+    def write(k):
+        for i in range(15):
+            stores[k].put_record("Shared", f"2024-{k + 1:02d}-{i + 1:02d}", {"NLHI": k})
+
+    threads = [threading.Thread(target=write, args=(k,)) for k in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(stores[0].region_records("Shared")) == 45
+    assert stores[1].region_version("Shared") == 45
+    for store in stores:
+        store.close()
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt5.QtCore")
+
+from nlhi_tasks import TaskRunner
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    yield app
+
+
+def pump(app, until, timeout=5.0):
+    end = time.time() + timeout
+    while not until() and time.time() < end:
+        app.processEvents()
+        time.sleep(0.005)
+    app.processEvents()
+
+
+def test_result_and_progress_arrive_on_gui_thread(qapp):
+    runner = TaskRunner()
+    seen = {"progress": [], "threads": set()}
+
+    def work(task, n):
+        seen["worker"] = threading.get_ident()
+        for i in range(n):
+            task.report(i + 1, n)
+        return n * 2
+
+    runner.submit(
+        work, 3,
+        on_done=lambda r: (seen.update(result=r), seen["threads"].add(threading.get_ident())),
+        on_progress=lambda d, t: seen["progress"].append((d, t)),
+    )
+    pump(qapp, lambda: "result" in seen)
+    assert seen["result"] == 6
+    assert seen["progress"] == [(1, 3), (2, 3), (3, 3)]
+    assert seen["threads"] == {threading.get_ident()} != {seen["worker"]}
+    assert not runner.active
+
+
+def test_cancel_and_failure(qapp):
+    runner = TaskRunner(max_threads=1)
+    started = threading.Event()
+    events = []
+
+    def slow(task):
+        started.set()
+        while True:
+            task.report(0, 1)
+            time.sleep(0.01)
+
+    def broken(task):
+        raise RuntimeError("boom")
+
+    task = runner.submit(slow, on_cancel=lambda: events.append("cancelled"))
+    runner.submit(broken, on_error=events.append)
+    started.wait(5)
+    task.cancel()
+    runner.wait()
+    pump(qapp, lambda: len(events) == 2)
+    assert events == ["cancelled", "boom"]
+
+
+def test_cancel_all_skips_queued_tasks(qapp, capfd, caplog):
+    runner = TaskRunner(max_threads=1)
+    started = threading.Event()
+    ran = []
+
+    def slow(task):
+        started.set()
+        while True:
+            task.report(0, 1)
+            time.sleep(0.01)
+
+    runner.submit(slow)
+    runner.submit(lambda task: ran.append(1))
+    started.wait(5)
+    runner.cancel_all()
+    assert runner.wait(5000)
+    assert ran == []
+
+    failed = []
+    runner.submit(lambda task: 1 / 0, on_error=failed.append)
+    runner.wait()
+    pump(qapp, lambda: failed)
+    assert failed == ["division by zero"]
+    assert "Traceback" in caplog.text and "ZeroDivisionError" in caplog.text
+    assert capfd.readouterr().err == ""
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from nlhi_core import compute_record
+from nlhi_plot import prepare_region
+from nlhi_recompute import RecordNotRecomputable, recompute_all
+from nlhi_series import SeriesCache
+from nlhi_store import RecordStore
+from nlhi_uncertainty import (
+    DEFAULT_CI, INPUTS, SENSITIVITY_KEYS, analyze_all, analyze_inputs, check_ci, record_inputs, row_percentiles,
+)
+
+DOMAINS = [("Resp", 2.0, "Year(s)", 3.0), ("Cardio", 6.0, "Month(s)", 1.0)]
+
+
+def test_row_percentiles_match_numpy():
+    rng = np.random.default_rng(0)
+    for shape in ((5, 1001), (3, 4), (2, 1)):
+        y = rng.standard_normal(shape)
+        q = [0, 2.5, 11, 50, 97.5, 100]
+        assert np.allclose(row_percentiles(y.copy(), q), np.percentile(y, q, axis=1), rtol=0, atol=1e-12)
+
+
+def test_bands_match_per_domain_sampling():
+    record = compute_record(40.0, 1000.0, 80.0, DOMAINS)
+    result = analyze_inputs([record_inputs(record)])
+    low, median, high = result["percentiles"][0]
+    assert low < record["NLHI"] < high
+    assert median == pytest.approx(record["NLHI"], rel=0.01)
+
+    # Drawing every domain's inputs separately gives the same distribution.
+    rng = np.random.default_rng(1)
+    n = 200_000
+
+    def draw(value, name):
+        return np.maximum(value + value * DEFAULT_CI[name] / 1.96 * rng.standard_normal(n), 0.0)
+
+    age, pop, le = draw(40.0, "age"), draw(1000.0, "population"), draw(80.0, "le")
+    dsav = [100 * (draw(d["TLIPHS_years"], "tliphs") + draw(d["Mortality"], "mortality") * (le - age)) / (age * pop)
+            for d in record["domains"].values()]
+    expected = np.percentile(np.mean(dsav, axis=0), [2.5, 50, 97.5])
+    assert result["percentiles"][0] == pytest.approx(expected, rel=0.01)
+
+
+def test_sensitivity_and_variance_shares():
+    record = compute_record(40.0, 1000.0, 80.0, DOMAINS)
+    result = analyze_inputs([record_inputs(record)])
+    sensitivity = dict(zip(SENSITIVITY_KEYS, result["sensitivity"][0]))
+    step = 1e-3
+
+    def nlhi(age=40.0, pop=1000.0, le=80.0, mort=0.0, tliphs=0.0):
+        rows = [(name, t + tliphs, "Year(s)", m + mort) for name, t, m in
+                [(n, d["TLIPHS_years"], d["Mortality"]) for n, d in record["domains"].items()]]
+        return compute_record(age, pop, le, rows)["NLHI"]
+
+    base = nlhi()
+    assert sensitivity["LE-age"] == pytest.approx((nlhi(le=80 + step) - base) / step, rel=1e-4)
+    assert sensitivity["age"] == pytest.approx((nlhi(age=40 + step, le=80 + step) - base) / step, rel=1e-4)
+    assert sensitivity["population"] == pytest.approx((nlhi(pop=1000 + step) - base) / step, rel=1e-4)
+    assert sensitivity["mortality"] == pytest.approx((nlhi(mort=step) - base) / step, rel=1e-4)
+    assert sensitivity["TLIPHS"] == pytest.approx((nlhi(tliphs=step) - base) / step, rel=1e-4)
+
+    share = result["variance_share"][0]
+    assert share.sum() == pytest.approx(1.0, abs=0.02)
+    assert dict(zip(INPUTS, share))["mortality"] == share.max()
+
+    # Without uncertainty the band collapses to the point estimate.
+    exact = analyze_inputs([record_inputs(record)], {name: 0.0 for name in INPUTS})
+    assert exact["percentiles"][0] == pytest.approx([record["NLHI"]] * 3)
+    assert exact["variance_share"][0].tolist() == [0.0] * len(INPUTS)
+
+    # No bands around made-up parameters.
+    for key in ("MeanAge", "Population", "AvgLifeExpectancy"):
+        with pytest.raises(RecordNotRecomputable):
+            record_inputs({k: v for k, v in record.items() if k != key})
+    with pytest.raises(RecordNotRecomputable):
+        record_inputs({**record, "Population": 0.0})
+    with pytest.raises(RecordNotRecomputable):
+        record_inputs({**record, "domains": {"Resp": {"TLIPHS": 1.0, "DSAV": 1.0}}})
+
+    with pytest.raises(ValueError):
+        check_ci({"weight": 0.1})
+    with pytest.raises(ValueError):
+        check_ci({"le": -0.1})
+
+
+def test_analyze_all_stores_bands_for_the_dashboard(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    with RecordStore(path) as store:
+        store.put_records([(f"R{k}", f"2024-01-{d:02d}", compute_record(40.0 + d, 1000.0, 80.0, DOMAINS))
+                           for k in range(3) for d in range(1, 6)])
+        store.put_record("Legacy", "2020-01-01", {"NLHI": 0.5, "DSAV": {"A": 0.5}})
+        no_age = compute_record(40.0, 1000.0, 80.0, DOMAINS)
+        del no_age["MeanAge"]
+        store.put_record("Legacy", "2020-02-01", no_age)
+
+        summary = analyze_all(store, workers=2, samples=2000)
+        assert summary["records"] == 15 and summary["skipped"] == 2
+        entry = store.get_record("R1", "2024-01-03")["Uncertainty"]
+        assert entry["samples"] == 2000 and entry["ci"] == DEFAULT_CI
+        assert set(entry["sensitivity"]) == set(SENSITIVITY_KEYS)
+
+        # Shared draws: the result does not depend on how regions are chunked.
+        analyze_all(store, workers=1, regions=["R1"], samples=2000)
+        again = store.get_record("R1", "2024-01-03")["Uncertainty"]
+        assert again["NLHI"] == entry["NLHI"]
+        assert again["variance_share"] == pytest.approx(entry["variance_share"])
+        # An entry that is not the last key is replaced too.
+        moved = store.get_record("R2", "2024-01-01")
+        store.put_record("R2", "2024-01-01", {"Uncertainty": moved.pop("Uncertainty"), **moved})
+        analyze_all(store, workers=1, regions=["R2"], samples=2000)
+        assert list(store.get_record("R2", "2024-01-01"))[-1] == "Uncertainty"
+
+        series = SeriesCache(store).get("R1")
+        assert np.all(series.lower < series.nlhi) and np.all(series.nlhi < series.upper)
+        assert series.upper[2] == entry["NLHI"]["p97.5"]
+        assert prepare_region(series)["band"] is not None
+        assert prepare_region(SeriesCache(store).get("Legacy"))["band"] is None
+
+        # Recomputing a record replaces it, band included.
+        recompute_all(store, workers=1, regions=["R1"])
+        assert "Uncertainty" not in store.get_record("R1", "2024-01-03")
+        assert np.isnan(SeriesCache(store).get("R1").lower).all()